@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Benchmark the Boolean Algebra set operations against their original implementations.
+
+The original implementations are quadratic in the number of genes, so they are only
+run up to --legacy-max genes.
+
+Example:
+    python scripts/benchmark_boolean_algebra.py --sizes 1000 5000 50000 200000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tests" / "unit" / "BA_tests"))
+
+from plugins.BooleanAlgebra import service  # noqa: E402
+from legacy_reference import legacy_bool_except, legacy_intersect  # noqa: E402
+
+
+def random_bool_results(num_genes: int, num_genesets: int, seed: int) -> Dict:
+    """bool_results as group_homologs builds it, with about half the genes in 2+ gene sets."""
+    rng = random.Random(seed)
+    geneset_ids = [str(100000 + i) for i in range(num_genesets)]
+    bool_results = {}
+    for gene in range(1, num_genes + 1):
+        genesets = rng.sample(geneset_ids, rng.choice([1, 1, 2, 3]))
+        bool_results[gene] = [(gene, f"R{gene}", 1, gs_id) for gs_id in genesets]
+    return bool_results
+
+
+def best_of(func: Callable, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+OPERATIONS = {
+    "intersect": (lambda r: service.intersect(r, 2), lambda r: legacy_intersect(r, 2)),
+    "except": (service.bool_except, legacy_bool_except),
+}
+
+
+def main() -> None:
+    """Time every operation at every size and print a table."""
+    parser = argparse.ArgumentParser(description="Benchmark Boolean Algebra set operations")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 20000, 50000, 100000])
+    parser.add_argument("--genesets", type=int, default=20, help="Number of gene sets genes are drawn into")
+    parser.add_argument("--legacy-max", type=int, default=5000, help="Largest size the original code is run at")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'operation':<12}{'genes':>10}{'new (s)':>12}{'legacy (s)':>12}{'speedup':>10}")
+    for name, (new, legacy) in OPERATIONS.items():
+        for size in args.sizes:
+            bool_results = random_bool_results(size, args.genesets, seed=size)
+            new_time = best_of(lambda: new(bool_results), args.repeat)
+            row = f"{name:<12}{size:>10}{new_time:>12.4f}"
+            if size <= args.legacy_max:
+                legacy_time = best_of(lambda: legacy(bool_results), 1)
+                row += f"{legacy_time:>12.4f}{legacy_time / new_time:>9.0f}x"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
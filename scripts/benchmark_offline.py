@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Benchmark the MSET and Boolean Algebra plugins offline against a replayed GeneWeaver API.
+
+Without --cassette a synthetic cassette is generated: gene sets across two species whose
+source IDs are numeric, so the symbol mapping path is exercised too. Use --record with
+--cassette to capture a real cassette from the live API first.
+
+Example:
+    python scripts/benchmark_offline.py --genesets 20 --genes 2000 --latency 0.05,0.15
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from plugins.api.geneSetRestAPI import fetchGeneSymbols_from_geneset  # noqa: E402
+from plugins.api.http_client import api_url, jax_api_url  # noqa: E402
+from plugins.api.replay import Cassette, install_recorder, install_replay  # noqa: E402
+from plugins.api.response_cache import geneset_cache  # noqa: E402
+from plugins.api.species_registry import species_registry  # noqa: E402
+from plugins.api.symbol_mapper import symbol_mapper  # noqa: E402
+from plugins.BooleanAlgebra.BA import BooleanAlgebra  # noqa: E402
+from plugins.MSET.MSET import MSET, MSETMatrix  # noqa: E402
+
+SPECIES = {1: "Mus musculus", 2: "Homo sapiens"}
+
+
+def synthetic_cassette(num_genesets: int, genes_per_set: int, universe_size: int, seed: int) -> Cassette:
+    """Gene sets drawn from a shared universe, so they overlap like real ones do."""
+    rng = random.Random(seed)
+    cassette = Cassette()
+    species_body = {"data": [{"id": 0, "name": "All"}] + [{"id": i, "name": n} for i, n in SPECIES.items()]}
+    cassette.add_response("GET", jax_api_url("species"), species_body)
+    cassette.add_response("GET", api_url("species"), species_body)
+    for species_id, species_name in SPECIES.items():
+        canonical = species_name.title()
+        source_ids = [str(100000 * species_id + i) for i in range(universe_size)]
+        cassette.add_mappings(canonical, source_ids, [
+            {"original_ref_id": source_id, "mapped_ref_id": f"Gene{i}"} for i, source_id in enumerate(source_ids)
+        ])
+    for gs_id in range(1, num_genesets + 1):
+        species_id = 1 + gs_id % len(SPECIES)
+        genes = rng.sample(range(universe_size), genes_per_set)
+        body = {"object": {
+            "geneset": {"gs_id": gs_id, "species_id": species_id},
+            "geneset_values": [{"ode_gene_id": gene, "ode_ref_id": f"R{gene}",
+                                "gsv_source_list": [str(100000 * species_id + gene)]} for gene in genes],
+        }}
+        cassette.add_response("GET", api_url(f"genesets/{gs_id}"), body)
+        cassette.add_response("GET", jax_api_url(f"genesets/{gs_id}"), body)
+    return cassette
+
+
+def reset_caches() -> None:
+    geneset_cache.clear()
+    symbol_mapper.clear()
+
+
+def timed(label: str, coroutine) -> Dict:
+    started = time.perf_counter()
+    response = asyncio.run(coroutine)
+    elapsed = time.perf_counter() - started
+    result = response.result
+    error = result.get("Error") if isinstance(result, dict) else None
+    print(f"  {label:<28} {elapsed:8.3f} s{'  ERROR: ' + str(error) if error else ''}")
+    return result
+
+
+def run_benchmarks(geneset_ids: List[int], universe_size: int, num_trials: int) -> None:
+    universe = [f"Gene{i}" for i in range(universe_size)]
+    ba_ids = [f"GS{gs_id}" for gs_id in geneset_ids]
+    for run in ("cold", "warm"):
+        if run == "cold":
+            reset_caches()
+        print(f"{run} caches:")
+        timed("BooleanAlgebra intersect", BooleanAlgebra().run({"geneset_ids": ba_ids, "relation": "intersect"}))
+        timed("MSET pair", MSET().run({
+            "geneset_id_1": geneset_ids[0], "geneset_id_2": geneset_ids[1],
+            "background_genes_1": universe, "background_genes_2": universe, "num_trials": num_trials,
+        }))
+        timed("MSETMatrix", MSETMatrix().run({
+            "geneset_ids": geneset_ids, "background_genes": universe, "num_trials": num_trials,
+        }))
+    stats = geneset_cache.stats()
+    print(f"gene set cache: {stats['misses']} upstream calls, {stats['hits']} hits, {stats['shared']} shared")
+    print(f"symbol mapper: {symbol_mapper.hits} memo hits, {symbol_mapper.misses} mapped upstream "
+          f"in {symbol_mapper.batches} batches")
+
+
+def parse_latency(value: str):
+    if "," in value:
+        low, high = value.split(",", 1)
+        return float(low), float(high)
+    return float(value)
+
+
+def main() -> None:
+    """Build or load a cassette, install replay and run the benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark plugins against a replayed GeneWeaver API")
+    parser.add_argument("--cassette", help="Cassette to replay (or to write with --record)")
+    parser.add_argument("--record", action="store_true", help="Record --cassette from the live API for --geneset-ids")
+    parser.add_argument("--geneset-ids", type=int, nargs="+", help="Gene set IDs to run (default: synthetic ones)")
+    parser.add_argument("--genesets", type=int, default=20, help="Number of synthetic gene sets")
+    parser.add_argument("--genes", type=int, default=1000, help="Genes per synthetic gene set")
+    parser.add_argument("--universe", type=int, default=20000, help="Size of the synthetic gene universe")
+    parser.add_argument("--latency", type=parse_latency, default=0.05,
+                        help="Seconds per request, or low,high for a uniform range")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail with 503")
+    parser.add_argument("--num-trials", type=int, default=1000, help="MSET simulation trials")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.cassette or not args.geneset_ids:
+            parser.error("--record needs --cassette and --geneset-ids")
+        cassette = Cassette()
+        install_recorder(cassette)
+        for gs_id in args.geneset_ids:
+            fetchGeneSymbols_from_geneset(gs_id)
+        species_registry.ensure_loaded()
+        cassette.save(args.cassette)
+        print(f"Recorded {len(cassette.responses)} responses to {args.cassette}")
+        return
+
+    if args.cassette:
+        cassette = Cassette.load(args.cassette)
+        geneset_ids = args.geneset_ids
+        if not geneset_ids:
+            parser.error("--geneset-ids is required with --cassette")
+    else:
+        cassette = synthetic_cassette(args.genesets, args.genes, args.universe, args.seed)
+        geneset_ids = args.geneset_ids or list(range(1, args.genesets + 1))
+
+    adapter = install_replay(cassette, latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+    print(f"{len(geneset_ids)} gene sets, latency {args.latency}, error rate {args.error_rate}")
+    run_benchmarks(geneset_ids, args.universe, args.num_trials)
+    print(f"replayed {adapter.requests} requests ({adapter.errors} injected errors)")
+
+
+if __name__ == "__main__":
+    main()
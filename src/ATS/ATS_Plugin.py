@@ -3,14 +3,24 @@
 # Loads the plugin classes through the entry point in the pyproject.toml file.
 # Executes the plugin based on the input matching the tool class.
 
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional
 from abc import abstractmethod
+import copy
 import importlib.metadata
+import threading
+
+PLUGIN_GROUP = "jax.ats.plugins"
 
 class implement_plugins():
+    # Registry the tools are created from; the process-wide plugin_registry unless a subclass sets its own
+    registry: Optional["PluginRegistry"] = None
+
     def __init__(self):
         self.instance = None
 
+    def _registry(self) -> "PluginRegistry":
+        return self.registry if self.registry is not None else plugin_registry
+
     
     def load_plugins(self):
         """ This function loads the plugins through the entry points in our pypoetry.toml file.
@@ -20,16 +30,12 @@ class implement_plugins():
         returns: A dictionary of loaded plugins, the class name(as a string) of each as keys and class object as values.
         
         """
-        entry_points = importlib.metadata.entry_points(group="jax.ats.plugins")
+        registry = self._registry()
         plugins = {}
-        for ep in entry_points:
-            plugin_cls = ep.load()
-            plugin_instance = plugin_cls()
-            if isinstance(plugin_instance, implement_plugins): #implement_plugins is our interface for the plugins
-                plugins[plugin_cls.__name__] = plugin_instance
-            else:
-                # Potentially added to return object information
-                print(f"Warning: {ep.name} does not conform to plugin interface.")
+        for name in registry.names():
+            plugin_instance = registry.create(name)
+            if plugin_instance is not None:
+                plugins[name] = plugin_instance
         return plugins
         
     async def execute(self, input):
@@ -40,12 +46,18 @@ class implement_plugins():
         output: One of the JSON return objects. Depending on success or failure.
         """
 
-        LOADED_PLUGINS = self.load_plugins()
-
-        # Get specified plugin via input key "tool_type" representing the exact class name as a string in input dictionary
-        self.instance = LOADED_PLUGINS.get(input["tools_input"])
+        # Get specified plugin via input key "tool_type" representing the exact class name as a string in input dictionary.
+        # Only that plugin is imported, once per process, and every task gets its own instance.
+        # Subclasses that override load_plugins choose their plugins themselves.
+        if type(self).load_plugins is not implement_plugins.load_plugins:
+            self.instance = self.load_plugins().get(input["tools_input"])
+        else:
+            self.instance = self._registry().create(input["tools_input"])
         
         if self.instance:
+            # Status updates of the tool reach the listeners registered here
+            for listener in self.__dict__.get("_status_listeners", []):
+                self.instance.add_status_listener(listener)
             # Run the selected class with the input information.
             return await self.instance.run(input)
         else:
@@ -61,6 +73,27 @@ class implement_plugins():
     def status(self):
         """ This function must be implemented by any plugin which inherets this class implement_plugins"""
         pass
+    def add_status_listener(self, listener: Callable[[Any], None]) -> None:
+        """
+        Registers a function called with a snapshot of status() on every status update.
+
+        input: The listener. It is called from the thread running the tool, so it must be quick.
+        """
+        # Plugins do not call this class's __init__, so the list is created on first use
+        self.__dict__.setdefault("_status_listeners", []).append(listener)
+
+    def _emit_status(self) -> None:
+        """ Hands the registered listeners a snapshot of status(). Plugins call this from _update_status."""
+        listeners = self.__dict__.get("_status_listeners")
+        if not listeners:
+            return
+        snapshot = copy.deepcopy(self.status())
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"Status listener failed: {e}")
+
     # Get status class for front end interface call
     def get_status(self):
         """
@@ -75,3 +108,75 @@ class implement_plugins():
         else:
             return {"status": "Instance not yet initialized."} # Dictionary object, serializable
 
+
+class PluginRegistry():
+    """ Process-wide index of the plugins declared as entry points.
+
+    The entry points are scanned once, on first use. A plugin's module is imported the first
+    time its tool is requested, and create() makes a fresh instance of its class for every task,
+    so the cost of a task does not depend on how many plugins are installed.
+
+    input: The entry point group, and optionally a function returning its entry points (for tests).
+    """
+    def __init__(self, group: str = PLUGIN_GROUP, discover: Optional[Callable[[], List[Any]]] = None):
+        self.group = group
+        self._discover = discover or (lambda: importlib.metadata.entry_points(group=self.group))
+        self._entry_points: Optional[Dict[str, Any]] = None
+        self._classes: Dict[str, Optional[type]] = {}
+        self._registered: Dict[str, type] = {}
+        self._lock = threading.Lock()
+
+    def _index(self) -> Dict[str, Any]:
+        """ Tool name -> entry point; tools are named by their class name, read from the entry point without importing it."""
+        entry_points = self._entry_points
+        if entry_points is None:
+            with self._lock:
+                if self._entry_points is None:
+                    index = {}
+                    for ep in self._discover():
+                        index[ep.attr.split(".")[-1] if ep.attr else ep.name] = ep
+                    self._entry_points = index
+                entry_points = self._entry_points
+        return entry_points
+
+    def names(self) -> List[str]:
+        """ returns: The names of all declared plugins, without importing any of them."""
+        return list(dict.fromkeys([*self._index(), *self._registered]))
+
+    def register(self, name: str, plugin_cls: type) -> None:
+        """ Adds a plugin class that is not declared as an entry point, e.g. one defined at runtime."""
+        if not issubclass(plugin_cls, implement_plugins):
+            raise TypeError(f"{plugin_cls.__name__} does not conform to plugin interface.")
+        self._registered[name] = plugin_cls
+
+    def get_class(self, name: str) -> Optional[type]:
+        """ returns: The plugin class of the tool, imported on first use; None for unknown tools and classes that are not plugins."""
+        if name in self._registered:
+            return self._registered[name]
+        if name in self._classes:
+            return self._classes[name]
+        ep = self._index().get(name)
+        if ep is None:
+            return None
+        with self._lock:
+            if name not in self._classes:
+                plugin_cls = ep.load()
+                if not (isinstance(plugin_cls, type) and issubclass(plugin_cls, implement_plugins)): #implement_plugins is our interface for the plugins
+                    print(f"Warning: {ep.name} does not conform to plugin interface.")
+                    plugin_cls = None
+                self._classes[name] = plugin_cls
+            return self._classes[name]
+
+    def create(self, name: str) -> Optional["implement_plugins"]:
+        """ returns: A new instance of the tool's plugin class, or None if there is no such plugin."""
+        plugin_cls = self.get_class(name)
+        return plugin_cls() if plugin_cls is not None else None
+
+    def refresh(self) -> None:
+        """ Forget the scanned entry points, so newly installed plugins are found on next use."""
+        with self._lock:
+            self._entry_points = None
+            self._classes = {}
+
+
+plugin_registry = PluginRegistry()
@@ -0,0 +1,144 @@
+"""
+Execution backends for ATS tasks.
+
+ThreadBackend runs a task in the queue's worker thread, inside the API process; it suits
+tools that mostly wait on I/O. ProcessBackend runs tasks in a persistent pool of worker
+processes, so CPU-bound tools do not compete with request handling for the API
+process's GIL. Status updates a tool reports in a worker process are relayed back to
+the task in the API process through a queue, and results come back pickled and
+compressed.
+
+The pool has ATS_PROCESS_WORKERS processes (default: one per CPU), started with the
+ATS_PROCESS_START_METHOD method (default "spawn", as forking a threaded server is unsafe).
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from ATS.result_store import deserialize_result, serialize_result
+
+THREAD, PROCESS = "thread", "process"
+
+
+class ThreadBackend:
+    """Runs the task in the calling thread."""
+
+    name = THREAD
+
+    def run(self, task) -> Tuple[Any, Any]:
+        """Execute a TaskInstance; returns its result and final status."""
+        result = asyncio.run(task.ats.execute(task.data))
+        return result, task.ats.get_status()
+
+    def close(self) -> None:
+        pass
+
+
+# === Worker process side ===
+
+_status_queue = None
+
+
+def _init_worker(status_queue) -> None:
+    global _status_queue
+    _status_queue = status_queue
+
+
+def _run_in_worker(task_id: str, plugins_class, data: Dict[str, Any]) -> bytes:
+    """Execute a task in a worker process, relaying its status updates to the API process."""
+    instance = plugins_class()
+    instance.add_status_listener(lambda status: _status_queue.put((task_id, status)))
+    result = asyncio.run(instance.execute(data))
+    return serialize_result((result, instance.get_status()))
+
+
+# === API process side ===
+
+class ProcessBackend:
+    """
+    Runs tasks in a persistent pool of worker processes, created on first use.
+
+    Args:
+        max_workers: Worker processes; defaults to ATS_PROCESS_WORKERS or the CPU count.
+        start_method: multiprocessing start method; defaults to ATS_PROCESS_START_METHOD.
+    """
+
+    name = PROCESS
+
+    def __init__(self, max_workers: Optional[int] = None, start_method: Optional[str] = None):
+        if max_workers is None and os.environ.get("ATS_PROCESS_WORKERS"):
+            max_workers = int(os.environ["ATS_PROCESS_WORKERS"])
+        self.max_workers = max_workers
+        self.start_method = start_method or os.environ.get("ATS_PROCESS_START_METHOD", "spawn")
+        self._context = multiprocessing.get_context(self.start_method)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._status_queue = None
+        self._relay: Optional[threading.Thread] = None
+        self._running: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                if self._status_queue is None:
+                    self._status_queue = self._context.Queue()
+                    self._relay = threading.Thread(target=self._relay_status, args=(self._status_queue,),
+                                                   name="ats-status-relay", daemon=True)
+                    self._relay.start()
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=self._context,
+                                                 initializer=_init_worker, initargs=(self._status_queue,))
+            return self._pool
+
+    def _relay_status(self, queue) -> None:
+        """Hand status updates from the workers to their tasks, until close() sends None."""
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            task_id, status = item
+            task = self._running.get(task_id)
+            if task is not None:
+                task._on_status(status)
+
+    def run(self, task) -> Tuple[Any, Any]:
+        """Execute a TaskInstance in a worker process; returns its result and final status."""
+        task.remote = True
+        self._running[task.task_id] = task
+        try:
+            # The class, not the instance: the instance holds the API process's status listeners
+            future = self._get_pool().submit(_run_in_worker, task.task_id, type(task.ats), task.data)
+            return deserialize_result(future.result())
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for the next tasks
+            with self._lock:
+                pool, self._pool = self._pool, None
+            if pool is not None:
+                pool.shutdown(wait=False)
+            raise
+        finally:
+            self._running.pop(task.task_id, None)
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+            queue, self._status_queue = self._status_queue, None
+            relay, self._relay = self._relay, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        if queue is not None:
+            queue.put(None)
+            relay.join()
+            queue.close()
+
+
+def make_backend(name: str):
+    """Backend by name: "thread" or "process"."""
+    if name == THREAD:
+        return ThreadBackend()
+    if name == PROCESS:
+        return ProcessBackend()
+    raise ValueError(f"Unknown execution backend {name!r}, expected {THREAD!r} or {PROCESS!r}")
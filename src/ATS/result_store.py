@@ -0,0 +1,231 @@
+"""
+Storage for the results of finished tasks.
+
+Results are kept for a limited time (ATS_RESULT_TTL seconds) and within a memory budget
+(ATS_RESULT_MEMORY bytes). Results of at least ATS_RESULT_SPILL_SIZE bytes are
+compressed and written to ATS_RESULT_DIR (default: a temporary directory) as soon as
+they are stored, and once the budget is exceeded the oldest results in memory follow
+them. Spilled results are read back only when they are asked for and are not kept, so
+the memory held does not grow with the number of finished tasks.
+
+Sizes are measured on the pickled result.
+"""
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_TTL = float(os.environ.get("ATS_RESULT_TTL", 24 * 3600))
+DEFAULT_MEMORY_BUDGET = int(os.environ.get("ATS_RESULT_MEMORY", 256 * 1024 * 1024))
+DEFAULT_SPILL_SIZE = int(os.environ.get("ATS_RESULT_SPILL_SIZE", 1024 * 1024))
+
+COMPRESSION_LEVEL = 3
+
+
+def serialize_result(result: Any) -> bytes:
+    """Pickled and compressed result."""
+    return zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), COMPRESSION_LEVEL)
+
+
+def deserialize_result(data: bytes) -> Any:
+    return pickle.loads(zlib.decompress(data))
+
+
+class _Entry:
+    """A stored result: in memory as value, or on disk at path."""
+
+    def __init__(self, created: float, size: int, state: str, status: Any):
+        self.created = created
+        self.size = size
+        self.state = state
+        self.status = status
+        self.value: Any = None
+        self.path: Optional[str] = None
+
+
+class ResultStore:
+    """
+    Results of finished tasks by task ID, with TTL expiry and spill to disk.
+
+    Args:
+        ttl: Seconds a result is kept after it is stored.
+        memory_budget: Bytes of results kept in memory before the oldest are spilled.
+        spill_size: Results of this many bytes or more go to disk right away.
+        directory: Where spilled results are written; defaults to a temporary directory.
+        clock: Time source, replaceable in tests.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 spill_size: int = DEFAULT_SPILL_SIZE, directory: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.spill_size = spill_size
+        self.clock = clock
+        self._directory = os.environ.get("ATS_RESULT_DIR") if directory is None else directory
+        self._owns_directory = False
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._in_memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.spills = 0
+        self.loads = 0
+
+    def _path(self, task_id: str) -> str:
+        with self._lock:
+            if self._directory is None:
+                self._directory = tempfile.mkdtemp(prefix="ats-results-")
+                self._owns_directory = True
+            else:
+                os.makedirs(self._directory, exist_ok=True)
+            return os.path.join(self._directory, f"{task_id}.pkl.z")
+
+    def _write(self, task_id: str, data: bytes) -> str:
+        path = self._path(task_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def put(self, task_id: str, result: Any, state: str = "done", status: Any = None) -> None:
+        """
+        Store the result of a task, with its final state and status kept in memory alongside.
+        """
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        entry = _Entry(self.clock(), len(data), state, status)
+        if entry.size >= self.spill_size:
+            entry.path = self._write(task_id, zlib.compress(data, COMPRESSION_LEVEL))
+            self.spills += 1
+        else:
+            entry.value = result
+        del data
+        with self._lock:
+            self._remove(task_id)
+            self._entries[task_id] = entry
+            if entry.path is None:
+                self._in_memory[task_id] = entry
+                self._memory_bytes += entry.size
+            removed = self._expire()
+        self._delete_files(removed)
+        self._enforce_budget()
+
+    def _enforce_budget(self) -> None:
+        """Spill the oldest results in memory until the rest fit the budget."""
+        while True:
+            with self._lock:
+                if self._memory_bytes <= self.memory_budget or not self._in_memory:
+                    return
+                task_id, entry = next(iter(self._in_memory.items()))
+                # Claimed here, so a concurrent call spills the next one
+                del self._in_memory[task_id]
+                self._memory_bytes -= entry.size
+                value = entry.value
+            path = self._write(task_id, serialize_result(value))
+            with self._lock:
+                if self._entries.get(task_id) is entry:
+                    entry.path, entry.value = path, None
+                    self.spills += 1
+                    path = None
+            if path is not None:  # Removed while it was being written
+                self._delete_files([path])
+
+    def _remove(self, task_id: str) -> Optional[str]:
+        """Forget an entry (lock held); returns its file, which the caller deletes."""
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return None
+        if self._in_memory.pop(task_id, None) is not None:
+            self._memory_bytes -= entry.size
+        return entry.path
+
+    def _expire(self) -> list:
+        """Forget the entries past their TTL (lock held); returns their files."""
+        removed = []
+        deadline = self.clock() - self.ttl
+        while self._entries:
+            task_id, entry = next(iter(self._entries.items()))
+            if entry.created > deadline:
+                break
+            path = self._remove(task_id)
+            if path:
+                removed.append(path)
+        return removed
+
+    @staticmethod
+    def _delete_files(paths) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _entry(self, task_id: str) -> Optional[_Entry]:
+        with self._lock:
+            removed = self._expire()
+            entry = self._entries.get(task_id)
+        self._delete_files(removed)
+        return entry
+
+    def __contains__(self, task_id: str) -> bool:
+        return self._entry(task_id) is not None
+
+    def get(self, task_id: str, default: Any = None) -> Any:
+        """The stored result, read back from disk if it was spilled; default if there is none."""
+        entry = self._entry(task_id)
+        if entry is None:
+            return default
+        with self._lock:
+            value, path = entry.value, entry.path
+        if path is None:
+            return value
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:  # Expired meanwhile
+            return default
+        self.loads += 1
+        return deserialize_result(data)
+
+    def get_state(self, task_id: str) -> Optional[str]:
+        entry = self._entry(task_id)
+        return entry.state if entry else None
+
+    def get_status(self, task_id: str, default: Any = None) -> Any:
+        """The task's last status before it finished."""
+        entry = self._entry(task_id)
+        return entry.status if entry else default
+
+    def delete(self, task_id: str) -> None:
+        with self._lock:
+            path = self._remove(task_id)
+        if path:
+            self._delete_files([path])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_memory": len(self._in_memory),
+                "memory_bytes": self._memory_bytes,
+                "on_disk": len(self._entries) - len(self._in_memory),
+                "spills": self.spills,
+                "loads": self.loads,
+            }
+
+    def close(self) -> None:
+        """Forget every result and remove the spill directory if the store created it."""
+        with self._lock:
+            paths = [entry.path for entry in self._entries.values() if entry.path]
+            self._entries.clear()
+            self._in_memory.clear()
+            self._memory_bytes = 0
+            directory, owned = self._directory, self._owns_directory
+        self._delete_files(paths)
+        if owned and directory:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,420 @@
+"""
+Task execution for the ATS service.
+
+Every tool has its own queue and a fixed number of worker threads, so a burst of
+submissions waits in line instead of starting a thread per task. The queues are
+bounded: a submission to a full queue is refused with QueueFullError, which carries an
+estimate of how many seconds to wait before retrying.
+
+Concurrency per tool comes from ATS_TOOL_CONCURRENCY (e.g. "MSET=2,Boolean=4"), with
+ATS_DEFAULT_CONCURRENCY for the tools it does not name; ATS_MAX_QUEUE is the number of
+tasks a tool's queue holds besides the running ones.
+
+Each tool runs on an execution backend (see ATS.backends): ATS_TOOL_BACKEND names it per
+tool (e.g. "MSET=process,Boolean=thread") and ATS_DEFAULT_BACKEND for the others. Without
+ATS_TOOL_BACKEND the CPU-bound MSET tools run on the process backend and every other tool,
+e.g. the I/O-bound BooleanAlgebra, on the thread backend.
+
+Finished tasks are handed to a ResultStore with their final status, and only queued
+and running tasks are kept by the manager itself.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from ATS.backends import PROCESS, THREAD, ThreadBackend, make_backend
+from ATS.result_store import ResultStore
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+DEFAULT_CONCURRENCY = int(os.environ.get("ATS_DEFAULT_CONCURRENCY", 2))
+DEFAULT_MAX_QUEUE = int(os.environ.get("ATS_MAX_QUEUE", 100))
+DEFAULT_BACKEND = os.environ.get("ATS_DEFAULT_BACKEND", THREAD)
+# Backends of the tools ATS_TOOL_BACKEND does not configure
+DEFAULT_TOOL_BACKENDS = {"MSET": PROCESS, "MSETMatrix": PROCESS}
+# Seconds a task is assumed to take before any task of its tool has finished
+DEFAULT_TASK_SECONDS = 5.0
+
+
+def parse_tool_settings(value: str) -> Dict[str, str]:
+    """Parse "tool=value,tool=value" into a dictionary."""
+    settings = {}
+    for item in value.split(","):
+        if item.strip():
+            tool, setting = item.split("=", 1)
+            settings[tool.strip()] = setting.strip()
+    return settings
+
+
+def parse_concurrency(value: str) -> Dict[str, int]:
+    """Parse "tool=workers,tool=workers" into a dictionary."""
+    return {tool: int(workers) for tool, workers in parse_tool_settings(value).items()}
+
+
+class QueueFullError(Exception):
+    """Raised when a tool's queue is full; retry_after is the suggested wait in seconds."""
+
+    def __init__(self, tool: str, retry_after: int):
+        super().__init__(f"Too many queued {tool} tasks, retry in {retry_after} s")
+        self.tool = tool
+        self.retry_after = retry_after
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable, *args) -> None:
+    """Schedule callback on a loop from any thread; loops closed meanwhile are skipped."""
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        pass
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+class TaskInstance:
+    """
+    One submitted task: the plugin entry point, its input and, once run, its result.
+
+    Event loops wait for the task with wait_done and follow its status with events, so
+    waiting clients cost a future or a queue each, not a thread.
+
+    Args:
+        task_id: ID the task is known by.
+        instance: The implement_plugins instance executing the task.
+        data: Tool input; "tools_input" names the tool.
+        on_finish: Optional; called with the task, its result, final state and final
+            status once it has run. The task keeps the result only without it.
+        backend: Optional; executes the task, ThreadBackend by default.
+    """
+
+    def __init__(self, task_id: str, instance, data: Dict[str, Any],
+                 on_finish: Optional[Callable[["TaskInstance", Any, str, Any], None]] = None,
+                 backend=None):
+        self.task_id = task_id
+        self.ats = instance
+        self.data = data
+        self.tool = data.get("tools_input")
+        self.state = QUEUED
+        self.result = None
+        self.final_status = None
+        # Tasks run in another process report their status only through _on_status
+        self.remote = False
+        self.last_status = None
+        self.on_finish = on_finish
+        self.backend = backend if backend is not None else ThreadBackend()
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        add_listener = getattr(instance, "add_status_listener", None)
+        if add_listener is not None:
+            add_listener(self._on_status)
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        with self.lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            _call_soon(loop, queue.put_nowait, event)
+
+    def _on_status(self, status) -> None:
+        self.last_status = status
+        self._publish({"event": "status", "state": self.state, "status": status})
+
+    def run(self) -> None:
+        with self.lock:
+            self.state = RUNNING
+            self.started = time.monotonic()
+        self._publish({"event": "status", "state": RUNNING, "status": self.get_status()})
+        try:
+            result, status = self.backend.run(self)
+            state = DONE
+        except Exception as e:
+            result, status, state = {"error": str(e)}, self.get_status(), FAILED
+        self.last_status = self.final_status = status
+        if self.on_finish is not None:
+            try:
+                self.on_finish(self, result, state, status)
+                result = None
+            except Exception as e:
+                # Keep the result on the task, where get_result still finds it
+                print(f"Storing the result of task {self.task_id} failed: {e}")
+        with self.lock:
+            self.result = result
+            self.state = state
+            self.finished = time.monotonic()
+            self.done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            _call_soon(loop, _resolve, future)
+        self._publish({"event": "done", "state": state, "status": status})
+
+    def get_status(self):
+        with self.lock:
+            if self.ats is None:
+                return self.final_status
+            if self.remote and self.last_status is not None:
+                return self.last_status
+            return self.ats.get_status()
+
+    def get_result(self, timeout: Optional[float] = None):
+        """Wait for the task to finish (at most timeout seconds) and return its result."""
+        self.done.wait(timeout)
+        with self.lock:
+            return self.result
+
+    async def wait_done(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the task to finish without blocking the event loop; False on timeout."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if self.done.is_set():
+                return True
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self.lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    async def events(self, heartbeat: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        The current status, then every status update until the task is done.
+
+        Events are dictionaries with "event" ("status", "done" or, after heartbeat seconds
+        without an update, "heartbeat"), "state" and "status".
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        subscriber = (loop, queue)
+        with self.lock:
+            done = self.done.is_set()
+            if not done:
+                self._subscribers.append(subscriber)
+        try:
+            yield {"event": "done" if done else "status", "state": self.state, "status": self.get_status()}
+            while not done:
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    event = {"event": "heartbeat", "state": self.state, "status": None}
+                done = event["event"] == "done"
+                yield event
+        finally:
+            with self.lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+
+
+class _ToolQueue:
+    """Pending tasks of one tool and the worker threads running them."""
+
+    def __init__(self, tool: str, concurrency: int, max_queue: int):
+        self.tool = tool
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.pending: Deque[TaskInstance] = deque()
+        self.running = 0
+        self.task_seconds: Optional[float] = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers: List[threading.Thread] = []
+
+    def submit(self, task: TaskInstance) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Task manager is shut down")
+            # Room for a task on every worker plus max_queue waiting ones
+            if self.running + len(self.pending) >= self.concurrency + self.max_queue:
+                raise QueueFullError(self.tool, self._retry_after())
+            self.pending.append(task)
+            if len(self._workers) < self.concurrency and len(self.pending) > self._idle():
+                worker = threading.Thread(target=self._work, name=f"ats-{self.tool}-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._cond.notify()
+
+    def _idle(self) -> int:
+        return len(self._workers) - self.running
+
+    def _retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up, from the average task duration."""
+        task_seconds = self.task_seconds if self.task_seconds is not None else DEFAULT_TASK_SECONDS
+        return max(1, math.ceil(task_seconds / self.concurrency))
+
+    def position(self, task: TaskInstance) -> int:
+        """1-based position of the task in the queue; 0 once it is running or done."""
+        with self._cond:
+            for index, pending in enumerate(self.pending):
+                if pending is task:
+                    return index + 1
+        return 0
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self.pending and not self._closed:
+                    self._cond.wait()
+                if not self.pending:
+                    return
+                task = self.pending.popleft()
+                self.running += 1
+            task.run()
+            with self._cond:
+                self.running -= 1
+                duration = task.finished - task.started
+                # Exponential moving average, so the estimate follows the current load
+                self.task_seconds = duration if self.task_seconds is None else 0.8 * self.task_seconds + 0.2 * duration
+
+    def close(self, wait: bool) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+
+class TaskManager:
+    """
+    Runs tasks on bounded per-tool queues and keeps them by ID.
+
+    Args:
+        concurrency: tool -> number of tasks of that tool run at once; defaults to
+            ATS_TOOL_CONCURRENCY.
+        default_concurrency: Tasks run at once for tools not in concurrency.
+        max_queue: Tasks a tool's queue holds before submissions are refused.
+        results: Store for the results of finished tasks; a ResultStore configured from
+            the environment by default.
+        backends: tool -> "thread" or "process"; defaults to ATS_TOOL_BACKEND, or
+            DEFAULT_TOOL_BACKENDS if that is not set.
+        default_backend: Backend of the tools not in backends.
+    """
+
+    def __init__(self, concurrency: Optional[Dict[str, int]] = None,
+                 default_concurrency: int = DEFAULT_CONCURRENCY, max_queue: int = DEFAULT_MAX_QUEUE,
+                 results: Optional[ResultStore] = None, backends: Optional[Dict[str, str]] = None,
+                 default_backend: str = DEFAULT_BACKEND):
+        if concurrency is None:
+            concurrency = parse_concurrency(os.environ.get("ATS_TOOL_CONCURRENCY", ""))
+        if backends is None:
+            backends = parse_tool_settings(os.environ.get("ATS_TOOL_BACKEND", "")) or dict(DEFAULT_TOOL_BACKENDS)
+        self.backends = backends
+        self.default_backend = default_backend
+        # One instance per backend kind, shared by the tools using it
+        self._backend_instances: Dict[str, Any] = {}
+        self.concurrency = concurrency
+        self.default_concurrency = default_concurrency
+        self.max_queue = max_queue
+        self.tasks: Dict[str, TaskInstance] = {}
+        self.results = results if results is not None else ResultStore()
+        self._queues: Dict[str, _ToolQueue] = {}
+        self._lock = threading.Lock()
+
+    def _queue(self, tool: str) -> _ToolQueue:
+        with self._lock:
+            queue = self._queues.get(tool)
+            if queue is None:
+                workers = self.concurrency.get(tool, self.default_concurrency)
+                queue = self._queues[tool] = _ToolQueue(tool, workers, self.max_queue)
+            return queue
+
+    def _backend(self, tool: str):
+        name = self.backends.get(tool, self.default_backend)
+        with self._lock:
+            backend = self._backend_instances.get(name)
+            if backend is None:
+                backend = self._backend_instances[name] = make_backend(name)
+            return backend
+
+    def create_task(self, instance, data) -> str:
+        """
+        Queue a task.
+
+        Raises:
+            QueueFullError if the tool's queue is full.
+        """
+        task_id = str(uuid.uuid4())
+        task = TaskInstance(task_id, instance, data, on_finish=self._finish,
+                            backend=self._backend(data.get("tools_input")))
+        self.tasks[task_id] = task
+        try:
+            self._queue(task.tool).submit(task)
+        except Exception:
+            del self.tasks[task_id]
+            raise
+        return task_id
+
+    def _finish(self, task: TaskInstance, result, state: str, status) -> None:
+        # Stored before the task is dropped, so the result is always in one of the two places
+        self.results.put(task.task_id, result, state=state, status=status)
+        self.tasks.pop(task.task_id, None)
+        task.ats = task.data = None
+
+    def get_status(self, task_id: str):
+        task = self.tasks.get(task_id)
+        if task:
+            return task.get_status()
+        return self.results.get_status(task_id, "Invalid Task ID")
+
+    def get_progress(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """State of the task and its position in its tool's queue (0 once started); None for unknown IDs."""
+        task = self.tasks.get(task_id)
+        if task is None:
+            state = self.results.get_state(task_id)
+            return {"state": state, "queue_position": 0} if state else None
+        position = self._queue(task.tool).position(task) if task.state == QUEUED else 0
+        return {"state": task.state, "queue_position": position}
+
+    async def wait(self, task_id: str, timeout: Optional[float] = None) -> Optional[bool]:
+        """Wait for a task to finish: True once it has, False on timeout, None for unknown IDs."""
+        task = self.tasks.get(task_id)
+        if task is None:
+            return True if self.results.get_state(task_id) else None
+        return await task.wait_done(timeout)
+
+    async def status_events(self, task_id: str, heartbeat: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """TaskInstance.events of a task; a single "done" event for finished tasks, none for unknown IDs."""
+        task = self.tasks.get(task_id)
+        if task is None:
+            state = self.results.get_state(task_id)
+            if state:
+                yield {"event": "done", "state": state, "status": self.results.get_status(task_id)}
+            return
+        async for event in task.events(heartbeat):
+            yield event
+
+    def get_result(self, task_id: str):
+        task = self.tasks.get(task_id)
+        if task:
+            task.done.wait()
+            return self.results.get(task_id, task.result)
+        return self.results.get(task_id, "Invalid Task ID")
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting tasks; the workers finish the queued ones and exit."""
+        with self._lock:
+            queues = list(self._queues.values())
+        for queue in queues:
+            queue.close(wait)
+        if wait:
+            with self._lock:
+                backends = list(self._backend_instances.values())
+            for backend in backends:
+                backend.close()
+            self.results.close()
@@ -1,16 +1,22 @@
-import asyncio
+import json
 import os,shutil
 from typing import Literal, Optional, List, Callable
-from threading import Thread, Lock
-import uuid, inspect
+import inspect
 
 import starlette.datastructures
-from starlette.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
 
 from ATS import ATS_Plugin
+from ATS.task_manager import QueueFullError, TaskManager
+from utils.gene_helpers import iter_genes_from_gw, iter_file_object_lines
+from utils.background_cache import background_cache
+from plugins.api.response_cache import geneset_cache
+from plugins.BooleanAlgebra.encoding import result_view
 
 import yaml
 from fastapi import FastAPI, UploadFile, File, Form, Depends
+from fastapi.encoders import jsonable_encoder
 
 from pydantic import BaseModel
 
@@ -22,6 +28,8 @@ class LoadPluginModel(BaseModel):
     gene_set_ids: Optional[List[str]] = list
 
 UPLOAD_DIR = os.getcwd()
+# Seconds between keep-alive events on idle status streams
+STATUS_HEARTBEAT_SECONDS = 15
 
 app = FastAPI()
 
@@ -40,53 +48,20 @@ def parse_metadata(
 ):
     return LoadPluginModel(tool_type=tool_type, num_trials=num_trials, print_to_cli=print_to_cli, gene_set_ids=gene_set_ids, relation=relation, at_least=at_least)
 
-class TaskInstance:
-    def __init__(self, instance,data):
-        self.result = None
-        self.lock = Lock()
-        self.ats=instance
-        self.data = data
-        self.thread = Thread(target=self.run)
-        self.thread.start()
-
-    def run(self):
-        self.result = asyncio.run(self.ats.execute(self.data))
-
-    def get_status(self):
-        with self.lock:
-            return self.ats.get_status()
-
-    def get_result(self):
-        self.thread.join()
-        with self.lock:
-            return self.result
-
-
-class TaskManager:
-    def __init__(self):
-        self.tasks = {}
-
-    def create_task(self,instance, data) -> str:
-        task_id = str(uuid.uuid4())
-        self.tasks[task_id] = TaskInstance(instance,data)
-        return task_id
-
-    def get_status(self, task_id: str) -> str:
-        task = self.tasks.get(task_id)
-        if task:
-            re=task.get_status()
-            print(re)
-            return re
-        return "Invalid Task ID"
-
-    def get_result(self, task_id: str):
-        task = self.tasks.get(task_id)
-        if task:
-            return task.get_result()
-        return "Invalid Task ID"
-
-
-def constructInput(input,bgFile,upFiles):
+# Streaming parsers that turn an uploaded gene file straight into genes, keyed by the
+# parser name given in the tools yaml. Backgrounds go through the content-hash cache,
+# so a background uploaded before is only hashed, not parsed again.
+UPLOAD_PARSERS = {
+    "gw": lambda file_obj: list(iter_genes_from_gw(iter_file_object_lines(file_obj))),
+    "bg": background_cache.load_file_object,
+}
+
+def parse_upload(upload: UploadFile, parser: str):
+    """Parse an uploaded gene file chunk by chunk, without writing it to disk."""
+    return UPLOAD_PARSERS[parser](upload.file)
+
+
+def constructInput(input,bgGenes,upGenes):
     from collections import defaultdict
     dic=defaultdict(lambda:None)
     tools_yaml_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools.yaml")
@@ -99,13 +74,14 @@ def constructInput(input,bgFile,upFiles):
     geneids="geneset_id_"
     for items in reqInputs:
         if items=="background_file_path":
-            dic[items]=bgFile[0] if len(bgFile)!=0 else None
+            # One parsed background, shared by both groups
+            dic["background_genes_1"]=dic["background_genes_2"]=bgGenes[0] if len(bgGenes)!=0 else None
         elif filePath in items or geneids in items:
             tt=items.split("_")
             if geneids in items:
                 dic[items]=input.gene_set_ids[int(tt[-1])-1]  if len(input.gene_set_ids)>int(tt[-1])-1 else None
             else:
-                dic[items]=upFiles[int(tt[-1])-1] if len(upFiles)>int(tt[-1])-1 else None
+                dic["genes_"+tt[-1]]=upGenes[int(tt[-1])-1] if len(upGenes)>int(tt[-1])-1 else None
         elif items=="relation":
             dic[items]=input.relation
         elif items=="at_least":
@@ -122,30 +98,29 @@ def constructInputNew(tool,dic):
 
 task_manager = TaskManager()
 
+def queue_full_response(error: QueueFullError) -> JSONResponse:
+    """429 for a submission to a full tool queue, telling the client when to retry."""
+    return JSONResponse(status_code=429, content={"error": str(error), "retry_after": error.retry_after},
+                        headers={"Retry-After": str(error.retry_after)})
+
 @app.post("/load_plugin/")
 async def load_plugin(input: LoadPluginModel=Depends(parse_metadata),files: Optional[List[UploadFile]] = File([]),bgFiles: Optional[List[UploadFile]] = File([])):
     try:
-        upFiles,bgUpFiles=[],[]
-        for ff in files:
-            file_path = os.path.join(UPLOAD_DIR, ff.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(ff.file, buffer)
-            upFiles.append(file_path)
-
-        for ff in bgFiles:
-            file_path = os.path.join(UPLOAD_DIR, ff.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(ff.file, buffer)
-            bgUpFiles.append(file_path)
+        # Parse the uploads as they stream in instead of writing them to disk first,
+        # off the event loop since parsing is CPU-bound
+        upGenes=[await run_in_threadpool(parse_upload,ff,"gw") for ff in files]
+        bgUpGenes=[await run_in_threadpool(parse_upload,ff,"bg") for ff in bgFiles]
 
         # Retrieve plugin class instance
         imp_plugins = ATS_Plugin.implement_plugins()
 
         if imp_plugins:
-            toolInput=constructInput(input,bgUpFiles,upFiles)
+            toolInput=constructInput(input,bgUpGenes,upGenes)
             task_id=task_manager.create_task(imp_plugins,toolInput)
         else:
             raise ValueError(f'Unknown plugin type:{input.get("tool_type")}')
+    except QueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
         print(e)
         return {"error": e}
@@ -153,13 +128,58 @@ async def load_plugin(input: LoadPluginModel=Depends(parse_metadata),files: Opti
 
 @app.get("/status/{task_id}")
 def get_status(task_id: str):
-    return {"task_id": task_id, "status": task_manager.get_status(task_id)}
+    # state and queue_position tell a queued task from a running one
+    progress = task_manager.get_progress(task_id) or {}
+    return {"task_id": task_id, "status": task_manager.get_status(task_id), **progress}
 
-@app.get("/result/{task_id}")
-def get_result(task_id: str):
+@app.get("/status/{task_id}/events")
+async def stream_status(task_id: str):
+    """Server-sent events: the task's status, then every update the tool reports until it is done."""
+    if task_manager.get_progress(task_id) is None:
+        return JSONResponse(status_code=404, content={"task_id": task_id, "error": "Invalid Task ID"})
+
+    async def events():
+        async for event in task_manager.status_events(task_id, heartbeat=STATUS_HEARTBEAT_SECONDS):
+            data = json.dumps(jsonable_encoder({"task_id": task_id, "state": event["state"], "status": event["status"]}))
+            yield f"event: {event['event']}\ndata: {data}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def result_response(task_id: str, fields: Optional[str], format: str, cursor: Optional[str], limit: Optional[int]):
+    """The /result body, JSON encoded; runs in the threadpool, as loading and encoding a large result takes a while."""
     result = task_manager.get_result(task_id)
-    print(result)
-    return {"task_id": task_id, "result": result}
+    if fields is None and format == "full" and cursor is None and limit is None:
+        return jsonable_encoder({"task_id": task_id, "result": result})
+    try:
+        field_list = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+        view = result_view(result, field_list, compact=format == "compact", cursor=cursor, limit=limit)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"task_id": task_id, "error": str(e)})
+    return jsonable_encoder({"task_id": task_id, "result": view})
+
+@app.get("/result/{task_id}")
+async def get_result(task_id: str, fields: Optional[str] = None, format: Literal["full", "compact"] = "full",
+                     cursor: Optional[str] = None, limit: Optional[int] = None, timeout: Optional[float] = None):
+    """
+    Result of a task. Boolean Algebra results can be narrowed down: fields is a comma
+    separated list of output fields ("summary" for the counts only), format=compact
+    encodes gene lists as references into gene and gene set tables, and limit/cursor
+    page through one gene list.
+
+    Without timeout the request waits until the task is done. With it, a task still
+    running after timeout seconds is answered with 202 and its progress, so clients
+    long-poll instead of polling /status.
+    """
+    if await task_manager.wait(task_id, timeout) is False:
+        return JSONResponse(status_code=202, content={"task_id": task_id, **(task_manager.get_progress(task_id) or {})})
+    return await run_in_threadpool(result_response, task_id, fields, format, cursor, limit)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    # The geneset cache of this process; tools on the process backend fill the caches of the
+    # worker processes instead, which are not counted here
+    return {"geneset_cache": geneset_cache.stats(), "result_store": task_manager.results.stats(),
+            "backends": {"default": task_manager.default_backend, **task_manager.backends}}
 
 with open("tools_new.yaml", "r") as f:
     tools_config = yaml.safe_load(f)
@@ -168,26 +188,54 @@ with open("tools_new.yaml", "r") as f:
 type_map = {
     "str": str,
     "int": int,
+    "float": float,
     "List<str>": List[str],
     "bool": bool,
     "UploadFile": UploadFile,
+    "List<UploadFile>": List[UploadFile],
 }
 
 def make_endpoint(tool: str, params: list) -> Callable:
+    # Upload parameters parsed into genes on arrival: name -> (parser, input key for the genes)
+    upload_parsers = {p["name"]: (p["parser"], p["target"]) for p in params if "parser" in p}
+
     # Create async handler
     async def endpoint_func(**kwargs):
         # inputt=constructInputNew(tool,dict(kwargs))
-        for key,values in kwargs.items():
+        parsed, parsed_keys = {}, set()
+        for key,values in list(kwargs.items()):
             print(key)
-            if type(values)==starlette.datastructures.UploadFile:
+            if key in upload_parsers and values:
+                parser, target = upload_parsers[key]
+                parsed_keys.add(key)
+                if type(values)==list:
+                    # (file name, genes) pairs in upload order: several uploads may share a file name
+                    parsed[target] = [(upload.filename, await run_in_threadpool(parse_upload, upload, parser)) for upload in values]
+                    kwargs[key] = [upload.filename for upload in values]
+                else:
+                    parsed[target] = await run_in_threadpool(parse_upload, values, parser)
+                    kwargs[key] = values.filename
+            elif type(values)==starlette.datastructures.UploadFile:
                 file_path = os.path.join(UPLOAD_DIR, values.filename)
                 with open(file_path, "wb") as buffer:
                     shutil.copyfileobj(values.file, buffer)
                 kwargs[key]=values.filename
+            elif type(values)==list and values and all(type(v)==starlette.datastructures.UploadFile for v in values):
+                for upload in values:
+                    file_path = os.path.join(UPLOAD_DIR, upload.filename)
+                    with open(file_path, "wb") as buffer:
+                        shutil.copyfileobj(upload.file, buffer)
+                kwargs[key]=[upload.filename for upload in values]
         kwargs["tools_input"]=tool
         imp_plugins = ATS_Plugin.implement_plugins()
         if imp_plugins:
-            task_id=task_manager.create_task(imp_plugins,kwargs)
+            # Parsed uploads reach the plugin as genes; their file names are only echoed back
+            toolInput={key: value for key, value in kwargs.items() if key not in parsed_keys}
+            toolInput.update(parsed)
+            try:
+                task_id=task_manager.create_task(imp_plugins,toolInput)
+            except QueueFullError as e:
+                return queue_full_response(e)
         else:
             raise ValueError(f'Unknown plugin type:{tool}')
         return JSONResponse(content={"tool": tool, "received": kwargs,"task_id":task_id})
@@ -196,7 +244,7 @@ def make_endpoint(tool: str, params: list) -> Callable:
     param_defs = {}
     for p in params:
         param_type = type_map.get(p["type"])
-        default_value = File(None) if param_type == UploadFile else Form(None)
+        default_value = File(None) if param_type in (UploadFile, List[UploadFile]) else Form(None)
         param_defs[p["name"]] = inspect.Parameter(
             p["name"],
             inspect.Parameter.POSITIONAL_OR_KEYWORD,
@@ -1,8 +1,10 @@
 """
 Tool Class Definition for Boolean Algebra. See service.py for the heavy lifting.
 """
+import asyncio
 import json
 from plugins.BooleanAlgebra import service
+from plugins.BooleanAlgebra.expression import ExpressionError, compile_expression
 from ATS import ATS_Plugin
 from dataclasses import dataclass
 from typing import Any, Dict
@@ -44,12 +46,14 @@ class BooleanAlgebra(ATS_Plugin.implement_plugins):
 
     def _update_status(self, message: str) -> None:
         self._status.message = message
+        self._emit_status()
 
     async def run(self, input_data: Dict[str, Any]) -> Response:
         # Extract parameters from input_data
         self._parameters = {
             'BooleanAlgebra_Relation': input_data.get('relation', 'intersect'),
-            'at_least': input_data.get('at_least', 2)
+            'at_least': input_data.get('at_least', 2),
+            'expression': input_data.get('expression'),
         }
         
         # Extract geneset IDs from input_data
@@ -61,6 +65,19 @@ class BooleanAlgebra(ATS_Plugin.implement_plugins):
         
         # Strip 'GS' from gsids arguments to get ode gene ids
         geneset_ids = [g[2:] for g in self._gsids]
+
+        # Expression mode: compile the set expression; it names the gene sets if none were given
+        plan = None
+        if relation == 'expression':
+            try:
+                plan = compile_expression(self._parameters['expression'] or '')
+            except ExpressionError as e:
+                return Response(result={"Error": f"Invalid expression: {e}"})
+            if not geneset_ids:
+                geneset_ids = plan.geneset_ids
+            unknown = [gs_id for gs_id in plan.geneset_ids if gs_id not in geneset_ids]
+            if unknown:
+                return Response(result={"Error": f"Expression uses gene sets not in geneset_ids: {', '.join(unknown)}"})
         
         self._update_status("Boolean Algebra Tool Running")
         
@@ -84,15 +101,26 @@ class BooleanAlgebra(ATS_Plugin.implement_plugins):
             'numGS': len(geneset_ids),
         }
         
-        # Species for tool results page
-        all_species_short, all_species_full = service.get_all_geneweaver_species_for_boolean()
+        self._update_status("Fetching gene sets")
+
+        # Species for tool results page, and every gene set in one concurrent pass
+        (all_species_short, all_species_full), (genesets, fetch_errors) = await asyncio.gather(
+            service.get_all_geneweaver_species_for_boolean_async(),
+            service.fetch_genesets(geneset_ids),
+        )
+        if fetch_errors:
+            result_dict['fetch_errors'] = fetch_errors
+            if len(fetch_errors) == len(geneset_ids):
+                self._update_status("Boolean Algebra Tool Failed")
+                return Response(result={"Error": "None of the gene sets could be fetched",
+                                        "fetch_errors": fetch_errors})
+
         # Species for tool run
-        species_in_genesets = service.get_species_in_genesets(geneset_ids)
-        
-        self._update_status("Fetching homolog data")
+        species_in_genesets = service.get_species_in_genesets(geneset_ids, genesets=genesets)
         
         # Get gene data
-        homolog_data = service.get_homologs_for_geneset(geneset_ids, species_ids=species_in_genesets)
+        homolog_data = service.get_homologs_for_geneset(geneset_ids, species_ids=species_in_genesets,
+                                                        genesets=genesets)
         bool_results = service.group_homologs(homolog_data, species_in_genesets)
 
         # Geneset Ids returned in the query
@@ -112,11 +140,17 @@ class BooleanAlgebra(ATS_Plugin.implement_plugins):
             'bool_results': bool_results,
         })
 
+        if plan is not None:
+            self._update_status("Evaluating expression")
+            # The genes the expression selects, in the bool_results format
+            result_dict['expression'] = plan.expression
+            result_dict['bool_results'] = plan.evaluate(bool_results)
+
     
         # Initialize intersection_sizes as empty
         intersection_sizes = {}
         
-        if relation != 'union':
+        if relation not in ('union', 'expression'):
             self._update_status("Computing intersection")
             # In case of Intersect, create dictionary of only
             # elements in bool_results with > than intersect
@@ -137,30 +171,14 @@ class BooleanAlgebra(ATS_Plugin.implement_plugins):
         # A. the number of genes unique to each species
         # B. the number of genes/species/intersection
         # B. the number of genes per species
-        bool_cluster_raw = service.cluster_genes(homolog_data, species_in_genesets)
-        
-        # Convert bool_cluster to only include counts instead of actual gene values
-        bool_cluster_counts = {}
-        for species_id, data in bool_cluster_raw.items():
-            bool_cluster_counts[species_id] = {
-                'unique': len(data['unique']),
-                'species': len(data['species'])
-            }
-            
-            # Calculate the correct intersection count based on intersection_sizes
-            if intersection_sizes:
-                # Count the total number of genes in all intersection groups
-                total_intersection_genes = 0
-                for size, group in intersection_sizes.items():
-                    # Count the number of genes in each group
-                    for gene_id, gene_data in group.items():
-                        total_intersection_genes += 1
-                
-                # Set the intersection count for this species
-                bool_cluster_counts[species_id]['intersection'] = total_intersection_genes
-            else:
-                # If no intersection_sizes (e.g., for union operation), use the raw intersection count
-                bool_cluster_counts[species_id]['intersection'] = len(data['intersection'])
+        # Only the sizes are reported, so the gene lists themselves are never built
+        bool_cluster_counts = service.cluster_gene_counts(homolog_data, species_in_genesets)
+
+        if intersection_sizes:
+            # The total number of genes in all intersection groups replaces the per-species count
+            total_intersection_genes = sum(len(group) for group in intersection_sizes.values())
+            for counts in bool_cluster_counts.values():
+                counts['intersection'] = total_intersection_genes
         
         result_dict['bool_cluster'] = bool_cluster_counts
 
@@ -0,0 +1,230 @@
+"""
+Compact encoding and partial views of Boolean Algebra results.
+
+boolean_algebra_output repeats a full (gene_id, ref_id, species_id, gs_id) tuple for
+every gene of every group in bool_results, intersect_results and bool_except, and
+carries the styling constants with every result. The compact encoding stores every
+distinct gene (gene_id, ref_id, species_id) and gene set once, in tables, and every
+group entry as [gene key, [[gene, gene set], ...]] with integer references into them.
+
+Views select fields of a result and page through one gene list at a time, so clients
+can fetch the summary counts first and the gene lists only when they need them.
+"""
+import base64
+import binascii
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+COMPACT_FORMAT = "compact-v1"
+
+# Styling constants, the same for every run; selected together as the "styles" field
+STYLE_FIELDS = ("tt", "colors", "bg", "borders")
+# Gene lists; bool_results maps gene key -> tuples, the others group -> gene key -> tuples
+GENE_FIELDS = ("bool_results", "intersect_results", "bool_except")
+GROUPED_GENE_FIELDS = ("intersect_results", "bool_except")
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+# === Compact encoding ===
+
+class _Tables:
+    """Gene and gene set tables, filled as entries are encoded."""
+
+    def __init__(self):
+        self.genes: List[List] = []
+        self.genesets: List = []
+        self._gene_index: Dict[Tuple, int] = {}
+        self._geneset_index: Dict[Any, int] = {}
+
+    def gene(self, gene_id, ref_id, species_id) -> int:
+        key = (gene_id, ref_id, species_id)
+        index = self._gene_index.get(key)
+        if index is None:
+            index = self._gene_index[key] = len(self.genes)
+            self.genes.append([gene_id, ref_id, species_id])
+        return index
+
+    def geneset(self, gs_id) -> int:
+        index = self._geneset_index.get(gs_id)
+        if index is None:
+            index = self._geneset_index[gs_id] = len(self.genesets)
+            self.genesets.append(gs_id)
+        return index
+
+    def encode_entries(self, entries: Iterable[Tuple[Any, List]]) -> List[List]:
+        return [[key, [[self.gene(*item[:3]), self.geneset(item[3])] for item in value]]
+                for key, value in entries]
+
+
+def _encode_field(tables: _Tables, name: str, value: Dict):
+    if name in GROUPED_GENE_FIELDS:
+        return {group: tables.encode_entries(genes.items()) for group, genes in value.items()}
+    return tables.encode_entries(value.items())
+
+
+def _decode_entries(genes: List[List], genesets: List, entries: List[List]) -> Dict:
+    return {key: [(*genes[gene], genesets[geneset]) for gene, geneset in refs] for key, refs in entries}
+
+
+def encode_compact(output: Dict) -> Dict:
+    """
+    Compact encoding of a boolean_algebra_output dictionary, without the styling constants.
+
+    :param output: The boolean_algebra_output of a Boolean Algebra result
+    :return: The other fields unchanged, the gene lists as references into the "genes"
+             and "genesets" tables, and "format" set to COMPACT_FORMAT
+    """
+    return output_view(output, compact=True)
+
+
+def decode_compact(encoded: Dict) -> Dict:
+    """
+    Rebuild the gene lists of a compact encoding.
+
+    :param encoded: A compact encoding or view, as returned by encode_compact or result_view
+    :return: The fields of the encoding with its gene lists as gene tuples again
+    """
+    genes, genesets = encoded["genes"], encoded["genesets"]
+    output = {}
+    for name, value in encoded.items():
+        if name in ("format", "genes", "genesets"):
+            continue
+        if name in GROUPED_GENE_FIELDS:
+            value = {group: _decode_entries(genes, genesets, entries) for group, entries in value.items()}
+        elif name == "bool_results":
+            value = _decode_entries(genes, genesets, value)
+        output[name] = value
+    return output
+
+
+# === Views ===
+
+def summarize(output: Dict) -> Dict:
+    """
+    Everything but the gene lists and styling constants, plus the number of genes in every list.
+
+    :param output: The boolean_algebra_output of a Boolean Algebra result
+    :return: Dictionary of the submission info, species, clusters and "counts"
+    """
+    summary = {name: value for name, value in output.items() if name not in STYLE_FIELDS + GENE_FIELDS}
+    counts = {}
+    for name in GENE_FIELDS:
+        if name in output:
+            if name in GROUPED_GENE_FIELDS:
+                counts[name] = {group: len(genes) for group, genes in output[name].items()}
+            else:
+                counts[name] = len(output[name])
+    summary["counts"] = counts
+    return summary
+
+
+def encode_cursor(field: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{field}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Field and offset of a cursor; ValueError for cursors not made by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        field, offset = raw.rsplit(":", 1)
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        offset = -1
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return field, offset
+
+
+def _page(name: str, value: Dict, offset: int, limit: int) -> Tuple[Dict, int]:
+    """The genes offset..offset+limit of a gene list, grouped like the list, and the list's size."""
+    if name not in GROUPED_GENE_FIELDS:
+        keys = list(value)
+        return {key: value[key] for key in keys[offset:offset + limit]}, len(keys)
+    page: Dict = {}
+    total = 0
+    for group, genes in value.items():
+        start, end = max(offset - total, 0), offset + limit - total
+        if start < len(genes) and end > 0:
+            keys = list(genes)[start:end]
+            page[group] = {key: genes[key] for key in keys}
+        total += len(genes)
+    return page, total
+
+
+def _selected_fields(output: Dict, fields: Optional[List[str]]) -> List[str]:
+    if not fields:
+        return list(output)
+    selected = []
+    for name in fields:
+        expanded = STYLE_FIELDS if name == "styles" else (name,)
+        for field in expanded:
+            if field != "summary" and field not in output:
+                raise ValueError(f"Unknown field {name!r}")
+            if field not in selected:
+                selected.append(field)
+    return selected
+
+
+def output_view(output: Dict, fields: Optional[List[str]] = None, compact: bool = False,
+                cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+    """
+    Selected fields of a boolean_algebra_output dictionary, optionally compact and paged.
+
+    :param output: The boolean_algebra_output of a Boolean Algebra result
+    :param fields: Fields to include; "summary" selects summarize(output) and "styles"
+                   the styling constants. Defaults to every field
+    :param compact: Encode the gene lists as references into "genes" and "genesets"
+                    tables; the styling constants are left out unless selected
+    :param cursor: Continue paging from a "next_cursor"; its gene list is selected
+    :param limit: Page size; paging needs exactly one gene list to be selected
+    :return: The view; a paged view has a "page" entry with "total" and "next_cursor",
+             which is None on the last page
+    """
+    offset = 0
+    if cursor is not None:
+        field, offset = decode_cursor(cursor)
+        if fields and fields != [field]:
+            raise ValueError(f"The cursor continues {field!r}, not {','.join(fields)!r}")
+        fields = [field]
+    selected = _selected_fields(output, fields)
+    paged = [name for name in selected if name in GENE_FIELDS]
+    page_info = None
+    view: Dict = {}
+    if cursor is not None or limit is not None:
+        if len(paged) != 1 or len(selected) != 1:
+            raise ValueError(f"Paging needs exactly one of the fields {', '.join(GENE_FIELDS)}")
+        limit = DEFAULT_PAGE_SIZE if limit is None else limit
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        name = paged[0]
+        view[name], total = _page(name, output[name], offset, limit)
+        next_offset = offset + limit
+        page_info = {"total": total, "next_cursor": encode_cursor(name, next_offset) if next_offset < total else None}
+    else:
+        for name in selected:
+            view[name] = summarize(output) if name == "summary" else output[name]
+
+    if compact:
+        tables = _Tables()
+        view = {name: _encode_field(tables, name, value) if name in GENE_FIELDS else value
+                for name, value in view.items() if not (fields is None and name in STYLE_FIELDS)}
+        view.update(format=COMPACT_FORMAT, genes=tables.genes, genesets=tables.genesets)
+    if page_info is not None:
+        view["page"] = page_info
+    return view
+
+
+def result_view(result: Any, fields: Optional[List[str]] = None, compact: bool = False,
+                cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+    """
+    output_view of a Boolean Algebra tool result, keeping the result's shape.
+
+    :param result: The Response returned by BooleanAlgebra.run
+    :return: {"result": {"boolean_algebra_output": view, "info": ...}}
+    :raises ValueError: For results without a boolean_algebra_output and invalid views
+    """
+    body = getattr(result, "result", None)
+    if not isinstance(body, dict) or "boolean_algebra_output" not in body:
+        raise ValueError("Field selection and paging are only available for Boolean Algebra results")
+    view = output_view(body["boolean_algebra_output"], fields, compact, cursor, limit)
+    return {"result": {**body, "boolean_algebra_output": view}}
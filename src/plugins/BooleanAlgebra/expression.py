@@ -0,0 +1,281 @@
+"""
+Boolean set expressions over gene sets for the Boolean Algebra tool.
+
+An expression such as "(GS1 & GS2) - GS3" or "atleast(3, GS1, GS2, GS3, GS4) - GS5" is
+parsed, compiled into a plan of steps in which every distinct subexpression appears once,
+and evaluated over a gene x gene set incidence structure in which every gene set is a
+bitset (a Python int) over the genes of the run.
+
+Syntax, from lowest to highest precedence (so A | B - C is A | (B - C)):
+  - A | B, A or B        union
+  - A - B, A except B    difference, left associative
+  - A & B, A and B       intersection
+  - atleast(k, A, B, ...) genes in at least k of the operands; (...) groups
+Gene set operands are IDs with or without their "GS" prefix. The set symbols ∪, ∩, −
+and \\ are accepted too.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\s*(?:(?P<num>\d+(?![\w.:]))|(?P<name>[A-Za-z0-9_.:]+)|(?P<op>[()&|,\-∩∪−\\]))")
+_SYMBOLS = {"∩": "&", "∪": "|", "−": "-", "\\": "-"}
+_KEYWORDS = {"and": "&", "or": "|", "except": "-"}
+_FUNCTIONS = ("atleast", "at_least")
+
+
+class ExpressionError(ValueError):
+    """Raised for expressions that cannot be parsed or evaluated."""
+
+
+def normalize_geneset_id(name: str) -> str:
+    """Gene set IDs are used without their "GS" prefix, like the tool's geneset_ids."""
+    if name[:2].upper() == "GS" and name[2:].isdigit():
+        return name[2:]
+    return name
+
+
+# === Parsing ===
+
+@dataclass(frozen=True)
+class Node:
+    """Syntax tree node: op is 'set', '&', '|', '-' or 'atleast'."""
+    op: str
+    args: Tuple["Node", ...] = ()
+    name: str = ""
+    k: int = 0
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise ExpressionError(f"Unexpected character {text[pos:].strip()[0]!r} at position {pos}")
+        pos = match.end()
+        if match.group("num") is not None:
+            tokens.append(("num", match.group("num")))
+        elif match.group("name") is not None:
+            word = match.group("name")
+            if word.lower() in _KEYWORDS:
+                tokens.append(("op", _KEYWORDS[word.lower()]))
+            else:
+                tokens.append(("name", word))
+        else:
+            op = match.group("op")
+            tokens.append(("op", _SYMBOLS.get(op, op)))
+    return tokens
+
+
+class _Parser:
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ("end", "")
+
+    def take(self, value: str = None) -> Tuple[str, str]:
+        token = self.peek()
+        if value is not None and token[1] != value:
+            found = token[1] or "end of expression"
+            raise ExpressionError(f"Expected {value!r} but found {found!r}")
+        if token[0] == "end":
+            raise ExpressionError("Unexpected end of expression")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise ExpressionError("Empty expression")
+        node = self.expr()
+        if self.peek()[0] != "end":
+            raise ExpressionError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def expr(self) -> Node:
+        node = self.difference()
+        while self.peek() == ("op", "|"):
+            self.take()
+            node = Node("|", (node, self.difference()))
+        return node
+
+    def difference(self) -> Node:
+        node = self.term()
+        while self.peek() == ("op", "-"):
+            self.take()
+            node = Node("-", (node, self.term()))
+        return node
+
+    def term(self) -> Node:
+        node = self.factor()
+        while self.peek() == ("op", "&"):
+            self.take()
+            node = Node("&", (node, self.factor()))
+        return node
+
+    def factor(self) -> Node:
+        kind, value = self.peek()
+        if (kind, value) == ("op", "("):
+            self.take()
+            node = self.expr()
+            self.take(")")
+            return node
+        if kind == "name" and value.lower() in _FUNCTIONS and self.tokens[self.pos + 1:self.pos + 2] == [("op", "(")]:
+            self.take()
+            self.take("(")
+            kind, k = self.take()
+            if kind != "num":
+                raise ExpressionError(f"{value}() needs a number as its first argument, not {k!r}")
+            args = []
+            while self.peek() == ("op", ","):
+                self.take()
+                args.append(self.expr())
+            self.take(")")
+            if not args:
+                raise ExpressionError(f"{value}() needs at least one gene set")
+            return Node("atleast", tuple(args), k=int(k))
+        if kind in ("name", "num"):
+            self.take()
+            return Node("set", name=normalize_geneset_id(value))
+        raise ExpressionError(f"Unexpected {value or 'end of expression'!r}")
+
+
+def parse(text: str) -> Node:
+    """Parse an expression into its syntax tree."""
+    return _Parser(text).parse()
+
+
+# === Planning ===
+
+@dataclass(frozen=True)
+class Step:
+    """One operation of a plan; args are indices of earlier steps."""
+    op: str
+    args: Tuple[int, ...] = ()
+    name: str = ""
+    k: int = 0
+
+
+@dataclass
+class Plan:
+    """
+    Steps in evaluation order; every distinct subexpression is one step, so shared
+    subexpressions are evaluated once. root is the step holding the result.
+    """
+    expression: str
+    steps: List[Step] = field(default_factory=list)
+    root: int = 0
+
+    @property
+    def geneset_ids(self) -> List[str]:
+        """Gene set IDs the expression refers to, in order of first use."""
+        return [step.name for step in self.steps if step.op == "set"]
+
+    def evaluate(self, bool_results: Dict) -> Dict:
+        """
+        Genes selected by the expression, in the bool_results format and order.
+
+        :param bool_results: Dictionary of grouped genes, as returned by group_homologs
+        :return: The entries of bool_results for the selected genes
+        """
+        incidence = Incidence(bool_results)
+        values: List[int] = []
+        for step in self.steps:
+            if step.op == "set":
+                values.append(incidence.mask(step.name))
+            elif step.op == "&":
+                values.append(values[step.args[0]] & values[step.args[1]])
+            elif step.op == "|":
+                values.append(values[step.args[0]] | values[step.args[1]])
+            elif step.op == "-":
+                values.append(values[step.args[0]] & ~values[step.args[1]])
+            else:
+                values.append(_at_least(step.k, [values[arg] for arg in step.args], incidence.all))
+        return {gene: bool_results[gene] for gene in incidence.genes(values[self.root])}
+
+
+def _at_least(k: int, masks: List[int], all_genes: int) -> int:
+    """Genes set in at least k of the masks: reached[j] holds the genes seen in j or more masks so far."""
+    if k <= 0:
+        return all_genes
+    if k > len(masks):
+        return 0
+    reached = [all_genes] + [0] * k
+    for mask in masks:
+        for j in range(k, 0, -1):
+            reached[j] |= reached[j - 1] & mask
+    return reached[k]
+
+
+def compile_expression(text: str) -> Plan:
+    """Parse an expression and compile it into a plan with common subexpressions shared."""
+    plan = Plan(expression=text)
+    step_index: Dict[Step, int] = {}
+
+    def emit(step: Step) -> int:
+        index = step_index.get(step)
+        if index is None:
+            index = step_index[step] = len(plan.steps)
+            plan.steps.append(step)
+        return index
+
+    def visit(node: Node) -> int:
+        if node.op == "set":
+            return emit(Step("set", name=node.name))
+        args = tuple(visit(arg) for arg in node.args)
+        if node.op in ("&", "|"):
+            if args[0] == args[1]:
+                return args[0]  # A & A == A | A == A
+            args = tuple(sorted(args))  # Commutative, so A & B and B & A are one step
+        elif node.op == "atleast":
+            args = tuple(sorted(args))
+        return emit(Step(node.op, args, k=node.k))
+
+    plan.root = visit(parse(text))
+    return plan
+
+
+# === Incidence ===
+
+class Incidence:
+    """
+    Gene x gene set incidence of a bool_results dictionary: every gene set is a bitset
+    over the genes, bit i standing for the i-th gene of bool_results.
+    """
+
+    def __init__(self, bool_results: Dict):
+        self.gene_keys = list(bool_results)
+        members: Dict[str, List[int]] = {}
+        for index, value in enumerate(bool_results.values()):
+            for item in value:
+                members.setdefault(str(item[3]), []).append(index)
+        self._members = members
+        self._masks: Dict[str, int] = {}
+        self.all = (1 << len(self.gene_keys)) - 1
+
+    def _to_mask(self, indices: List[int]) -> int:
+        bits = np.zeros(len(self.gene_keys), dtype=bool)
+        bits[indices] = True
+        return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+    def mask(self, geneset_id: str) -> int:
+        """Bitset of the genes in the gene set; empty for gene sets without genes in the run."""
+        mask = self._masks.get(geneset_id)
+        if mask is None:
+            mask = self._masks[geneset_id] = self._to_mask(self._members.get(geneset_id, []))
+        return mask
+
+    def genes(self, mask: int) -> List:
+        """Keys of the genes set in mask, in bool_results order."""
+        if not mask:
+            return []
+        raw = np.frombuffer(mask.to_bytes((len(self.gene_keys) + 7) // 8, "little"), dtype=np.uint8)
+        indices = np.flatnonzero(np.unpackbits(raw, bitorder="little")[:len(self.gene_keys)])
+        keys = self.gene_keys
+        return [keys[i] for i in indices]
@@ -3,21 +3,48 @@ Service namespace for the Boolean Algebra tool
 """
 import collections
 
-from plugins.api.geneSetRestAPI import get_geneset_data, fetchSpecies
+import numpy as np
 
+from plugins.api.geneSetRestAPI import get_geneset_data, get_geneset_data_async, fetchSpecies
+from plugins.api.http_client import DEFAULT_FETCH_CONCURRENCY, gather_bounded
+from plugins.api.species_registry import species_registry
+from utils.gene_interning import GeneInterner, membership_counts
 
 def get_all_geneweaver_species():
     return fetchSpecies()
 
 
 def get_all_geneweaver_species_for_boolean():
-    all_species_short = {}
-    all_species_full = {}
-    species_data = fetchSpecies()
-    for species in species_data:
-        all_species_short[species[0]] = "".join(item[0] for item in species[1].split())
-        all_species_full[species[0]] = species[1]
-    return all_species_short, all_species_full
+    """
+    :return: (species id -> short name, species id -> full name), from the species registry
+    """
+    return species_registry.short_names(), species_registry.full_names()
+
+
+async def get_all_geneweaver_species_for_boolean_async():
+    await species_registry.ensure_loaded_async()
+    return get_all_geneweaver_species_for_boolean()
+
+
+async def fetch_genesets(geneset_ids, concurrency=DEFAULT_FETCH_CONCURRENCY):
+    """
+    Fetch every gene set concurrently, at most `concurrency` at a time.
+    A failing gene set does not stop the others.
+
+    :param geneset_ids: List of geneset IDs
+    :param concurrency: Maximum number of requests in flight
+    :return: (payloads in the order of geneset_ids, with None for failed gene sets,
+              dictionary of geneset ID -> error message for the failed ones)
+    """
+    results = await gather_bounded(get_geneset_data_async, geneset_ids, concurrency, return_exceptions=True)
+    genesets, errors = [], {}
+    for gs_id, result in zip(geneset_ids, results):
+        if isinstance(result, BaseException):
+            errors[gs_id] = str(result) or type(result).__name__
+            genesets.append(None)
+        else:
+            genesets.append(result)
+    return genesets, errors
 
 
 # GET_HOMOLOGS_SQL = '''SELECT hom.hom_source_id, g.ode_gene_id, g.ode_ref_id, g.sp_id, gv.gs_id, gs.gs_abbreviation
@@ -56,25 +83,33 @@ def get_all_geneweaver_species_for_boolean():
 #     cursor.close()
 #     return results
 
-def get_homologs_for_geneset(geneset_ids, species_ids=None):
+def get_homologs_for_geneset(geneset_ids, species_ids=None, genesets=None):
     """
     Get gene data for genesets, focusing on same-species gene matching.
     Instead of fetching homologs, we'll just use the ode_gene_id for matching.
     
     :param geneset_ids: List of geneset IDs
     :param species_ids: List of species IDs (optional)
+    :param genesets: Gene set payloads already fetched for geneset_ids, e.g. by fetch_genesets (optional)
     :return: List of gene data tuples
     """
-    species_ids = species_ids or get_species_in_genesets(geneset_ids)
+    if genesets is None:
+        species_ids = species_ids or get_species_in_genesets(geneset_ids)
+        genesets = [get_geneset_data(gs_id) for gs_id in geneset_ids]
+    return _gene_tuples(geneset_ids, genesets)
+
+def _gene_tuples(geneset_ids, genesets):
+    """
+    Build the gene data tuples from the fetched geneset payloads, in geneset order.
+    """
     gene_data = []
     
     # Create a dictionary to store genes by species
     genes_by_species = {}
     
     # First, collect all genes by species
-    for gs_id in geneset_ids:
-        geneset_info = get_geneset_data(gs_id)
-        if 'object' in geneset_info and 'geneset_values' in geneset_info['object']:
+    for gs_id, geneset_info in zip(geneset_ids, genesets):
+        if geneset_info and 'object' in geneset_info and 'geneset_values' in geneset_info['object']:
             species_id = geneset_info["object"]["geneset"]["species_id"]
             
             if species_id not in genes_by_species:
@@ -140,10 +175,21 @@ def get_grouped_homologs_for_genesets(geneset_ids, species_ids=None, gene_data=N
     gene_data = gene_data or get_homologs_for_geneset(geneset_ids, species_ids)
     return group_homologs(gene_data, species_ids)
 
-def get_species_in_genesets(geneset_ids):
+def get_species_in_genesets(geneset_ids, genesets=None):
+    """
+    :param geneset_ids: List of geneset IDs
+    :param genesets: Gene set payloads already fetched for geneset_ids (optional)
+    :return: List of the species IDs the gene sets belong to
+    """
+    if genesets is None:
+        genesets = (get_geneset_data(gs_id) for gs_id in geneset_ids)
+    return _species_of_genesets(genesets)
+
+def _species_of_genesets(genesets):
     species_ids = set()
-    for gs_id in geneset_ids:
-        gene_data = get_geneset_data(gs_id)
+    for gene_data in genesets:
+        if gene_data is None:
+            continue
         species_ids.add(gene_data["object"]["geneset"]["species_id"])
     return list(species_ids)
 
@@ -156,6 +202,9 @@ def cluster_genes(gene_data, species_ids):
     A. the number of genes unique to each species
     B. the number of genes/species/intersection
     C. the number of genes per species
+
+    Membership is computed on interned gene ids: every species' genes become a sorted id
+    array, and one count of how many species hold each gene replaces the pairwise scans.
     
     :param gene_data: The list of gene data tuples
     :param species_ids: List of species IDs
@@ -170,80 +219,99 @@ def cluster_genes(gene_data, species_ids):
         if species_id in genes_per_geneset:  # Only process if we know about this species
             genes_per_geneset[species_id]['species'].append(gene_id)
 
-    # Find unique genes for each species
-    gene_comparision_list_all = []
-    gene_comparision_list_sp = []
-    for outer_species_id in species_ids:
-        for inner_species_id in species_ids:
-            if outer_species_id != inner_species_id:
-                gene_comparision_list_all.extend(genes_per_geneset[inner_species_id]['species'])
-            else:
-                gene_comparision_list_sp.extend(genes_per_geneset[inner_species_id]['species'])
-        genes_per_geneset[outer_species_id]['unique'].extend(
-            list(set(gene_comparision_list_sp) - set(gene_comparision_list_all)))
-        del gene_comparision_list_all[:]
-        del gene_comparision_list_sp[:]
-
-    # Find intersection genes (genes that appear in multiple species)
-    gene_intersection_list = []
-    for i in range(0, len(species_ids)):
-        for j in range(0, len(genes_per_geneset[species_ids[i]]['species'])):
-            for k in range(0, len(species_ids)):
-                if i != k:
-                    if genes_per_geneset[species_ids[i]]['species'][j] in genes_per_geneset[species_ids[k]]['species']:
-                        gene_intersection_list.append(genes_per_geneset[species_ids[i]]['species'][j])
-        genes_per_geneset[species_ids[i]]['intersection'].extend(gene_intersection_list)
-        del gene_intersection_list[:]
+    interner, species_genes, species_sets, species_counts = _species_membership(
+        {sp: genes_per_geneset[sp]['species'] for sp in species_ids})
+
+    for sp in species_ids:
+        # Unique genes are found in this species only
+        unique_ids = species_sets[sp][species_counts[species_sets[sp]] == 1]
+        genes_per_geneset[sp]['unique'].extend(interner.keys(unique_ids))
+
+        # Intersection genes: every gene is listed once per other species that also has it
+        ids = species_genes[sp]
+        intersection_ids = np.repeat(ids, species_counts[ids] - 1)
+        genes_per_geneset[sp]['intersection'].extend(interner.keys(intersection_ids))
 
     return genes_per_geneset
 
 
+def cluster_gene_counts(gene_data, species_ids):
+    """
+    Counts-only version of cluster_genes: the length of every list cluster_genes would
+    return, computed from the membership counts without building the gene lists.
+
+    :param gene_data: The list of gene data tuples
+    :param species_ids: List of species IDs
+    :return: Dictionary of species ID -> {'unique': n, 'species': n, 'intersection': n}
+    """
+    genes_by_species = {sp: [] for sp in species_ids}
+    for gene in gene_data:
+        genes = genes_by_species.get(gene[3])
+        if genes is not None:
+            genes.append(gene[1])
+
+    _, species_genes, species_sets, species_counts = _species_membership(genes_by_species)
+
+    counts = {}
+    for sp in species_ids:
+        ids = species_genes[sp]
+        counts[sp] = {
+            'unique': int(np.count_nonzero(species_counts[species_sets[sp]] == 1)),
+            'species': len(ids),
+            'intersection': int((species_counts[ids] - 1).sum()),
+        }
+    return counts
+
+
+def _species_membership(genes_by_species):
+    """
+    Intern every species' genes and count how many species hold each gene.
+
+    The interner is local to the call, so ids only cover the genes of this result and
+    nothing outlives it.
+
+    :param genes_by_species: Dictionary of species ID -> list of gene IDs
+    :return: (the interner, species ID -> interned ids in input order, species ID -> sorted
+              distinct ids, number of species each interned id appears in)
+    """
+    interner = GeneInterner()
+    species_genes = {sp: interner.intern_list(genes) for sp, genes in genes_by_species.items()}
+    species_sets = {sp: np.unique(ids) for sp, ids in species_genes.items()}
+    species_counts = membership_counts(species_sets.values(), len(interner))
+    return interner, species_genes, species_sets, species_counts
+
+
 def intersect(bool_results, at_least=2):
     """
     Find genes that appear in at least the specified number of genesets.
+
+    Every gene's signature (the ordered tuple of geneset IDs it appears in) is computed
+    once, and genes are grouped by it in a single pass. Groups keep the order in which
+    their signature first appears, and genes keep their order within a group.
     
     :param bool_results: Dictionary of grouped genes
     :param at_least: Minimum number of genesets a gene must appear in
-    :return: Dictionary of intersection results
+    :return: Dictionary of intersection size -> {gene: gene data} for all groups of that size
     """
-    bool_intersect = collections.defaultdict(dict)
-    intersect_results = {key: value for key, value in bool_results.items() if len(value) >= int(at_least)}
-
-    # Create groups of intersection, first creating
-    # a backwards array of values
-    compare = collections.defaultdict(list)
-    gs_array = []
-    gs_list = 'empty'
-    for key, value in intersect_results.items():
-        for i in range(0, len(value)):
-            gs_array.append(str(value[i][3]))  # Add geneset ID
-            gs_list = "|".join(gs_array)
-        compare[gs_list].append(key)
-        del gs_array[:]
-
-    # make the groups numbered 1 - n
-    i = 0
-    for key, value in compare.items():
-        for j in range(0, len(value)):
-            local_array = []
-            for k, v in intersect_results.items():
-                del local_array[:]
-                if int(k) == int(value[j]):
-                    for m in range(0, len(v)):
-                        local_array.append(str(v[m][3]))
-                        temp = "|".join(local_array)
-                    if str(temp) == str(key):
-                        bool_intersect[i][value[j]] = v
-        i += 1
+    at_least = int(at_least)
+    groups = {}
+    for key, value in bool_results.items():
+        if len(value) < at_least or not value:
+            continue
+        signature = tuple(str(item[3]) for item in value)
+        group = groups.get(signature)
+        if group is None:
+            group = groups[signature] = {}
+        group[key] = value
 
+    # Groups of the same size are merged, in group order
     intersection_sizes = {}
-    for key, value in bool_intersect.items():
-        for k in value:
-            if value[k]:
-                if len(value[k]) not in intersection_sizes:
-                    intersection_sizes[len(value[k])] = value
-                else:
-                    intersection_sizes[len(value[k])].update(value)
+    for signature, group in groups.items():
+        size = len(signature)
+        if size in intersection_sizes:
+            intersection_sizes[size].update(group)
+        else:
+            intersection_sizes[size] = group
 
     return intersection_sizes
 
@@ -251,30 +319,18 @@ def intersect(bool_results, at_least=2):
 def bool_except(bool_results):
     """
     Find genes that appear in only one geneset (not in intersections).
+
+    Genes are grouped by their geneset in a single pass; groups are numbered 0..n-1 in
+    the order their geneset first appears, and genes keep their order within a group.
     
     :param bool_results: Dictionary of grouped genes
     :return: Dictionary of except results
     """
     bool_except = collections.defaultdict(dict)
-    intersects = {key: value for key, value in bool_results.items() if len(value) >= int(2)}
-
-    # make a dict of all values in the except list
-    except_results = {key: value for key, value in bool_results.items() if key not in intersects}
-
-    # We need to re-sort this list so that genesets are
-    # grouped together
-    compare = collections.defaultdict(list)
-    for key, value in except_results.items():
-        compare[value[0][3]].append(key)
-
-    # make the groups numbered 1 - n, this is easier than
-    # the intersect case because we do not need to take
-    # into account a list
-    i = 0
-    for key, value in compare.items():
-        for j in range(0, len(value)):
-            for k, v in except_results.items():
-                if int(k) == int(value[j]):
-                    bool_except[i][value[j]] = v
-        i += 1
+    group_numbers = {}
+    for key, value in bool_results.items():
+        if len(value) >= 2:
+            continue
+        group = group_numbers.setdefault(value[0][3], len(group_numbers))
+        bool_except[group][key] = value
     return bool_except
@@ -1,19 +1,30 @@
+import os
 import random
 import time
 from collections import Counter
 from dataclasses import asdict
 from typing import Any, Dict, List, Optional
 from ATS import ATS_Plugin
-from plugins.api.geneSetRestAPI import fetchGeneSymbols_from_geneset
-from utils.gene_helpers import extract_genes_from_gw, extract_bg_genes
-from plugins.MSET.schemas import Response, MSETOutput, MSETStatus
-from plugins.MSET.simulation import run_trials   # Heavy simulation moved to its own module
+from plugins.api.geneSetRestAPI import fetchGeneSymbols_from_geneset_async
+from plugins.api.http_client import gather_bounded
+from utils.gene_helpers import iter_genes_from_gw, iter_file_lines
+from utils.gene_interning import GeneInterner, intersect, union
+from utils.background_cache import background_cache, as_background
+from plugins.MSET.schemas import Response, MSETOutput, MSETStatus, MSETMatrixOutput
+from plugins.MSET.matrix import intersection_matrix, pairwise_pvalues, adjust_matrix
+from plugins.MSET.simulation import run_trials, run_trials_adaptive, exact_pvalue   # Heavy simulation moved to its own module
+from plugins.MSET.null_cache import default_cache
 
 class MSET(ATS_Plugin.implement_plugins):
     """
     A plugin for performing Modular Single-set Enrichment Test (MSET).
     MSET was developed to compare gene lists. From four character lists (gene_list1, gene_list2, background1, background2), 
     it computes a randomization-based p-value describing the likelihood that the intersect of gene_list1 and gene_list2 is underexpressed or overexpressed relative to randomness alone    
+    With method "exact" the p-value is computed analytically from the hypergeometric null instead of by simulation,
+    and with method "adaptive" trials run in rounds until the p-value is decided against alpha.
+    With use_null_cache (the default) simulated trials are reused across tasks: every run with the
+    same universe and list sizes draws its null from the same cached trials, so repeated runs give
+    the same p-value. Set use_null_cache to false for fresh, independent draws on every run.
     """  
 
     def __init__(self):
@@ -38,36 +49,46 @@ class MSET(ATS_Plugin.implement_plugins):
         background_file_path_1 = input_data.get("background_file_path_1")
         background_file_path_2 = input_data.get("background_file_path_2")
 
+        # Genes already parsed by the caller, e.g. streamed straight from an upload
+        genes_1 = input_data.get("genes_1")
+        genes_2 = input_data.get("genes_2")
+        background_genes_input_1 = input_data.get("background_genes_1")
+        background_genes_input_2 = input_data.get("background_genes_2")
+
         representation = input_data.get("representation", "over").lower()  # "over" or "under"
+        null_method = (input_data.get("method") or "simulation").lower()  # "simulation", "exact" or "adaptive"
+        alpha = float(input_data.get("alpha") or 0.05)  # Used by the adaptive method
+        precision = input_data.get("precision")  # Optional for the adaptive method
+        use_null_cache = input_data.get("use_null_cache") is not False  # Reuse simulated nulls across tasks; false for fresh draws
         print_to_cli = input_data.get("print_to_cli", False)
 
         self._update_status(percent=10, message="Retrieving gene sets", current_step="Loading data", log=log)
 
         # Retrieve gene set for group 1
         if geneset_id_1:
-            group_1_genes = fetchGeneSymbols_from_geneset(geneset_id_1)
+            group_1_genes = await fetchGeneSymbols_from_geneset_async(geneset_id_1)
+        elif genes_1 is not None:
+            group_1_genes = genes_1
         elif file_path_1:
-            with open(file_path_1, "r") as f:
-                content1 = f.read()
-            group_1_genes = extract_genes_from_gw(content1)
+            group_1_genes = iter_genes_from_gw(iter_file_lines(file_path_1))
         else:
             return Response(result={"Error": "Provide either file_path_1 or geneset_id_1"})
 
         # Retrieve gene set for group 2
         if geneset_id_2:
-            group_2_genes = fetchGeneSymbols_from_geneset(geneset_id_2)
+            group_2_genes = await fetchGeneSymbols_from_geneset_async(geneset_id_2)
+        elif genes_2 is not None:
+            group_2_genes = genes_2
         elif file_path_2:
-            with open(file_path_2, "r") as f:
-                content2 = f.read()
-            group_2_genes = extract_genes_from_gw(content2)
+            group_2_genes = iter_genes_from_gw(iter_file_lines(file_path_2))
         else:
             return Response(result={"Error": "Provide either file_path_2 or geneset_id_2"})
         
         # Validate that each group has either a Geneset ID or a file path
         missing = []
-        if not geneset_id_1 or not file_path_1:
+        if not geneset_id_1 and not file_path_1 and genes_1 is None:
             missing.append("group 1")
-        if not geneset_id_2 or not file_path_2:
+        if not geneset_id_2 and not file_path_2 and genes_2 is None:
             missing.append("group 2")
         if missing:
             groups = " and ".join(missing)
@@ -76,58 +97,63 @@ class MSET(ATS_Plugin.implement_plugins):
 
         self._update_status(percent=30, message="Processing background gene sets", current_step="Background Processing", log=log)
 
-        # Process background gene sets if provided
-        if background_file_path_1:
+        # Process background gene sets if provided; files seen before are served from the background cache
+        if background_genes_input_1 is not None:
+            background_1 = as_background(background_genes_input_1)
+        elif background_file_path_1:
             try:
-                with open(background_file_path_1, "r") as f:
-                    background_content_1 = f.read()
-                background_genes_1 = sorted(set(extract_bg_genes(background_content_1)))
+                background_1 = background_cache.load_file(background_file_path_1)
             except Exception as e:
                 return Response(result={"Error": f"Failed to read background_file_path_1: {str(e)}"})
         else:
-            background_genes_1 = None
+            background_1 = None
 
-        if background_file_path_2:
+        if background_genes_input_2 is not None:
+            background_2 = as_background(background_genes_input_2)
+        elif background_file_path_2:
             try:
-                with open(background_file_path_2, "r") as f:
-                    background_content_2 = f.read()
-                background_genes_2 = sorted(set(extract_bg_genes(background_content_2)))
+                background_2 = background_cache.load_file(background_file_path_2)
             except Exception as e:
                 return Response(result={"Error": f"Failed to read background_file_path_2: {str(e)}"})
         else:
-            background_genes_2 = None
+            background_2 = None
 
-        list_1_pre = sorted(set(group_1_genes))
-        list_2_pre = sorted(set(group_2_genes))
+        # Gene sets are handled as sorted arrays of symbol ids from here on, interned for this run only
+        interner = GeneInterner()
+        list_1_pre = interner.intern_set(group_1_genes)
+        list_2_pre = interner.intern_set(group_2_genes)
         # Use the background file if provided; otherwise, use the pre gene lists as background.
-        if background_genes_1 is not None:
-            list_1_background = background_genes_1
+        if background_1 is not None:
+            list_1_background = background_1.intern(interner)
         else:
             list_1_background = list_1_pre
 
-        if background_genes_2 is not None:
-            list_2_background = background_genes_2
+        if background_2 is not None:
+            list_2_background = background_2.intern(interner)
         else:
             list_2_background = list_2_pre
 
         # Uncomment the following if you want to check for missing genes
-        # missing_genes = set(list_1_pre) - set(list_1_background)
+        # missing_genes = interner.keys(difference(list_1_pre, list_1_background))
         # if missing_genes:
         #     print("These genes are missing in the background:")
         #     for gene in sorted(missing_genes):
         #         print(gene)
         
         # Compute the universe as the intersection of the two background sets
-        universe = sorted(set(list_1_background).intersection(list_2_background))
+        if background_1 is not None and background_2 is not None:
+            universe = interner.intern_set(background_cache.universe(background_1, background_2))  # Memoized for repeat pairs
+        else:
+            universe = intersect(list_1_background, list_2_background)
         # Filter the pre lists to include only genes that are in the universe
-        list_1 = sorted(set(list_1_pre).intersection(universe))
-        list_2 = sorted(set(list_2_pre).intersection(universe))
+        list_1 = intersect(list_1_pre, universe)
+        list_2 = intersect(list_2_pre, universe)
 
         # Calculate sizes and the observed intersection size
         list_1_size = len(list_1)
         list_2_size = len(list_2)
         universe_size = len(universe)
-        comp_intersect_size = len(set(list_1).intersection(list_2))
+        comp_intersect_size = len(intersect(list_1, list_2))
         
         # Uncomment these checks if you want to enforce that pre gene lists are subsets of their backgrounds:
         # if not set(list_2_pre).issubset(set(list_2_background)):
@@ -135,10 +161,40 @@ class MSET(ATS_Plugin.implement_plugins):
         # if not set(list_1_pre).issubset(set(list_1_background)):
         #     return Response(result="Error: list_1 not subset of its background")
         
-        self._update_status(percent=50, message="Randomly sampling genes", current_step="Running trials", log=log)
+        trials: List[int]
+        if null_method == "exact":
+            self._update_status(percent=50, message="Computing hypergeometric null distribution", current_step="Exact null", log=log)
+            # Expected trials under the exact null, so the histogram keeps its usual shape
+            trials = run_trials(universe, list_1_size, list_2_size, num_trials, mode='exact')
+        elif null_method == "simulation":
+            self._update_status(percent=50, message="Randomly sampling genes", current_step="Running trials", log=log)
+
+            # Run trials using the simulation function, topping up a cached null when there is one
+            if use_null_cache:
+                trials = default_cache.get_trials(universe, list_1_size, list_2_size, num_trials)
+            else:
+                trials = run_trials(universe, list_1_size, list_2_size, num_trials, mode='auto', threshold=1000)
+        elif null_method == "adaptive":
+            if representation not in ("over", "under"):
+                return Response(result= {"Error": "representation must be either 'over' or 'under'"})
+            self._update_status(percent=50, message="Randomly sampling genes", current_step="Adaptive trials", log=log)
 
-        # Run trials using the simulation function
-        trials: List[int] = run_trials(universe, list_1_size, list_2_size, num_trials, mode='auto', threshold=1000)
+            def report_round(trials_done: int, estimate: float, interval) -> None:
+                self._status.trials_completed = trials_done
+                self._status.p_value_estimate = estimate
+                self._status.p_value_interval = interval
+                self._update_status(percent=50 + int(30 * trials_done / num_trials),
+                                    message=f"p ~ {estimate:.4g} [{interval[0]:.4g}, {interval[1]:.4g}] after {trials_done} trials",
+                                    current_step="Adaptive trials", log=log)
+
+            # Stops early once the p-value is decided, so num_trials is only an upper bound
+            trials, _ = run_trials_adaptive(universe, list_1_size, list_2_size, comp_intersect_size, num_trials,
+                                            representation=representation, alpha=alpha,
+                                            precision=float(precision) if precision is not None else None,
+                                            on_round=report_round)
+            num_trials = len(trials)
+        else:
+            return Response(result={"Error": "method must be one of 'simulation', 'exact' or 'adaptive'"})
 
         self._update_status(percent=80, message="Calculating results", current_step="Analysis", log=log)
 
@@ -156,6 +212,10 @@ class MSET(ATS_Plugin.implement_plugins):
             method = "Under"
         else:
             return Response(result= {"Error": "representation must be either 'over' or 'under'"})
+
+        if null_method == "exact":
+            # Replace the count-based estimate with the analytic tail probability
+            pvalue = exact_pvalue(universe_size, list_1_size, list_2_size, comp_intersect_size, representation)
         
         # Histogram of the intersection sizes.
         hist = dict(Counter(trials))
@@ -193,6 +253,7 @@ class MSET(ATS_Plugin.implement_plugins):
         self._status.percent_complete = percent
         self._status.message = message
         self._status.current_step = current_step
+        self._emit_status()
         if log:
             print(f"[STATUS] {percent}% - {message} ({current_step})")  
     
@@ -203,4 +264,115 @@ class MSET(ATS_Plugin.implement_plugins):
         Returns:
             Response: Object containing the progress and message.
         """
-        return Response(result={"status":self._status})
\ No newline at end of file
+        return Response(result={"status":self._status})
+
+
+class MSETMatrix(MSET):
+    """
+    Many-vs-many MSET. Compares N gene lists (gene set ids and/or gene set files) pairwise
+    against one shared background, reusing one universe and one null distribution per
+    distinct pair of list sizes, and reports Benjamini-Hochberg adjusted p-values as a
+    compact N x N matrix instead of one MSETOutput per pair. use_null_cache behaves as for MSET.
+    """
+
+    async def run(self, input_data: Dict[str, Any]) -> Response:
+        """
+        run function executes the MSET matrix tool on specified input.
+
+        input: Dictionary values matching requirements for tool.
+
+        """
+        log = input_data.get("log")
+        num_trials = int(input_data.get("num_trials", 1000))
+        geneset_ids = input_data.get("geneset_ids") or []
+        file_paths = input_data.get("file_paths") or []
+        labels = input_data.get("labels")
+        background_file_path = input_data.get("background_file_path")
+        # Genes already parsed by the caller: a mapping of label to genes, or (label, genes) pairs
+        # when labels may repeat (e.g. uploads sharing a file name), and a gene list
+        parsed_gene_lists = input_data.get("gene_lists") or {}
+        background_genes = input_data.get("background_genes")
+        representation = input_data.get("representation", "over").lower()  # "over" or "under"
+        null_method = (input_data.get("method") or "simulation").lower()  # "simulation" or "exact"
+        use_null_cache = input_data.get("use_null_cache") is not False  # Reuse simulated nulls across tasks; false for fresh draws
+        print_to_cli = input_data.get("print_to_cli", False)
+
+        if representation not in ("over", "under"):
+            return Response(result={"Error": "representation must be either 'over' or 'under'"})
+        if null_method not in ("simulation", "exact"):
+            return Response(result={"Error": "method must be either 'simulation' or 'exact'"})
+
+        self._update_status(percent=10, message="Retrieving gene sets", current_step="Loading data", log=log)
+
+        # Gene lists are interned for this run only
+        interner = GeneInterner()
+        gene_lists = []
+        default_labels = []
+        # Gene sets are fetched concurrently, a bounded number at a time, in input order
+        for geneset_id, symbols in zip(geneset_ids, await gather_bounded(fetchGeneSymbols_from_geneset_async, geneset_ids)):
+            gene_lists.append(interner.intern_set(symbols))
+            default_labels.append(str(geneset_id))
+        if isinstance(parsed_gene_lists, dict):
+            parsed_gene_lists = parsed_gene_lists.items()
+        for label, genes in parsed_gene_lists:
+            gene_lists.append(interner.intern_set(genes))
+            default_labels.append(str(label))
+        for file_path in file_paths:
+            gene_lists.append(interner.intern_set(iter_genes_from_gw(iter_file_lines(file_path))))
+            default_labels.append(os.path.basename(file_path))
+        if len(gene_lists) < 2:
+            return Response(result={"Error": "Provide at least two gene lists through geneset_ids, gene_lists or file_paths"})
+        labels = [str(label) for label in labels] if labels else default_labels
+        if len(labels) != len(gene_lists):
+            return Response(result={"Error": "labels must name every gene list"})
+
+        self._update_status(percent=30, message="Processing background gene set", current_step="Background Processing", log=log)
+
+        # Use the background file if provided; otherwise, all genes seen in any list.
+        if background_genes is not None:
+            universe = as_background(background_genes).intern(interner)
+        elif background_file_path:
+            try:
+                universe = background_cache.load_file(background_file_path).intern(interner)
+            except Exception as e:
+                return Response(result={"Error": f"Failed to read background_file_path: {str(e)}"})
+        else:
+            universe = gene_lists[0]
+            for genes in gene_lists[1:]:
+                universe = union(universe, genes)
+        gene_lists = [intersect(genes, universe) for genes in gene_lists]
+        list_sizes = [len(genes) for genes in gene_lists]
+
+        self._update_status(percent=40, message="Computing pairwise intersections", current_step="Intersections", log=log)
+        intersections = intersection_matrix(gene_lists, universe)
+
+        def report_null(done: int, total: int) -> None:
+            self._update_status(percent=40 + int(50 * done / total), message=f"Simulated {done} of {total} null distributions",
+                                current_step="Running trials", log=log)
+
+        self._update_status(percent=40, message="Computing null distributions", current_step="Running trials", log=log)
+        pvalues = pairwise_pvalues(universe, list_sizes, intersections, num_trials, representation=representation,
+                                   null_method=null_method, use_null_cache=use_null_cache, on_null=report_null)
+
+        matrix_output = MSETMatrixOutput(
+            labels=labels,
+            list_sizes=list_sizes,
+            universe_size=len(universe),
+            num_trials=num_trials,
+            alternative="Greater" if representation == "over" else "Less",
+            method="Over" if representation == "over" else "Under",
+            null_method=null_method,
+            correction="fdr_bh",
+            intersection_sizes=intersections.tolist(),
+            p_values=pvalues,
+            adjusted_p_values=adjust_matrix(pvalues),
+        )
+
+        self._update_status(percent=100, message="Analysis complete", current_step="Completed", log=log)
+
+        if print_to_cli:
+            print("\nMSET Matrix Output:")
+            for key, value in asdict(matrix_output).items():
+                print(f"{key}: {value}")
+
+        return Response(result={"mset_matrix_output": matrix_output, "info": {"task_type": "mset_matrix_analysis"}})
@@ -0,0 +1,91 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from plugins.MSET.null_cache import default_cache
+from plugins.MSET.simulation import exact_pvalue, run_trials
+
+def intersection_matrix(lists: List[np.ndarray], universe: np.ndarray) -> np.ndarray:
+    """
+    Pairwise intersection sizes of N interned gene lists, all subsets of the universe.
+    The lists become rows of a list x universe incidence matrix, so every pairwise
+    intersection comes out of a single matrix product.
+    """
+    incidence = np.zeros((len(lists), len(universe)), dtype=np.float32)
+    for row, ids in enumerate(lists):
+        incidence[row, np.searchsorted(universe, ids)] = 1.0
+    return np.rint(incidence @ incidence.T).astype(np.int64)
+
+def benjamini_hochberg(pvalues: Sequence[float]) -> List[float]:
+    """
+    Benjamini-Hochberg adjusted p-values (false discovery rate), in input order.
+    """
+    n = len(pvalues)
+    order = sorted(range(n), key=lambda i: pvalues[i])
+    adjusted = [0.0] * n
+    running = 1.0
+    for rank in range(n - 1, -1, -1):
+        i = order[rank]
+        running = min(running, pvalues[i] * n / (rank + 1))
+        adjusted[i] = running
+    return adjusted
+
+def pairwise_pvalues(universe: np.ndarray, list_sizes: List[int], intersections: np.ndarray, num_trials: int,
+                     representation: str = 'over', null_method: str = 'simulation', use_null_cache: bool = True,
+                     on_null: Optional[Callable[[int, int], None]] = None) -> List[List[Optional[float]]]:
+    """
+    p-values for every pair of lists, as a symmetric matrix with an empty diagonal.
+
+    The null only depends on the two list sizes, so it is simulated (or computed exactly)
+    once per distinct pair of sizes and shared by every pair of lists with those sizes.
+
+    Parameters:
+      - null_method: 'simulation' or 'exact'.
+      - on_null: Optional; called with (nulls_done, nulls_total) whenever a null is ready.
+    """
+    if representation not in ('over', 'under'):
+        raise ValueError("representation must be either 'over' or 'under'")
+    if null_method not in ('simulation', 'exact'):
+        raise ValueError("method must be either 'simulation' or 'exact'")
+    n = len(list_sizes)
+    pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+    size_pairs = sorted({tuple(sorted((list_sizes[i], list_sizes[j]))) for i, j in pairs})
+
+    nulls: Dict[Tuple[int, int], List[int]] = {}
+    if null_method == 'simulation':
+        for done, (small, large) in enumerate(size_pairs, start=1):
+            if use_null_cache:
+                nulls[(small, large)] = default_cache.get_trials(universe, small, large, num_trials)
+            else:
+                nulls[(small, large)] = run_trials(universe, small, large, num_trials)
+            if on_null:
+                on_null(done, len(size_pairs))
+
+    pvalues: List[List[Optional[float]]] = [[None] * n for _ in range(n)]
+    for i, j in pairs:
+        observed = int(intersections[i, j])
+        if null_method == 'exact':
+            pvalue = exact_pvalue(len(universe), list_sizes[i], list_sizes[j], observed, representation)
+        else:
+            trials = nulls[tuple(sorted((list_sizes[i], list_sizes[j])))]
+            # Trials are sorted, so those at least as large as observed form the tail
+            above = len(trials) - bisect_left(trials, observed)
+            if representation == 'over':
+                pvalue = above / float(len(trials))
+            else:
+                pvalue = (len(trials) - above) / float(len(trials))
+        pvalues[i][j] = pvalues[j][i] = pvalue
+    return pvalues
+
+def adjust_matrix(pvalues: List[List[Optional[float]]]) -> List[List[Optional[float]]]:
+    """
+    Benjamini-Hochberg correction over the distinct pairs of a symmetric p-value matrix.
+    """
+    n = len(pvalues)
+    pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+    adjusted_flat = benjamini_hochberg([pvalues[i][j] for i, j in pairs])
+    adjusted: List[List[Optional[float]]] = [[None] * n for _ in range(n)]
+    for (i, j), value in zip(pairs, adjusted_flat):
+        adjusted[i][j] = adjusted[j][i] = value
+    return adjusted
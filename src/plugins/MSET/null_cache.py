@@ -0,0 +1,165 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from plugins.MSET.simulation import run_trials
+
+# Environment variable naming a directory for the on-disk store of the default cache.
+CACHE_DIR_ENV = "MSET_NULL_CACHE_DIR"
+# Bytes of trials the default cache keeps in memory.
+DEFAULT_MAX_BYTES = int(os.environ.get("MSET_NULL_CACHE_MAX_BYTES", 256 * 2 ** 20))
+
+NullKey = Tuple[int, int, int, Optional[int]]
+
+class NullDistributionCache:
+    """
+    LRU cache of simulated MSET null distributions, sitting in front of run_trials.
+
+    The null only depends on the universe size and the two list sizes (and the seed, when one
+    is given), never on which genes are involved, so those form the key. Unseeded requests share
+    one entry per key, so they all get the same draws rather than fresh ones; callers wanting
+    independent draws bypass the cache. Trials are kept in
+    generation order: asking for fewer trials than are cached returns a prefix, and asking for
+    more tops the entry up with only the missing trials. Trials are stored in the smallest
+    integer type that holds them, and entries can optionally be persisted as .npy files so
+    they survive restarts. Simulations are deduplicated: while one caller simulates trials for
+    a key, other callers of that key wait for it and are then served from the cache.
+    """
+
+    def __init__(self, max_entries: int = 256, cache_dir: Optional[str] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Parameters:
+          - max_entries: Number of distributions kept in memory before the least recently used is evicted.
+          - cache_dir: Optional; directory for the on-disk store.
+          - max_bytes: Bytes of trials kept in memory; the least recently used entries are evicted
+                       beyond it, though the newest entry is always kept.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[NullKey, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._in_flight: Dict[NullKey, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.top_ups = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(universe_size: int, list_1_size: int, list_2_size: int, seed: Optional[int] = None) -> NullKey:
+        """The null is symmetric in the two list sizes, so they are stored in sorted order."""
+        small, large = sorted((list_1_size, list_2_size))
+        return universe_size, small, large, seed
+
+    def _path(self, key: NullKey) -> str:
+        universe_size, small, large, seed = key
+        seed_part = "any" if seed is None else str(seed)
+        return os.path.join(self.cache_dir, f"null_{universe_size}_{small}_{large}_{seed_part}.npy")
+
+    def _lookup(self, key: NullKey) -> Optional[np.ndarray]:
+        with self._lock:
+            trials = self._entries.get(key)
+            if trials is not None:
+                self._entries.move_to_end(key)
+                return trials
+        if self.cache_dir and os.path.exists(self._path(key)):
+            trials = np.load(self._path(key))
+            self._remember(key, trials)
+            return trials
+        return None
+
+    @staticmethod
+    def _compact(trials: np.ndarray) -> np.ndarray:
+        """Trials in the smallest integer type that holds them: intersection sizes rarely reach 2 ** 16."""
+        dtype = np.uint16 if len(trials) == 0 or trials.max() < 2 ** 16 else np.int32
+        return trials.astype(dtype, copy=False)
+
+    def _remember(self, key: NullKey, trials: np.ndarray) -> None:
+        trials = self._compact(trials)
+        with self._lock:
+            current = self._entries.get(key)
+            # Another task may have topped the entry up further in the meantime
+            if current is None or len(current) < len(trials):
+                self._entries[key] = trials
+                self._bytes += trials.nbytes - (0 if current is None else current.nbytes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def _persist(self, key: NullKey, trials: np.ndarray) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self._compact(trials))
+        os.replace(tmp_path, path)
+
+    def get_trials(self, universe: List[str], list_1_size: int, list_2_size: int, num_trials: int,
+                   seed: Optional[int] = None, mode: str = 'auto', workers: int = None) -> List[int]:
+        """
+        Return num_trials null trials for the given sizes, simulating only what is not cached yet.
+        Returns a sorted list of trial intersection sizes, like run_trials.
+        """
+        key = self.make_key(len(universe), list_1_size, list_2_size, seed)
+        while True:
+            cached = self._lookup(key)
+            have = 0 if cached is None else len(cached)
+            with self._lock:
+                if have >= num_trials:
+                    self.hits += 1
+                    return sorted(cached[:num_trials].tolist())
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._in_flight[key] = Future()
+                    if cached is None:
+                        self.misses += 1
+                    else:
+                        self.top_ups += 1
+                    break
+            # Another caller is simulating this key; look again once it is done
+            future.result()
+
+        try:
+            trials = self._simulate(key, cached, universe, list_1_size, list_2_size, num_trials, seed, mode, workers)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_result(None)
+        return sorted(trials[:num_trials].tolist())
+
+    def _simulate(self, key: NullKey, cached: Optional[np.ndarray], universe: List[str], list_1_size: int,
+                  list_2_size: int, num_trials: int, seed: Optional[int], mode: str, workers: Optional[int]) -> np.ndarray:
+        """Top cached up to num_trials trials (or simulate them all) and store the result."""
+        have = 0 if cached is None else len(cached)
+        # Each top-up segment gets its own stream derived from the seed and the trials already held
+        segment_seed = None
+        if seed is not None:
+            segment_seed = int(np.random.SeedSequence(seed, spawn_key=(have,)).generate_state(1)[0])
+        extra = np.asarray(run_trials(universe, list_1_size, list_2_size, num_trials - have,
+                                      mode=mode, workers=workers, seed=segment_seed), dtype=np.int64)
+        # run_trials sorts its output; shuffle it back into an exchangeable order so any
+        # prefix of the stored trials is itself a valid sample
+        np.random.default_rng(segment_seed).shuffle(extra)
+        trials = extra if cached is None else np.concatenate([cached, extra])
+
+        self._remember(key, trials)
+        if self.cache_dir:
+            self._persist(key, trials)
+        return trials
+
+    def clear(self) -> None:
+        """Drop every in-memory entry; the on-disk store is left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Process-wide cache used by MSET.run.
+default_cache = NullDistributionCache(cache_dir=os.environ.get(CACHE_DIR_ENV))
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import json
 @dataclass
 class Response:
@@ -35,4 +35,22 @@ class MSETStatus:
     genes_processed: int = 0
     trials_completed: int = 0
     time_elapsed: Optional[float] = None
-    time_remaining: Optional[float] = None
\ No newline at end of file
+    time_remaining: Optional[float] = None
+    p_value_estimate: Optional[float] = None
+    p_value_interval: Optional[Tuple[float, float]] = None
+
+@dataclass
+class MSETMatrixOutput:
+    labels: List[str]
+    list_sizes: List[int]
+    universe_size: int
+    num_trials: int
+    alternative: str
+    method: str
+    null_method: str
+    correction: str
+    # Row i, column j hold the result for lists i and j. The intersection diagonal holds the
+    # list sizes and the p-value diagonals are left empty.
+    intersection_sizes: List[List[int]]
+    p_values: List[List[Optional[float]]]
+    adjusted_p_values: List[List[Optional[float]]]
@@ -1,7 +1,18 @@
+import math
 import random
 from collections import Counter
 from concurrent.futures import ProcessPoolExecutor, as_completed
-from typing import List, Dict
+from statistics import NormalDist
+from typing import Callable, List, Dict, Optional, Tuple
+
+import numpy as np
+
+# Number of trials simulated together by the vectorized engine. Bounds memory to a
+# few hundred kilobytes per batch regardless of num_trials.
+DEFAULT_BATCH_SIZE = 65536
+
+# Number of trials in one unit of work for the process pool.
+DEFAULT_CHUNK_SIZE = 2000
 
 def run_trial(universe: List[str], list_1_size: int, list_2_size: int) -> int:
     """
@@ -17,51 +28,252 @@ def run_trials_basic(universe: List[str], list_1_size: int, list_2_size: int, nu
     Run trials sequentially.
     Returns a sorted list of trial intersection sizes.
     """
+    universe = list(universe)  # random.sample needs a sequence, not e.g. an interned id array
     trials = []
     for _ in range(num_trials):
         trials.append(run_trial(universe, list_1_size, list_2_size))
     trials.sort()
     return trials
 
-def run_trials_parallel(universe: List[str], list_1_size: int, list_2_size: int, num_trials: int, workers: int = None) -> List[int]:
+def _run_trial_chunk(universe_size: int, list_1_size: int, list_2_size: int, num_trials: int,
+                     seed_seq: np.random.SeedSequence) -> Dict[int, int]:
+    """
+    Run a chunk of trials on the gene indices 0..universe_size-1 with the chunk's own RNG stream.
+    Returns the partial histogram of intersection sizes.
+    """
+    rng = np.random.default_rng(seed_seq)
+    in_sample1 = np.zeros(universe_size, dtype=bool)
+    counts = np.zeros(min(list_1_size, list_2_size) + 1, dtype=np.int64)
+    for _ in range(num_trials):
+        sample1 = rng.choice(universe_size, list_1_size, replace=False, shuffle=False)
+        sample2 = rng.choice(universe_size, list_2_size, replace=False, shuffle=False)
+        in_sample1[sample1] = True
+        counts[np.count_nonzero(in_sample1[sample2])] += 1
+        in_sample1[sample1] = False
+    return {size: int(count) for size, count in enumerate(counts) if count}
+
+def run_trials_parallel(universe: List[str], list_1_size: int, list_2_size: int, num_trials: int, workers: int = None,
+                        seed: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[int]:
     """
     Run trials using parallel processing with ProcessPoolExecutor.
     Returns a sorted list of trial intersection sizes.
+
+    Only the universe size matters, so workers draw gene indices and nothing but sizes and
+    seeds cross process boundaries. Each chunk draws from its own independent RNG stream
+    and sends back a partial histogram.
     
     Parameters:
       - workers: Optional; number of worker processes to use. If None, the executor
                  will choose the default of your cpu
+      - seed: Optional; root seed from which every chunk's RNG stream is spawned.
+      - chunk_size: Number of trials in one unit of work.
     """
-    trials = []
+    universe_size = len(universe)
+    if list_1_size > universe_size or list_2_size > universe_size:
+        raise ValueError("Sample larger than population or is negative")
+    chunks = [min(chunk_size, num_trials - start) for start in range(0, num_trials, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    hist = Counter()
     with ProcessPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(run_trial, universe, list_1_size, list_2_size) for _ in range(num_trials)]
+        futures = [executor.submit(_run_trial_chunk, universe_size, list_1_size, list_2_size, size, seed_seq)
+                   for size, seed_seq in zip(chunks, seeds)]
         for future in as_completed(futures):
-            trials.append(future.result())
+            hist.update(future.result())
+    return [size for size in sorted(hist) for _ in range(hist[size])]
+
+def _vectorized_batch(rng: np.random.Generator, universe_size: int, list_1_size: int,
+                      list_2_size: int, size: int) -> np.ndarray:
+    """
+    Simulate one batch of trials and return their (unsorted) intersection sizes.
+
+    Only the universe size matters, so the genes are replaced by the indices 0..n-1 and the
+    larger list is pinned to the first indices (every draw is uniform, so which indices it
+    occupies does not change the distribution). The number of the smaller list's draws that
+    land inside the pinned block is then hypergeometric, and NumPy samples it for the whole
+    batch at once.
+    """
+    pinned = max(list_1_size, list_2_size)
+    draws = min(list_1_size, list_2_size)
+    return rng.hypergeometric(pinned, universe_size - pinned, draws, size=size).astype(np.int64)
+
+def run_trials_vectorized(universe: List[str], list_1_size: int, list_2_size: int, num_trials: int,
+                          seed: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> List[int]:
+    """
+    Run trials on integer indices with a NumPy Generator, a whole batch of trials at a time.
+    Returns a sorted list of trial intersection sizes with the same distribution as run_trials_basic.
+
+    Parameters:
+      - seed: Optional; seed for the NumPy Generator so runs can be reproduced.
+      - batch_size: Number of trials simulated together.
+    """
+    universe_size = len(universe)
+    if list_1_size > universe_size or list_2_size > universe_size:
+        raise ValueError("Sample larger than population or is negative")
+
+    rng = np.random.default_rng(seed)
+    trials = np.empty(num_trials, dtype=np.int64)
+    for start in range(0, num_trials, batch_size):
+        size = min(batch_size, num_trials - start)
+        trials[start:start + size] = _vectorized_batch(rng, universe_size, list_1_size, list_2_size, size)
     trials.sort()
-    return trials
+    return trials.tolist()
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.99) -> Tuple[float, float]:
+    """
+    Wilson score interval for a binomial proportion such as a Monte Carlo p-value.
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    p_hat = successes / float(trials)
+    denom = 1.0 + z * z / trials
+    centre = (p_hat + z * z / (2.0 * trials)) / denom
+    half = z * math.sqrt(p_hat * (1.0 - p_hat) / trials + z * z / (4.0 * trials * trials)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+def run_trials_adaptive(universe: List[str], list_1_size: int, list_2_size: int, intersect_size: int,
+                        max_trials: int, representation: str = 'over', alpha: float = 0.05,
+                        precision: Optional[float] = None, confidence: float = 0.99,
+                        round_size: int = 500, seed: Optional[int] = None,
+                        on_round: Optional[Callable[[int, float, Tuple[float, float]], None]] = None
+                        ) -> Tuple[List[int], Tuple[float, float]]:
+    """
+    Run trials in rounds and stop as soon as the p-value is decided.
+
+    After every round the p-value estimate gets a Wilson confidence interval. Sampling stops
+    once the interval lies entirely above or below alpha, once its half-width is within
+    precision (if given), or when max_trials is reached.
+
+    Parameters:
+      - intersect_size: Observed intersection size the p-value is computed for.
+      - representation: 'over' counts trials at least as large as observed, 'under' smaller ones.
+      - alpha: Significance level the p-value is decided against.
+      - precision: Optional; stop once the interval half-width is at most this value.
+      - confidence: Confidence level of the interval.
+      - round_size: Number of trials simulated per round.
+      - on_round: Optional; called with (trials_done, estimate, interval) after every round.
+
+    Returns:
+      A sorted list of the trial intersection sizes actually simulated and the final interval.
+    """
+    universe_size = len(universe)
+    if list_1_size > universe_size or list_2_size > universe_size:
+        raise ValueError("Sample larger than population or is negative")
+    if representation not in ('over', 'under'):
+        raise ValueError("representation must be either 'over' or 'under'")
+
+    rng = np.random.default_rng(seed)
+    batches = []
+    done = 0
+    extreme = 0
+    interval = (0.0, 1.0)
+    while done < max_trials:
+        size = min(round_size, max_trials - done)
+        batch = _vectorized_batch(rng, universe_size, list_1_size, list_2_size, size)
+        batches.append(batch)
+        done += size
+        above = int(np.count_nonzero(batch >= intersect_size))
+        extreme += above if representation == 'over' else size - above
+
+        interval = wilson_interval(extreme, done, confidence)
+        if on_round:
+            on_round(done, extreme / float(done), interval)
+        if interval[1] < alpha or interval[0] > alpha:
+            break
+        if precision is not None and (interval[1] - interval[0]) / 2.0 <= precision:
+            break
+
+    trials = np.concatenate(batches) if batches else np.empty(0, dtype=np.int64)
+    trials.sort()
+    return trials.tolist(), interval
+
+def _log_binomial(n: int, k: int) -> float:
+    """Natural log of the binomial coefficient n choose k."""
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+
+def _log_sum_exp(values: List[float]) -> float:
+    """Numerically stable log(sum(exp(values))); -inf for an empty list."""
+    if not values:
+        return float('-inf')
+    peak = max(values)
+    return peak + math.log(sum(math.exp(v - peak) for v in values))
+
+def hypergeometric_log_pmf(universe_size: int, list_1_size: int, list_2_size: int) -> Dict[int, float]:
+    """
+    Exact null distribution of the intersection size of two random lists, in log space.
+    Returns a dictionary mapping every possible intersection size to its log probability.
+    """
+    if list_1_size > universe_size or list_2_size > universe_size:
+        raise ValueError("Sample larger than population or is negative")
+    log_total = _log_binomial(universe_size, list_2_size)
+    low = max(0, list_1_size + list_2_size - universe_size)
+    high = min(list_1_size, list_2_size)
+    return {k: _log_binomial(list_1_size, k) + _log_binomial(universe_size - list_1_size, list_2_size - k) - log_total
+            for k in range(low, high + 1)}
+
+def exact_pvalue(universe_size: int, list_1_size: int, list_2_size: int,
+                 intersect_size: int, representation: str = 'over') -> float:
+    """
+    Exact p-value of an observed intersection size under the hypergeometric null.
+    'over' is the probability of an intersection at least as large as observed and 'under'
+    the probability of a smaller one, matching the tails counted from simulated trials.
+    """
+    log_pmf = hypergeometric_log_pmf(universe_size, list_1_size, list_2_size)
+    if representation == 'over':
+        tail = [lp for k, lp in log_pmf.items() if k >= intersect_size]
+    elif representation == 'under':
+        tail = [lp for k, lp in log_pmf.items() if k < intersect_size]
+    else:
+        raise ValueError("representation must be either 'over' or 'under'")
+    if len(tail) == len(log_pmf):
+        return 1.0
+    return min(1.0, math.exp(_log_sum_exp(tail)))
+
+def exact_histogram(universe_size: int, list_1_size: int, list_2_size: int, num_trials: int) -> Dict[int, int]:
+    """
+    Expected histogram of num_trials trials under the hypergeometric null.
+    Counts are rounded with the largest remainder method so they always sum to num_trials.
+    """
+    expected = {k: math.exp(lp) * num_trials
+                for k, lp in hypergeometric_log_pmf(universe_size, list_1_size, list_2_size).items()}
+    hist = {k: int(math.floor(v)) for k, v in expected.items()}
+    remainder = num_trials - sum(hist.values())
+    for k in sorted(expected, key=lambda k: expected[k] - hist[k], reverse=True)[:remainder]:
+        hist[k] += 1
+    return {k: v for k, v in hist.items() if v > 0}
+
+def run_trials_exact(universe: List[str], list_1_size: int, list_2_size: int, num_trials: int) -> List[int]:
+    """
+    Deterministic stand-in for simulated trials: the sorted list of intersection sizes
+    whose histogram is the expected hypergeometric histogram of num_trials trials.
+    """
+    hist = exact_histogram(len(universe), list_1_size, list_2_size, num_trials)
+    return [k for k in sorted(hist) for _ in range(hist[k])]
 
 def run_trials(universe: List[str], list_1_size: int, list_2_size: int,
                num_trials: int, mode: str = 'auto', workers: int = None,
-               threshold: int = 1000) -> List[int]:
+               threshold: int = 1000, seed: Optional[int] = None) -> List[int]:
     """
-    Run trials using one of two methods: basic (sequential) or parallel.
+    Run trials using one of three methods: basic (sequential), parallel or vectorized,
+    or build them from the exact hypergeometric null.
     
     Parameters:
-      - mode: 'basic', 'parallel', or 'auto'. 
-              If 'auto', the function will choose parallel execution if num_trials >= threshold.
+      - mode: 'basic', 'parallel', 'vectorized', 'exact' or 'auto'.
+              If 'auto', the function uses the vectorized engine.
       - workers: Number of parallel worker processes (if using parallel mode).
-      - threshold: The number of trials above which the function will automatically choose parallel execution.
+      - threshold: Kept for callers of the earlier 'auto' heuristic, which switched to parallel
+                   execution above this many trials. The vectorized engine is faster at any size.
+      - seed: Optional; seed for the vectorized and parallel engines.
     
     Returns:
       A sorted list of trial intersection sizes.
     """
-    #could have any check for auto(this is exxtendable)
-    if mode == 'auto':
-        if num_trials >= threshold:
-            return run_trials_parallel(universe, list_1_size, list_2_size, num_trials, workers=workers)
-        else:
-            return run_trials_basic(universe, list_1_size, list_2_size, num_trials)
+    if mode == 'exact':
+        return run_trials_exact(universe, list_1_size, list_2_size, num_trials)
+    elif mode in ('auto', 'vectorized'):
+        return run_trials_vectorized(universe, list_1_size, list_2_size, num_trials, seed=seed)
     elif mode == 'parallel':
-        return run_trials_parallel(universe, list_1_size, list_2_size, num_trials, workers=workers)
+        return run_trials_parallel(universe, list_1_size, list_2_size, num_trials, workers=workers, seed=seed)
     else:
         return run_trials_basic(universe, list_1_size, list_2_size, num_trials)
\ No newline at end of file
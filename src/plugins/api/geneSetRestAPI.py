@@ -1,11 +1,17 @@
-import requests
+from plugins.api.http_client import api_url, get_client, jax_api_url
+from plugins.api.response_cache import geneset_cache
+from plugins.api.species_registry import VALID_SPECIES_NAMES, species_registry
+from plugins.api.symbol_mapper import symbol_mapper
 
-VALID_SPECIES_NAMES = [
-    "All", "Mus Musculus", "Homo Sapiens", "Rattus Norvegicus", "Danio Rerio",
-    "Drosophila Melanogaster", "Macaca Mulatta", "Caenorhabditis Elegans",
-    "Saccharomyces Cerevisiae", "Gallus Gallus", "Canis Familiaris",
-    "Xenopus Tropicalis", "Xenopus Laevis"
-]
+
+def _source_ids_from_geneset(geneset_data):
+    species_id = geneset_data["object"]["geneset"]["species_id"]
+    gsv_source_lists = [
+        item["gsv_source_list"]
+        for item in geneset_data.get("object", {}).get("geneset_values", [])
+    ]
+    source_ids = [source_id for sublist in gsv_source_lists for source_id in sublist]
+    return species_id, source_ids
 
 def fetchGeneSymbols_from_geneset(geneset_id):
     """
@@ -22,14 +28,7 @@ def fetchGeneSymbols_from_geneset(geneset_id):
     Raises:
         Exception on API errors.
     """
-    geneset_data = get_geneset_data(geneset_id)
-    species_id = geneset_data["object"]["geneset"]["species_id"]
-    
-    gsv_source_lists = [
-        item["gsv_source_list"]
-        for item in geneset_data.get("object", {}).get("geneset_values", [])
-    ]
-    source_ids = [source_id for sublist in gsv_source_lists for source_id in sublist]
+    species_id, source_ids = _source_ids_from_geneset(get_geneset_data(geneset_id))
 
     # Check if source_ids are already gene symbols
     all_look_like_symbols = all(not source_id.isnumeric() for source_id in source_ids)
@@ -43,6 +42,16 @@ def fetchGeneSymbols_from_geneset(geneset_id):
     
     return gene_symbols
 
+async def fetchGeneSymbols_from_geneset_async(geneset_id):
+    """
+    Awaitable version of fetchGeneSymbols_from_geneset.
+    """
+    species_id, source_ids = _source_ids_from_geneset(await get_geneset_data_async(geneset_id))
+    if all(not source_id.isnumeric() for source_id in source_ids):
+        return source_ids
+    species_name = await get_species_name_async(species_id)
+    return await get_gene_symbols_async(source_ids, species_name)
+
 def get_geneset_data(geneset_id):
     """
     Retrieve gene set data from the API.
@@ -51,20 +60,35 @@ def get_geneset_data(geneset_id):
         geneset_id: Gene set identifier.
     
     Returns:
-        Dictionary with gene set data.
+        Dictionary with gene set data. It is served from geneset_cache and shared
+        between callers, so it must not be modified.
     
     Raises:
         Exception if the API request fails.
     """
-    url = f"https://geneweaver.org/api/genesets/{geneset_id}"
-    response = requests.get(url)
+    url = api_url(f"genesets/{geneset_id}")
+    return geneset_cache.get(("geneset", str(geneset_id)),
+                             lambda: _parse_geneset_response(get_client().get(url)))
+
+async def get_geneset_data_async(geneset_id):
+    """
+    Awaitable version of get_geneset_data.
+    """
+    url = api_url(f"genesets/{geneset_id}")
+
+    async def load():
+        return _parse_geneset_response(await get_client().aget(url))
+
+    return await geneset_cache.aget(("geneset", str(geneset_id)), load)
+
+def _parse_geneset_response(response):
     if response.status_code != 200:
         raise Exception(f"Error fetching geneset: {response.text}")
     return response.json()
 
 def get_species_name(species_id):
     """
-    Get standardized species name by ID.
+    Get standardized species name by ID, from the species registry.
     
     Args:
         species_id: Species identifier.
@@ -75,45 +99,37 @@ def get_species_name(species_id):
     Raises:
         Exception if species not found.
     """
-    url = "https://geneweaver.org/api/species"
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise Exception(f"Error fetching species list: {response.text}")
+    return species_registry.canonical_name(species_id)
 
-    species_list = response.json().get("data", [])
-    for species in species_list:
-        if species["id"] == species_id:
-            for valid_name in VALID_SPECIES_NAMES:
-                if valid_name.lower() == species["name"].strip().lower():
-                    return valid_name
-    raise Exception(f"Species ID {species_id} not matched with valid names.")
+async def get_species_name_async(species_id):
+    """
+    Awaitable version of get_species_name.
+    """
+    await species_registry.ensure_loaded_async()
+    return species_registry.canonical_name(species_id)
 
 def get_gene_symbols(source_ids, species_name):
     """
     Map source IDs to gene symbols via the API.
+    IDs mapped before are served from symbol_mapper's memo; the rest are sent in batches.
     
     Args:
         source_ids: List of source IDs.
         species_name: Standardized species name.
     
     Returns:
-        List of gene symbols.
+        List of gene symbols, in source ID order.
     
     Raises:
         Exception if the API mapping fails.
     """
-    url = "https://geneweaver.org/api/genes/mappings"
-    payload = {
-        "source_ids": source_ids,
-        "target_gene_id_type": "Gene Symbol",
-        "species": species_name
-    }
-    response = requests.post(url, json=payload)
-    if response.status_code != 200:
-        raise Exception(f"Error fetching gene mappings: {response.text}")
-    
-    data = response.json()
-    return [entry["mapped_ref_id"] for entry in data.get("gene_ids_map", [])]
+    return symbol_mapper.map(source_ids, species_name)
+
+async def get_gene_symbols_async(source_ids, species_name):
+    """
+    Awaitable version of get_gene_symbols.
+    """
+    return await symbol_mapper.map_async(source_ids, species_name)
 
 def parse_ode_gene_id_FromGeneSet(jsonResponse:dict):
     obj=jsonResponse["object"]
@@ -124,23 +140,30 @@ def parse_ode_gene_id_FromGeneSet(jsonResponse:dict):
     return result
 
 def fetchGeneSets_ode_gene_id(geneSetID:int):
-    url= f'https://geneweaver.jax.org/api/genesets/{geneSetID}'
-    headers = {
-        "Accept": "application/json"
-    }
-    response = requests.get(url,headers=headers)
-    dic=response.json()
-    return parse_ode_gene_id_FromGeneSet(dic)
+    url = jax_api_url(f'genesets/{geneSetID}')
+    ode_gene_ids = geneset_cache.get(("ode_gene_ids", str(geneSetID)),
+                                     lambda: parse_ode_gene_id_FromGeneSet(get_client().get(url).json()))
+    return list(ode_gene_ids)
 
-def fetchSpecies():
-    url = 'https://geneweaver.jax.org/api/species'
-    headers = {
-        "Accept": "application/json"
-    }
-    response = requests.get(url, headers=headers)
-    species_data = response.json()['data']
+async def fetchGeneSets_ode_gene_id_async(geneSetID:int):
+    url = jax_api_url(f'genesets/{geneSetID}')
+
+    async def load():
+        return parse_ode_gene_id_FromGeneSet((await get_client().aget(url)).json())
+
+    return list(await geneset_cache.aget(("ode_gene_ids", str(geneSetID)), load))
+
+def parse_species(jsonResponse:dict):
     result = []
-    for species in species_data:
+    for species in jsonResponse['data']:
         if species['id'] != 0:
             result.append((species['id'], species['name']))
-    return result
\ No newline at end of file
+    return result
+
+def fetchSpecies():
+    response = get_client().get(jax_api_url('species'))
+    return parse_species(response.json())
+
+async def fetchSpecies_async():
+    response = await get_client().aget(jax_api_url('species'))
+    return parse_species(response.json())
@@ -0,0 +1,144 @@
+"""
+Shared, pooled HTTP client for the GeneWeaver ReST API.
+
+One requests.Session with a bounded connection pool is reused by every call, so
+connections are kept alive between requests instead of paying a TCP/TLS handshake
+each time. Every request gets a timeout. The async methods run the blocking call in
+a worker thread, so plugin runs can await them without blocking their event loop.
+"""
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple, TypeVar, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Defaults, overridable through the environment or configure_client().
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get("GENEWEAVER_CONNECT_TIMEOUT", 5))
+DEFAULT_READ_TIMEOUT = float(os.environ.get("GENEWEAVER_READ_TIMEOUT", 60))
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get("GENEWEAVER_MAX_CONNECTIONS", 20))
+# Requests gather_bounded keeps in flight; stays below the connection limit.
+DEFAULT_FETCH_CONCURRENCY = 8
+
+# Base URLs of the two GeneWeaver API hosts, e.g. pointed at a local stand-in for benchmarks.
+API_URL = os.environ.get("GENEWEAVER_API_URL", "https://geneweaver.org/api").rstrip("/")
+JAX_API_URL = os.environ.get("GENEWEAVER_JAX_API_URL", "https://geneweaver.jax.org/api").rstrip("/")
+
+# Path of a recorded cassette to replay instead of calling the API; see plugins.api.replay.
+REPLAY_ENV = "GENEWEAVER_REPLAY"
+
+Timeout = Union[float, Tuple[float, float]]
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def api_url(path: str) -> str:
+    """URL of path on the geneweaver.org API."""
+    return f"{API_URL}/{path.lstrip('/')}"
+
+
+def jax_api_url(path: str) -> str:
+    """URL of path on the geneweaver.jax.org API."""
+    return f"{JAX_API_URL}/{path.lstrip('/')}"
+
+
+def configure_base_urls(api: Optional[str] = None, jax_api: Optional[str] = None) -> None:
+    """Point the API functions at other hosts; arguments left out keep their current value."""
+    global API_URL, JAX_API_URL
+    if api is not None:
+        API_URL = api.rstrip("/")
+    if jax_api is not None:
+        JAX_API_URL = jax_api.rstrip("/")
+
+
+class GeneWeaverClient:
+    """
+    Pooled HTTP client with keep-alive, default timeouts and a connection limit.
+
+    Args:
+        timeout: Default (connect, read) timeout in seconds, or one value for both.
+        max_connections: Maximum open connections per host. Callers beyond the limit wait
+            for a free connection instead of opening new ones.
+    """
+
+    def __init__(self, timeout: Timeout = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_connections, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request through the shared session, applying the default timeout."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    async def aget(self, url: str, **kwargs: Any) -> requests.Response:
+        """Awaitable GET; the request runs in a worker thread."""
+        return await asyncio.to_thread(self.get, url, **kwargs)
+
+    async def apost(self, url: str, **kwargs: Any) -> requests.Response:
+        """Awaitable POST; the request runs in a worker thread."""
+        return await asyncio.to_thread(self.post, url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client: Optional[GeneWeaverClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GeneWeaverClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeneWeaverClient()
+                _install_replay_from_env(_client)
+    return _client
+
+
+def configure_client(**kwargs: Any) -> GeneWeaverClient:
+    """Replace the process-wide client, e.g. with other timeouts or connection limits."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = GeneWeaverClient(**kwargs)
+        _install_replay_from_env(_client)
+    return _client
+
+
+def _install_replay_from_env(client: GeneWeaverClient) -> None:
+    if os.environ.get(REPLAY_ENV):
+        from plugins.api.replay import install_from_env
+        install_from_env(client)
+
+
+async def gather_bounded(fetch: Callable[[T], Awaitable[R]], items: Iterable[T],
+                         concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+                         return_exceptions: bool = False) -> List[Union[R, BaseException]]:
+    """
+    Await fetch(item) for every item, at most concurrency at a time, and return the results in
+    the order of items. With return_exceptions, a failed fetch leaves its exception in its place
+    (which may be any BaseException, e.g. CancelledError) instead of failing the whole call.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(item: T) -> R:
+        async with semaphore:
+            return await fetch(item)
+
+    return await asyncio.gather(*(bounded(item) for item in items), return_exceptions=return_exceptions)
@@ -0,0 +1,226 @@
+"""
+Record/replay transport for the GeneWeaver API.
+
+A cassette holds recorded API responses: GET responses keyed by method and path (the
+host is ignored, so the same cassette serves both API hosts and any configured base
+URL), and gene mappings per species and source ID, so /genes/mappings requests are
+answered for any batch of IDs. Mapping answers whose entries do not name their
+original_ref_id cannot be split per ID; they are kept whole and replayed for the same
+batch only. Mounting a ReplayAdapter on the shared client's session
+serves the cassette instead of the network, with configurable latency and injected
+errors; a RecordingAdapter fills a cassette from real traffic.
+
+Replay can be enabled without code changes by setting GENEWEAVER_REPLAY to a cassette
+path, with GENEWEAVER_REPLAY_LATENCY (seconds, or "low,high" for a uniform range) and
+GENEWEAVER_REPLAY_ERROR_RATE (0..1).
+"""
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from plugins.api.http_client import REPLAY_ENV, GeneWeaverClient, get_client
+
+MAPPINGS_PATH_SUFFIX = "/genes/mappings"
+
+Latency = Union[float, Tuple[float, float]]
+
+
+class Cassette:
+    """
+    Recorded API responses.
+
+    Args:
+        responses: "METHOD /path" -> {"status": int, "body": JSON body}.
+        mappings: species name -> source ID -> list of mapped symbols.
+        batches: species name -> JSON list of source IDs -> the entries answering that batch,
+            for answers that do not name the source ID of each entry.
+    """
+
+    def __init__(self, responses: Optional[Dict[str, dict]] = None,
+                 mappings: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 batches: Optional[Dict[str, Dict[str, List[dict]]]] = None):
+        self.responses = responses or {}
+        self.mappings = mappings or {}
+        self.batches = batches or {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method: str, url: str) -> str:
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        return f"{method.upper()} {path}"
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data.get("responses"), data.get("mappings"), data.get("batches"))
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            data = {"responses": self.responses, "mappings": self.mappings, "batches": self.batches}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def add_response(self, method: str, url: str, body, status: int = 200) -> None:
+        with self._lock:
+            self.responses[self.key(method, url)] = {"status": status, "body": body}
+
+    def add_mappings(self, species_name: str, source_ids: List[str], entries: List[dict]) -> None:
+        """Store a /genes/mappings answer; source IDs without a mapping are stored as empty."""
+        with self._lock:
+            if len(source_ids) > 1 and any(entry.get("original_ref_id") is None for entry in entries):
+                self.batches.setdefault(species_name, {})[json.dumps(source_ids)] = [dict(entry) for entry in entries]
+                return
+            species = self.mappings.setdefault(species_name, {})
+            for source_id in source_ids:
+                species.setdefault(source_id, [])
+            for entry in entries:
+                # A single-ID batch's entries all answer that ID
+                symbols = species.setdefault(entry.get("original_ref_id") or source_ids[0], [])
+                if entry["mapped_ref_id"] not in symbols:
+                    symbols.append(entry["mapped_ref_id"])
+
+    def map_ids(self, species_name: str, source_ids: List[str]) -> List[dict]:
+        batch = self.batches.get(species_name, {}).get(json.dumps(source_ids))
+        if batch is not None:
+            return [dict(entry) for entry in batch]
+        species = self.mappings.get(species_name, {})
+        return [{"original_ref_id": source_id, "mapped_ref_id": symbol}
+                for source_id in source_ids for symbol in species.get(source_id, [])]
+
+
+def _build_response(request: requests.PreparedRequest, status: int, body) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body).encode("utf-8")
+    response.headers["Content-Type"] = "application/json"
+    response.encoding = "utf-8"
+    response.url = request.url
+    response.request = request
+    response.reason = "OK" if status == 200 else "Replay"
+    return response
+
+
+def _is_mapping_request(request: requests.PreparedRequest) -> bool:
+    return request.method == "POST" and urlsplit(request.url).path.endswith(MAPPINGS_PATH_SUFFIX)
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter answering every request from a cassette.
+
+    Args:
+        cassette: Responses to serve; requests it has no answer for get a 404.
+        latency: Delay per request in seconds, or a (low, high) range drawn uniformly.
+        error_rate: Fraction of requests answered with error_status instead.
+        error_status: HTTP status of injected errors.
+        seed: Optional; seed for the latency and error draws.
+    """
+
+    def __init__(self, cassette: Cassette, latency: Latency = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: Optional[int] = None):
+        super().__init__()
+        self.cassette = cassette
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._rng_lock:
+            self.requests += 1
+            if isinstance(self.latency, tuple):
+                delay = self._rng.uniform(*self.latency)
+            else:
+                delay = self.latency
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return delay, failed
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        delay, failed = self._draw()
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            return _build_response(request, self.error_status, {"detail": "Injected replay error"})
+        if _is_mapping_request(request):
+            payload = json.loads(request.body)
+            entries = self.cassette.map_ids(payload["species"], payload["source_ids"])
+            return _build_response(request, 200, {"gene_ids_map": entries})
+        entry = self.cassette.responses.get(Cassette.key(request.method, request.url))
+        if entry is None:
+            return _build_response(request, 404, {"detail": f"Not recorded: {request.method} {request.url}"})
+        return _build_response(request, entry["status"], entry["body"])
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter that performs real requests and records their JSON answers into a cassette."""
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            if _is_mapping_request(request):
+                payload = json.loads(request.body)
+                entries = response.json().get("gene_ids_map", [])
+                self.cassette.add_mappings(payload["species"], payload["source_ids"], entries)
+            else:
+                self.cassette.add_response(request.method, request.url, response.json())
+        return response
+
+
+def _mount(client: GeneWeaverClient, adapter: BaseAdapter) -> None:
+    client.session.mount("https://", adapter)
+    client.session.mount("http://", adapter)
+
+
+def install_replay(cassette: Cassette, client: Optional[GeneWeaverClient] = None, **kwargs) -> ReplayAdapter:
+    """Serve every request of the client (default: the shared one) from the cassette."""
+    adapter = ReplayAdapter(cassette, **kwargs)
+    _mount(client or get_client(), adapter)
+    return adapter
+
+
+def install_recorder(cassette: Cassette, client: Optional[GeneWeaverClient] = None) -> RecordingAdapter:
+    """Record every answer the client (default: the shared one) gets into the cassette."""
+    client = client or get_client()
+    adapter = RecordingAdapter(cassette, pool_maxsize=client.max_connections, pool_block=True)
+    _mount(client, adapter)
+    return adapter
+
+
+def _parse_latency(value: str) -> Latency:
+    if "," in value:
+        low, high = value.split(",", 1)
+        return float(low), float(high)
+    return float(value)
+
+
+def install_from_env(client: GeneWeaverClient) -> ReplayAdapter:
+    """Install replay on the client as configured by the GENEWEAVER_REPLAY* environment variables."""
+    return install_replay(
+        Cassette.load(os.environ[REPLAY_ENV]),
+        client,
+        latency=_parse_latency(os.environ.get("GENEWEAVER_REPLAY_LATENCY", "0")),
+        error_rate=float(os.environ.get("GENEWEAVER_REPLAY_ERROR_RATE", 0)),
+    )
@@ -0,0 +1,153 @@
+"""
+In-process cache for GeneWeaver API responses.
+
+Entries expire after a TTL and are evicted least recently used first. Loads are
+deduplicated ("singleflight"): while one caller is fetching a key, every other caller of
+that key, synchronous or async and from any thread, waits for the same result instead
+of issuing its own request. Failed loads are shared with the waiting callers but never
+cached.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("GENEWEAVER_CACHE_SIZE", 1024))
+DEFAULT_TTL = float(os.environ.get("GENEWEAVER_CACHE_TTL", 3600))
+
+
+class ResponseCache:
+    """
+    LRU/TTL cache with singleflight loading.
+
+    Args:
+        max_entries: Number of responses kept before the least recently used is evicted.
+        ttl: Seconds a response stays valid.
+        clock: Time source, replaceable in tests.
+
+    Counters:
+        hits: Served from the cache.
+        misses: Loaded upstream; this is the number of upstream calls.
+        shared: Joined a load another caller already had in flight.
+        upstream_seconds: Total time spent in upstream loads.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.upstream_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _claim(self, key: Hashable) -> Tuple[str, Any]:
+        """
+        Look key up and, on a miss, either join the load in flight or become its leader.
+        Returns ("hit", value), ("wait", future of the load in flight) or ("lead", future
+        the caller must complete through _finish).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return "hit", value
+                del self._entries[key]
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+                return "wait", future
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._in_flight[key] = future
+            self.misses += 1
+            return "lead", future
+
+    def _finish(self, key: Hashable, future: Future, started: float, value: Any = None,
+                error: BaseException = None) -> None:
+        with self._lock:
+            self.upstream_seconds += time.monotonic() - started
+            del self._in_flight[key]
+            if error is None:
+                self._entries[key] = (self.clock() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader() at most once across concurrent callers."""
+        state, found = self._claim(key)
+        if state == "hit":
+            return found
+        if state == "wait":
+            return found.result()
+        future = found
+        started = time.monotonic()
+        try:
+            value = loader()
+        except BaseException as e:
+            self._finish(key, future, started, error=e)
+            raise
+        self._finish(key, future, started, value=value)
+        return value
+
+    async def aget(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaitable get(); loader is a coroutine function."""
+        state, found = self._claim(key)
+        if state == "hit":
+            return found
+        if state == "wait":
+            return await asyncio.wrap_future(found)
+        future = found
+        started = time.monotonic()
+        try:
+            value = await loader()
+        except BaseException as e:
+            self._finish(key, future, started, error=e)
+            raise
+        self._finish(key, future, started, value=value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every cached response and reset the counters; loads in flight are unaffected."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.shared = 0
+            self.upstream_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.shared
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "hit_rate": (self.hits + self.shared) / lookups if lookups else 0.0,
+                "upstream_seconds": round(self.upstream_seconds, 3),
+            }
+
+
+# Process-wide cache of gene set payloads, shared by every tool.
+geneset_cache = ResponseCache()
@@ -0,0 +1,135 @@
+"""
+Process-wide registry of GeneWeaver species.
+
+The species list is downloaded once, on first use, and then refreshed by a background
+thread. The lookups every task needs are precomputed at load time: id -> short name
+(e.g. "Mm"), id -> full name and id -> canonical name (one of VALID_SPECIES_NAMES).
+"""
+import asyncio
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+from plugins.api.http_client import get_client, jax_api_url
+
+DEFAULT_REFRESH_INTERVAL = float(os.environ.get("GENEWEAVER_SPECIES_REFRESH", 3600))
+
+VALID_SPECIES_NAMES = [
+    "All", "Mus Musculus", "Homo Sapiens", "Rattus Norvegicus", "Danio Rerio",
+    "Drosophila Melanogaster", "Macaca Mulatta", "Caenorhabditis Elegans",
+    "Saccharomyces Cerevisiae", "Gallus Gallus", "Canis Familiaris",
+    "Xenopus Tropicalis", "Xenopus Laevis"
+]
+_CANONICAL_BY_LOWER = {name.lower(): name for name in VALID_SPECIES_NAMES}
+
+
+def fetch_species_data() -> List[dict]:
+    """Download the raw species list: dictionaries with at least "id" and "name"."""
+    response = get_client().get(jax_api_url('species'))
+    if response.status_code != 200:
+        raise Exception(f"Error fetching species list: {response.text}")
+    return response.json()["data"]
+
+
+class _SpeciesIndex:
+    """Immutable snapshot of the lookups, swapped in whole on every refresh."""
+
+    def __init__(self, species_data: List[dict]):
+        self.short: Dict[int, str] = {}
+        self.full: Dict[int, str] = {}
+        self.canonical: Dict[int, str] = {}
+        for species in species_data:
+            species_id, name = species["id"], species["name"]
+            canonical = _CANONICAL_BY_LOWER.get(name.strip().lower())
+            if canonical is not None:
+                self.canonical[species_id] = canonical
+            if species_id != 0:  # 0 is the "All" pseudo-species
+                self.short[species_id] = "".join(item[0] for item in name.split())
+                self.full[species_id] = name
+
+
+class SpeciesRegistry:
+    """
+    Cached species lookups with background refresh.
+
+    Args:
+        loader: Returns the raw species list; defaults to fetching it from GeneWeaver.
+        refresh_interval: Seconds between background refreshes; 0 or less disables them.
+    """
+
+    def __init__(self, loader: Callable[[], List[dict]] = fetch_species_data,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._index: Optional[_SpeciesIndex] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self.loads = 0
+
+    def _get_index(self) -> _SpeciesIndex:
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = _SpeciesIndex(self.loader())
+                    self.loads += 1
+                    self._start_refresher()
+                index = self._index
+        return index
+
+    def _start_refresher(self) -> None:
+        if self.refresh_interval <= 0 or self._refresher is not None:
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name="species-registry-refresh", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good snapshot until the next attempt
+                print(f"Species registry refresh failed: {e}")
+
+    def refresh(self) -> None:
+        """Reload the species list now and swap the new lookups in."""
+        index = _SpeciesIndex(self.loader())
+        with self._lock:
+            self._index = index
+            self.loads += 1
+
+    def ensure_loaded(self) -> None:
+        self._get_index()
+
+    async def ensure_loaded_async(self) -> None:
+        """Load the registry without blocking the event loop; a no-op once loaded."""
+        if self._index is None:
+            await asyncio.to_thread(self._get_index)
+
+    def short_names(self) -> Dict[int, str]:
+        """species id -> initials of the species name, e.g. 1 -> "Mm". Must not be modified."""
+        return self._get_index().short
+
+    def full_names(self) -> Dict[int, str]:
+        """species id -> species name as GeneWeaver reports it. Must not be modified."""
+        return self._get_index().full
+
+    def canonical_name(self, species_id: int) -> str:
+        """
+        Standardized species name, one of VALID_SPECIES_NAMES.
+
+        Raises:
+            Exception if species not found.
+        """
+        name = self._get_index().canonical.get(species_id)
+        if name is None:
+            raise Exception(f"Species ID {species_id} not matched with valid names.")
+        return name
+
+    def close(self) -> None:
+        """Stop the background refresh."""
+        self._stop.set()
+
+
+species_registry = SpeciesRegistry()
@@ -0,0 +1,172 @@
+"""
+Batched, memoized mapping of gene source IDs to gene symbols.
+
+Source IDs are first looked up in a bounded (species, source_id) -> symbols memo; only the
+IDs not seen before are sent to /genes/mappings, split into batches that are posted
+concurrently. Entries of the mapping response carry the mapped_ref_id they map to and
+should carry the original_ref_id they were asked for. If a batch's response leaves that out,
+its symbols cannot be told apart per ID: they are returned in response order in place of the
+batch's first ID, and none of the batch's IDs are memoized.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+from plugins.api.http_client import api_url, get_client
+
+DEFAULT_BATCH_SIZE = int(os.environ.get("GENEWEAVER_MAPPING_BATCH_SIZE", 500))
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_ENTRIES = 500_000
+
+MemoKey = Tuple[str, str]
+
+
+def _payload(source_ids: List[str], species_name: str) -> dict:
+    return {
+        "source_ids": source_ids,
+        "target_gene_id_type": "Gene Symbol",
+        "species": species_name
+    }
+
+
+def _parse_mappings(response) -> List[dict]:
+    if response.status_code != 200:
+        raise Exception(f"Error fetching gene mappings: {response.text}")
+    return response.json().get("gene_ids_map", [])
+
+
+class SymbolMapper:
+    """
+    Maps source IDs to gene symbols through the GeneWeaver API, remembering every answer.
+
+    Args:
+        batch_size: Maximum number of source IDs per request.
+        concurrency: Maximum number of batch requests in flight.
+        max_entries: Number of (species, source_id) entries remembered before the least
+            recently used is forgotten.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, concurrency: int = DEFAULT_CONCURRENCY,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_entries = max_entries
+        self._memo: "OrderedDict[MemoKey, Tuple[str, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    def __len__(self) -> int:
+        return len(self._memo)
+
+    def _missing(self, source_ids: Iterable[str], species_name: str) -> List[str]:
+        """Distinct source IDs, in first-appearance order, that are not memoized yet."""
+        missing = []
+        seen = set()
+        with self._lock:
+            for source_id in source_ids:
+                if source_id in seen:
+                    continue
+                seen.add(source_id)
+                key = (species_name, source_id)
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    missing.append(source_id)
+        return missing
+
+    def _batches(self, source_ids: List[str]) -> List[List[str]]:
+        batches = [source_ids[i:i + self.batch_size] for i in range(0, len(source_ids), self.batch_size)]
+        self.batches += len(batches)
+        return batches
+
+    def _remember(self, mapped: Dict[MemoKey, Tuple[str, ...]]) -> None:
+        with self._lock:
+            for key, symbols in mapped.items():
+                self._memo[key] = symbols
+                self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def _lookup(self, source_ids: List[str], species_name: str,
+                fetched: Dict[MemoKey, Tuple[str, ...]]) -> List[str]:
+        symbols = []
+        with self._lock:
+            for source_id in source_ids:
+                key = (species_name, source_id)
+                # This call's own answers are used even if the memo already evicted them
+                symbols.extend(fetched.get(key) or self._memo.get(key, ()))
+        return symbols
+
+    def _post_batch(self, species_name: str, batch: List[str]) -> Dict[MemoKey, Tuple[str, ...]]:
+        entries = _parse_mappings(get_client().post(api_url("genes/mappings"), json=_payload(batch, species_name)))
+        return self._store(species_name, batch, entries)
+
+    async def _post_batch_async(self, species_name: str, batch: List[str],
+                                semaphore: asyncio.Semaphore) -> Dict[MemoKey, Tuple[str, ...]]:
+        async with semaphore:
+            response = await get_client().apost(api_url("genes/mappings"), json=_payload(batch, species_name))
+        return self._store(species_name, batch, _parse_mappings(response))
+
+    def _store(self, species_name: str, batch: List[str], entries: List[dict]) -> Dict[MemoKey, Tuple[str, ...]]:
+        """Symbols per requested ID of one batch's response, memoized if the entries name their IDs."""
+        if len(batch) > 1 and any(entry.get("original_ref_id") is None for entry in entries):
+            # Which entry answers which ID is unknown, so the answer is kept for this call only
+            unattributed = {(species_name, source_id): () for source_id in batch}
+            unattributed[(species_name, batch[0])] = tuple(entry["mapped_ref_id"] for entry in entries)
+            return unattributed
+        mapped = self._collect(species_name, batch, entries)
+        self._remember(mapped)
+        return mapped
+
+    @staticmethod
+    def _collect(species_name: str, batch: List[str], entries: List[dict]) -> Dict[MemoKey, Tuple[str, ...]]:
+        # IDs without a mapping get an empty entry, so they are not asked for again
+        collected: Dict[MemoKey, List[str]] = {(species_name, source_id): [] for source_id in batch}
+        for entry in entries:
+            # A single-ID batch's entries all answer that ID
+            source_id = entry.get("original_ref_id") or batch[0]
+            collected.setdefault((species_name, source_id), []).append(entry["mapped_ref_id"])
+        return {key: tuple(symbols) for key, symbols in collected.items()}
+
+    def map(self, source_ids: List[str], species_name: str) -> List[str]:
+        """
+        Gene symbols for source_ids, in input order; IDs without a mapping are left out.
+
+        Raises:
+            Exception if the API mapping fails.
+        """
+        batches = self._batches(self._missing(source_ids, species_name))
+        fetched: Dict[MemoKey, Tuple[str, ...]] = {}
+        if len(batches) == 1:
+            fetched.update(self._post_batch(species_name, batches[0]))
+        elif batches:
+            with ThreadPoolExecutor(min(self.concurrency, len(batches))) as pool:
+                for result in pool.map(lambda batch: self._post_batch(species_name, batch), batches):
+                    fetched.update(result)
+        return self._lookup(source_ids, species_name, fetched)
+
+    async def map_async(self, source_ids: List[str], species_name: str) -> List[str]:
+        """Awaitable map(); the batches are posted concurrently."""
+        batches = self._batches(self._missing(source_ids, species_name))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        fetched: Dict[MemoKey, Tuple[str, ...]] = {}
+        for result in await asyncio.gather(*(self._post_batch_async(species_name, batch, semaphore)
+                                             for batch in batches)):
+            fetched.update(result)
+        return self._lookup(source_ids, species_name, fetched)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+            self.hits = self.misses = self.batches = 0
+
+
+# Process-wide mapper used by get_gene_symbols.
+symbol_mapper = SymbolMapper()
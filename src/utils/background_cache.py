@@ -0,0 +1,146 @@
+import hashlib
+import mmap
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Optional, Tuple
+
+import numpy as np
+
+from utils.gene_helpers import CHUNK_SIZE, iter_bg_genes, iter_file_lines, iter_file_object_lines
+from utils.gene_interning import GeneInterner, intersect
+
+
+def symbol_set(genes: Iterable[str]) -> np.ndarray:
+    """Sorted, duplicate-free array of gene symbols, which the gene_interning set primitives accept as well."""
+    return np.unique(np.array(list(genes), dtype=object))
+
+
+@dataclass
+class Background:
+    """
+    A parsed and deduplicated background gene set, held as its sorted gene symbols.
+    digest is the SHA-256 of the file it came from, or None when it was built from genes directly.
+    Backgrounds hold symbols rather than interned ids, so the cache keeps no interner alive
+    and a Background means the same in every process; runs intern it with their own interner.
+    """
+    digest: Optional[str]
+    symbols: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def intern(self, interner: GeneInterner) -> np.ndarray:
+        """The background as a sorted id set of interner."""
+        return interner.intern_set(self.symbols)
+
+
+class BackgroundCache:
+    """
+    Cache of parsed background gene sets keyed by the SHA-256 of their file content, so a
+    background that was seen before is only hashed, never parsed again. Entries are evicted
+    least recently used first once the cached backgrounds hold more than max_genes genes.
+    The universe (intersection) of pairs of backgrounds is memoized alongside them.
+    """
+
+    def __init__(self, max_genes: int = 5_000_000, max_universes: int = 64):
+        """
+        Parameters:
+          - max_genes: Total number of genes the cached backgrounds may hold.
+          - max_universes: Number of background pair intersections kept.
+        """
+        self.max_genes = max_genes
+        self.max_universes = max_universes
+        self._backgrounds: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._universes: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._total_genes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._backgrounds)
+
+    def _get(self, digest: str) -> Optional[np.ndarray]:
+        with self._lock:
+            symbols = self._backgrounds.get(digest)
+            if symbols is not None:
+                self._backgrounds.move_to_end(digest)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return symbols
+
+    def _put(self, digest: str, symbols: np.ndarray) -> None:
+        with self._lock:
+            if digest in self._backgrounds:
+                return
+            self._backgrounds[digest] = symbols
+            self._total_genes += len(symbols)
+            # Always keep the newest entry, even if it alone is over budget
+            while self._total_genes > self.max_genes and len(self._backgrounds) > 1:
+                evicted, evicted_symbols = self._backgrounds.popitem(last=False)
+                self._total_genes -= len(evicted_symbols)
+                for pair in [pair for pair in self._universes if evicted in pair]:
+                    del self._universes[pair]
+
+    def _load(self, digest: str, lines: Iterable[str]) -> Background:
+        symbols = self._get(digest)
+        if symbols is None:
+            symbols = symbol_set(iter_bg_genes(lines))
+            self._put(digest, symbols)
+        return Background(digest=digest, symbols=symbols)
+
+    def load_file(self, file_path: str) -> Background:
+        """Background of a file on disk; the file is only parsed if its content was not seen before."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+            except ValueError:
+                pass  # Empty files cannot be mapped and hash as empty content
+        return self._load(digest.hexdigest(), iter_file_lines(file_path))
+
+    def load_file_object(self, file_obj: BinaryIO) -> Background:
+        """Background of a seekable file object, e.g. UploadFile.file, read in chunks."""
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: file_obj.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        file_obj.seek(0)
+        return self._load(digest.hexdigest(), iter_file_object_lines(file_obj))
+
+    def universe(self, background_1: Background, background_2: Background) -> np.ndarray:
+        """Intersection of two backgrounds as sorted symbols, memoized for backgrounds that came from files."""
+        if background_1.digest is None or background_2.digest is None:
+            return intersect(background_1.symbols, background_2.symbols)
+        # Intersection is symmetric, so both orders share one entry
+        pair = tuple(sorted((background_1.digest, background_2.digest)))
+        with self._lock:
+            universe = self._universes.get(pair)
+            if universe is not None:
+                self._universes.move_to_end(pair)
+                return universe
+        universe = intersect(background_1.symbols, background_2.symbols)
+        with self._lock:
+            self._universes[pair] = universe
+            while len(self._universes) > self.max_universes:
+                self._universes.popitem(last=False)
+        return universe
+
+    def clear(self) -> None:
+        with self._lock:
+            self._backgrounds.clear()
+            self._universes.clear()
+            self._total_genes = 0
+
+
+def as_background(genes) -> Background:
+    """Wrap genes given directly (a Background or an iterable of symbols) as a Background."""
+    if isinstance(genes, Background):
+        return genes
+    return Background(digest=None, symbols=symbol_set(genes))
+
+
+# Process-wide cache used by the MSET tools and the upload endpoints.
+background_cache = BackgroundCache()
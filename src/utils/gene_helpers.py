@@ -1,4 +1,13 @@
-from typing import List
+import codecs
+import mmap
+from typing import BinaryIO, Iterable, Iterator, List, TextIO, Union
+
+# Lines starting with these characters carry no genes in a GeneWeaver gene set file.
+GW_SKIP_CHARS = ("#", ":", "=", "+", "@", "%", "!")
+# Number of header lines at the top of a GeneWeaver gene set file.
+GW_HEADER_LINES = 16
+# Size of the chunks read from uploaded file objects.
+CHUNK_SIZE = 64 * 1024
 
 
 def extract_genes_from_gw(file_content: str) -> List[str]:
@@ -7,35 +16,100 @@ def extract_genes_from_gw(file_content: str) -> List[str]:
     It assumes the first 16 lines are unuseful data for genes.
     It also avoids the line starting with the characters below.
     """
-    genes = []
-    skip_chars = ("#", ":", "=", "+", "@", "%", "!")
+    return list(iter_genes_from_gw(file_content.splitlines()))
+
+def extract_bg_genes(file_content: str) -> List[str]:
+    """
+    Extracts genes from the content of a background gene file which only has genes
+    in it.
+    """
+    return list(iter_bg_genes(file_content.splitlines()))
+
+def iter_genes_from_gw(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Streaming version of extract_genes_from_gw: yields the genes of a gene set file
+    one line at a time, so the file never has to be held in memory as a whole.
+    """
     count = 0
-    for line in file_content.splitlines():
+    for line in lines:
         count+= 1
-        if(count > 16):
+        if(count > GW_HEADER_LINES):
             line = line.strip()
-            if not line or line.startswith(skip_chars):
+            if not line or line.startswith(GW_SKIP_CHARS):
                 continue
             line_split = line.split()
             gene = line_split[0]
             if(len(line_split)>2):
                 gene += " "+line_split[1]
-            genes.append(gene)
-    return genes
+            yield gene
 
-def extract_bg_genes(file_content: str) -> List[str]:
+def iter_bg_genes(lines: Iterable[str]) -> Iterator[str]:
     """
-    Extracts genes from the content of a background gene file which only has genes
-    in it.
+    Streaming version of extract_bg_genes: yields the genes of a background file
+    one line at a time.
     """
-    genes = []
-    for line in file_content.splitlines():
-        line = line.strip()
+    for line in lines:
         split_line = line.split()
         if(len(split_line)>0):
             gene = split_line[0]
             if(len(split_line)>1):
                 gene += " "+split_line[1]
-            genes.append(gene)
-            
-    return genes
\ No newline at end of file
+            yield gene
+
+def iter_file_lines(file_path: str) -> Iterator[str]:
+    """
+    Yields the lines of a file on disk through mmap, so the operating system pages the
+    file in as it is read instead of it being copied into one large string. Lines are split
+    like str.splitlines, so files with bare \r line endings split as well.
+    """
+    with open(file_path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # Empty files cannot be mapped
+        with mapped:
+            yield from iter_chunk_lines(iter(lambda: mapped.read(CHUNK_SIZE), b""))
+
+def iter_chunk_lines(chunks: Iterable[Union[bytes, str]]) -> Iterator[str]:
+    """
+    Reassembles a stream of byte (or text) chunks, e.g. the body of an upload, into lines.
+    """
+    # Pieces of the line still being read; only the new chunk is split, so a line spread
+    # over many chunks is joined once instead of being re-split on every chunk
+    pieces: List[str] = []
+    decoder = None
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = decoder.decode(chunk)
+        if not chunk:
+            continue
+        if pieces and pieces[-1].endswith("\r"):
+            # The line ended with a \r; a \n at the start of this chunk still belongs to it
+            if chunk.startswith("\n"):
+                pieces.append("\n")
+                chunk = chunk[1:]
+            yield "".join(pieces)
+            pieces = []
+            if not chunk:
+                continue
+        lines = chunk.splitlines(keepends=True)
+        last = lines.pop()
+        if lines:
+            lines[0] = "".join(pieces) + lines[0]
+            pieces = []
+            yield from lines
+        pieces.append(last)
+        # The last piece may be an incomplete line (or a \r whose \n is in the next chunk)
+        if last.splitlines()[0] != last and not last.endswith("\r"):
+            yield "".join(pieces)
+            pieces = []
+    if pieces:
+        yield "".join(pieces)
+
+def iter_file_object_lines(file_obj: Union[BinaryIO, TextIO], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yields the lines of an open file object, such as UploadFile.file, reading it in chunks.
+    """
+    yield from iter_chunk_lines(iter(lambda: file_obj.read(chunk_size), file_obj.read(0)))
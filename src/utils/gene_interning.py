@@ -0,0 +1,88 @@
+import threading
+from typing import Dict, Hashable, Iterable, List
+
+import numpy as np
+
+# Dense gene ids fit comfortably in 32 bits; halves memory compared to the NumPy default.
+ID_DTYPE = np.int32
+
+
+class GeneInterner:
+    """
+    Maps gene keys (symbols or ode_gene_ids) to dense integers 0..n-1.
+    Sets of genes are then represented as sorted, duplicate-free integer arrays, which the
+    set primitives below operate on. Interning is thread safe so one interner can be shared
+    by every task in the process.
+    """
+
+    def __init__(self):
+        self._ids: Dict[Hashable, int] = {}
+        self._keys: List[Hashable] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._ids
+
+    def intern(self, key: Hashable) -> int:
+        """Return the dense id of key, assigning the next free id if it is new."""
+        gene_id = self._ids.get(key)
+        if gene_id is None:
+            with self._lock:
+                gene_id = self._ids.get(key)
+                if gene_id is None:
+                    gene_id = len(self._keys)
+                    self._ids[key] = gene_id
+                    self._keys.append(key)
+        return gene_id
+
+    def intern_list(self, keys: Iterable[Hashable]) -> np.ndarray:
+        """Intern every key, keeping order and duplicates."""
+        return np.fromiter((self.intern(key) for key in keys), dtype=ID_DTYPE)
+
+    def intern_set(self, keys: Iterable[Hashable]) -> np.ndarray:
+        """Intern every key and return the set of ids as a sorted, duplicate-free array."""
+        return np.unique(self.intern_list(keys))
+
+    def key(self, gene_id: int) -> Hashable:
+        """Return the key interned as gene_id."""
+        return self._keys[gene_id]
+
+    def keys(self, gene_ids: Iterable[int]) -> List[Hashable]:
+        """Map ids back to their keys, keeping order."""
+        keys = self._keys
+        return [keys[gene_id] for gene_id in gene_ids]
+
+
+def intersect(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Intersection of two sorted id sets."""
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def union(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Union of two sorted id sets."""
+    return np.union1d(a, b)
+
+
+def difference(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Ids of a that are not in b, for two sorted id sets."""
+    return np.setdiff1d(a, b, assume_unique=True)
+
+
+def contains(id_set: np.ndarray, gene_ids: np.ndarray) -> np.ndarray:
+    """Boolean mask telling which of gene_ids are members of the sorted id set."""
+    if len(id_set) == 0:
+        return np.zeros(len(gene_ids), dtype=bool)
+    positions = np.searchsorted(id_set, gene_ids)
+    positions[positions == len(id_set)] = 0
+    return id_set[positions] == gene_ids
+
+
+def membership_counts(id_sets: Iterable[np.ndarray], size: int) -> np.ndarray:
+    """For every id below size, the number of the given sets that contain it."""
+    counts = np.zeros(size, dtype=np.int64)
+    for id_set in id_sets:
+        counts[id_set] += 1
+    return counts
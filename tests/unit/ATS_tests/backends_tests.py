@@ -0,0 +1,121 @@
+"""
+ProcessBackend must run tasks in worker processes, relay their status updates and
+return their results; ThreadBackend stays available per tool.
+"""
+
+import asyncio
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+from ATS import ATS_Plugin
+from ATS.backends import ProcessBackend, ThreadBackend, make_backend
+from ATS.task_manager import DONE, FAILED, TaskManager
+from utils.background_cache import as_background
+
+
+class EchoPlugin(ATS_Plugin.implement_plugins):
+
+    def __init__(self):
+        self.message = "Initialized"
+
+    async def run(self, input_data):
+        if input_data.get("fail"):
+            raise ValueError("bad input")
+        for step in range(3):
+            self.message = f"step {step}"
+            self._emit_status()
+        result = {"pid": os.getpid(), "genes": input_data["genes"]}
+        if "background" in input_data:
+            result["background"] = input_data["background"].symbols.tolist()
+        return result
+
+    def status(self):
+        return {"message": self.message}
+
+
+class EchoPlugins(ATS_Plugin.implement_plugins):
+
+    def load_plugins(self):
+        return {"Echo": EchoPlugin(), "Local": EchoPlugin()}
+
+
+class ProcessBackendTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.manager = TaskManager(default_concurrency=2, default_backend="process", backends={"Local": "thread"})
+        cls.manager._backend_instances["process"] = ProcessBackend(max_workers=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.manager.shutdown()
+
+    def test_runs_in_worker_process(self):
+        genes = [f"Gene{i}" for i in range(1000)]
+        task_id = self.manager.create_task(EchoPlugins(), {"tools_input": "Echo", "genes": genes})
+        result = self.manager.get_result(task_id)
+        self.assertNotEqual(result["pid"], os.getpid())
+        self.assertEqual(result["genes"], genes)
+        self.assertEqual(self.manager.get_status(task_id), {"message": "step 2"})
+        self.assertEqual(self.manager.get_progress(task_id)["state"], DONE)
+
+    def test_background_crosses_as_symbols(self):
+        background = as_background(["Trp53", "Akt1", "Bax"])
+        task_id = self.manager.create_task(EchoPlugins(), {"tools_input": "Echo", "genes": [], "background": background})
+        self.assertEqual(sorted(self.manager.get_result(task_id)["background"]), ["Akt1", "Bax", "Trp53"])
+
+    def test_relay_hands_status_to_running_task(self):
+        received = threading.Event()
+
+        class Task:
+            def _on_status(self, status):
+                self.status = status
+                received.set()
+
+        backend = self.manager._backend("Echo")
+        backend._get_pool()
+        task = backend._running["relay-test"] = Task()
+        try:
+            backend._status_queue.put(("relay-test", {"message": "relayed"}))
+            self.assertTrue(received.wait(5))
+            self.assertEqual(task.status, {"message": "relayed"})
+        finally:
+            del backend._running["relay-test"]
+
+    def test_status_stream_ends_with_final_status(self):
+        task_id = self.manager.create_task(EchoPlugins(), {"tools_input": "Echo", "genes": []})
+
+        async def follow():
+            return [event async for event in self.manager.status_events(task_id)]
+
+        events = asyncio.run(follow())
+        self.assertEqual(events[-1]["event"], "done")
+        self.assertEqual(events[-1]["status"], {"message": "step 2"})
+
+    def test_failure(self):
+        task_id = self.manager.create_task(EchoPlugins(), {"tools_input": "Echo", "fail": True})
+        self.assertEqual(self.manager.get_result(task_id), {"error": "bad input"})
+        self.assertEqual(self.manager.get_progress(task_id)["state"], FAILED)
+
+    def test_thread_backend_per_tool(self):
+        task_id = self.manager.create_task(EchoPlugins(), {"tools_input": "Local", "genes": ["a"]})
+        self.assertEqual(self.manager.get_result(task_id), {"pid": os.getpid(), "genes": ["a"]})
+        self.assertIsInstance(self.manager._backend("Local"), ThreadBackend)
+
+    def test_default_backend_per_tool(self):
+        with patch.dict(os.environ, {"ATS_TOOL_BACKEND": ""}):
+            manager = TaskManager(default_backend="thread")
+        self.addCleanup(manager.shutdown)
+        self.assertIsInstance(manager._backend("MSET"), ProcessBackend)
+        self.assertIsInstance(manager._backend("BooleanAlgebra"), ThreadBackend)
+
+    def test_make_backend(self):
+        self.assertIsInstance(make_backend("thread"), ThreadBackend)
+        with self.assertRaises(ValueError):
+            make_backend("fiber")
+
+
+if __name__ == "__main__":
+    unittest.main()
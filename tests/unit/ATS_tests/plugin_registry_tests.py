@@ -0,0 +1,111 @@
+"""
+PluginRegistry must scan entry points once, import a plugin only when its tool is first
+requested and give every task a fresh instance.
+"""
+
+import asyncio
+import unittest
+
+from ATS import ATS_Plugin
+
+
+class EchoPlugin(ATS_Plugin.implement_plugins):
+
+    def __init__(self):
+        self.runs = 0
+
+    async def run(self, input_data):
+        self.runs += 1
+        return {"runs": self.runs}
+
+    def status(self):
+        return {"message": "ok"}
+
+
+class NotAPlugin:
+    pass
+
+
+class FakeEntryPoint:
+    """Counts how often the entry point's object is imported."""
+
+    def __init__(self, name: str, attr: str, target):
+        self.name = name
+        self.attr = attr
+        self.target = target
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.target
+
+
+class PluginRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.scans = 0
+        self.entry_points = [
+            FakeEntryPoint("Echo", "EchoPlugin", EchoPlugin),
+            FakeEntryPoint("Other", "OtherPlugin", EchoPlugin),
+            FakeEntryPoint("Broken", "NotAPlugin", NotAPlugin),
+        ]
+
+        def discover():
+            self.scans += 1
+            return self.entry_points
+
+        self.registry = ATS_Plugin.PluginRegistry(discover=discover)
+
+    def test_discovers_once_and_imports_lazily(self):
+        self.assertEqual(self.registry.names(), ["EchoPlugin", "OtherPlugin", "NotAPlugin"])
+        self.assertEqual([ep.loads for ep in self.entry_points], [0, 0, 0])
+        first, second = self.registry.create("EchoPlugin"), self.registry.create("EchoPlugin")
+        self.assertIsInstance(first, EchoPlugin)
+        self.assertIsNot(first, second)
+        self.assertEqual([ep.loads for ep in self.entry_points], [1, 0, 0])
+        self.assertEqual(self.scans, 1)
+
+    def test_unknown_and_invalid_plugins(self):
+        self.assertIsNone(self.registry.create("Missing"))
+        self.assertIsNone(self.registry.create("NotAPlugin"))
+        self.assertIsNone(self.registry.create("NotAPlugin"))
+        self.assertEqual(self.entry_points[2].loads, 1)
+
+    def test_register_and_refresh(self):
+        self.registry.register("Extra", EchoPlugin)
+        self.assertIn("Extra", self.registry.names())
+        with self.assertRaises(TypeError):
+            self.registry.register("Bad", NotAPlugin)
+        self.registry.create("EchoPlugin")
+        self.registry.refresh()
+        self.registry.create("EchoPlugin")
+        self.assertEqual(self.scans, 2)
+        self.assertEqual(self.entry_points[0].loads, 2)
+        self.assertIsInstance(self.registry.create("Extra"), EchoPlugin)
+
+    def test_execute_uses_fresh_instances(self):
+        registry = self.registry
+
+        class Plugins(ATS_Plugin.implement_plugins):
+            pass
+
+        Plugins.registry = registry
+        results = [asyncio.run(Plugins().execute({"tools_input": "EchoPlugin"})) for _ in range(3)]
+        self.assertEqual(results, [{"runs": 1}] * 3)
+        self.assertEqual(asyncio.run(Plugins().execute({"tools_input": "Missing"})), {"error": "Failed to load instance."})
+        self.assertEqual(list(Plugins().load_plugins()), ["EchoPlugin", "OtherPlugin"])
+
+    def test_execute_respects_load_plugins_override(self):
+        class Plugins(ATS_Plugin.implement_plugins):
+            registry = self.registry
+
+            def load_plugins(self):
+                return {"Custom": EchoPlugin()}
+
+        self.assertEqual(asyncio.run(Plugins().execute({"tools_input": "Custom"})), {"runs": 1})
+        self.assertEqual(asyncio.run(Plugins().execute({"tools_input": "EchoPlugin"})), {"error": "Failed to load instance."})
+        self.assertEqual(self.scans, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+ResultStore must expire results, keep memory within its budget by spilling to disk and
+read spilled results back intact.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from ATS.result_store import ResultStore, deserialize_result, serialize_result
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResultStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.store = ResultStore(ttl=60, memory_budget=10_000, spill_size=5_000,
+                                 directory=self.directory, clock=self.clock)
+        self.addCleanup(self.store.close)
+
+    def spilled_files(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".pkl.z"))
+
+    def test_small_results_stay_in_memory(self):
+        self.store.put("a", {"result": [1, 2, 3]}, status="Completed")
+        self.assertEqual(self.store.get("a"), {"result": [1, 2, 3]})
+        self.assertEqual(self.store.get_status("a"), "Completed")
+        self.assertEqual(self.store.get_state("a"), "done")
+        self.assertEqual(self.spilled_files(), [])
+
+    def test_large_results_are_spilled_and_loaded_lazily(self):
+        result = {"genes": [f"Gene{i}" for i in range(5000)]}
+        self.store.put("big", result)
+        self.assertEqual(self.spilled_files(), ["big.pkl.z"])
+        self.assertEqual(self.store.stats()["memory_bytes"], 0)
+        self.assertLess(os.path.getsize(os.path.join(self.directory, "big.pkl.z")), len(pickle.dumps(result)))
+        self.assertEqual(self.store.get("big"), result)
+        self.assertEqual(self.store.loads, 1)
+
+    def test_memory_budget_spills_oldest(self):
+        for n in range(10):
+            self.store.put(str(n), list(range(n * 1000, n * 1000 + 600)))
+        stats = self.store.stats()
+        self.assertLessEqual(stats["memory_bytes"], 10_000)
+        self.assertGreater(stats["on_disk"], 0)
+        self.assertIn("0.pkl.z", self.spilled_files())
+        self.assertNotIn("9.pkl.z", self.spilled_files())
+        for n in range(10):
+            self.assertEqual(self.store.get(str(n)), list(range(n * 1000, n * 1000 + 600)))
+
+    def test_ttl(self):
+        self.store.put("old", {"genes": ["x"] * 5000})
+        self.clock.now += 30
+        self.store.put("new", 1)
+        self.clock.now += 31
+        self.assertNotIn("old", self.store)
+        self.assertIsNone(self.store.get("old"))
+        self.assertEqual(self.store.get("new"), 1)
+        self.assertEqual(self.spilled_files(), [])
+
+    def test_delete_and_close(self):
+        self.store.put("a", {"genes": ["x"] * 5000})
+        self.store.delete("a")
+        self.assertEqual(self.store.get("a", "missing"), "missing")
+        self.store.put("b", {"genes": ["y"] * 5000})
+        self.store.close()
+        self.assertEqual(self.spilled_files(), [])
+        self.assertEqual(self.store.stats()["entries"], 0)
+
+    def test_serialization_round_trip(self):
+        result = {"boolean_algebra_output": {"bool_results": {1: [(1, "R1", 2, "5")]}}}
+        self.assertEqual(deserialize_result(serialize_result(result)), result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+TaskManager must bound the tasks running per tool, report queue positions and refuse
+submissions once a tool's queue is full.
+"""
+
+import asyncio
+import threading
+import unittest
+
+from ATS import ATS_Plugin
+from ATS.task_manager import DONE, FAILED, QUEUED, RUNNING, QueueFullError, TaskManager, parse_concurrency
+
+
+class BlockingPlugins:
+    """Stands in for implement_plugins: every task runs until release is set."""
+
+    def __init__(self, release: threading.Event, counter: dict):
+        self.release = release
+        self.counter = counter
+
+    async def execute(self, input):
+        with self.counter["lock"]:
+            self.counter["running"] += 1
+            self.counter["peak"] = max(self.counter["peak"], self.counter["running"])
+        try:
+            self.release.wait(5)
+            if input.get("fail"):
+                raise RuntimeError("tool failed")
+            return {"echo": input["n"]}
+        finally:
+            with self.counter["lock"]:
+                self.counter["running"] -= 1
+
+    def get_status(self):
+        return {"status": "ok"}
+
+
+class SteppingPlugin(ATS_Plugin.implement_plugins):
+    """Reports one status update per step, each after release is set."""
+
+    def __init__(self, release: threading.Event):
+        self.release = release
+        self.message = "Initialized"
+
+    async def run(self, input_data):
+        for step in range(3):
+            self.release.wait(5)
+            self.message = f"step {step}"
+            self._emit_status()
+        return {"steps": 3}
+
+    def status(self):
+        return {"message": self.message}
+
+
+class SteppingPlugins(ATS_Plugin.implement_plugins):
+
+    def __init__(self, release: threading.Event):
+        super().__init__()
+        self.release = release
+
+    def load_plugins(self):
+        return {"Stepping": SteppingPlugin(self.release)}
+
+
+class TaskManagerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.counter = {"lock": threading.Lock(), "running": 0, "peak": 0}
+        self.manager = TaskManager(concurrency={"MSET": 2}, default_concurrency=1, max_queue=3, backends={}, default_backend="thread")
+        self.addCleanup(self.manager.shutdown)
+        self.addCleanup(self.release.set)
+
+    def submit(self, tool: str, n: int, **extra) -> str:
+        data = {"tools_input": tool, "n": n, **extra}
+        return self.manager.create_task(BlockingPlugins(self.release, self.counter), data)
+
+    def wait_running(self, count: int) -> None:
+        for _ in range(500):
+            if self.counter["running"] == count:
+                return
+            threading.Event().wait(0.01)
+        self.fail(f"{count} tasks never ran at once")
+
+    def test_concurrency_and_results(self):
+        task_ids = [self.submit("MSET", n) for n in range(5)]
+        self.wait_running(2)
+        self.assertEqual([self.manager.get_progress(t)["queue_position"] for t in task_ids], [0, 0, 1, 2, 3])
+        self.assertEqual(self.manager.get_progress(task_ids[0])["state"], RUNNING)
+        self.assertEqual(self.manager.get_progress(task_ids[4])["state"], QUEUED)
+        self.release.set()
+        self.assertEqual([self.manager.get_result(t) for t in task_ids], [{"echo": n} for n in range(5)])
+        self.assertEqual(self.counter["peak"], 2)
+        self.assertEqual(self.manager.get_progress(task_ids[4]), {"state": DONE, "queue_position": 0})
+
+    def test_queue_full(self):
+        for n in range(4):  # one running, three queued
+            self.submit("Boolean", n)
+        self.wait_running(1)
+        with self.assertRaises(QueueFullError) as caught:
+            self.submit("Boolean", 4)
+        self.assertGreaterEqual(caught.exception.retry_after, 1)
+        self.assertEqual(len(self.manager.tasks), 4)
+        # Other tools have their own queues
+        self.submit("MSET", 5)
+
+    def test_failure_is_reported(self):
+        self.release.set()
+        task_id = self.submit("MSET", 0, fail=True)
+        self.assertEqual(self.manager.get_result(task_id), {"error": "tool failed"})
+        self.assertEqual(self.manager.get_progress(task_id)["state"], FAILED)
+
+    def test_finished_tasks_move_to_result_store(self):
+        self.release.set()
+        task_id = self.submit("MSET", 7)
+        self.assertEqual(self.manager.get_result(task_id), {"echo": 7})
+        self.assertNotIn(task_id, self.manager.tasks)
+        self.assertEqual(self.manager.get_status(task_id), {"status": "ok"})
+        self.assertEqual(self.manager.get_progress(task_id), {"state": DONE, "queue_position": 0})
+
+    def test_wait_and_status_events(self):
+        task_id = self.manager.create_task(SteppingPlugins(self.release), {"tools_input": "Stepping"})
+
+        async def follow():
+            self.assertFalse(await self.manager.wait(task_id, timeout=0.05))
+            threading.Timer(0.05, self.release.set).start()
+            events = [event async for event in self.manager.status_events(task_id)]
+            self.assertTrue(await self.manager.wait(task_id, timeout=1))
+            return events
+
+        events = asyncio.run(follow())
+        messages = [event["status"]["message"] for event in events if event["event"] == "status"]
+        self.assertEqual(messages[-3:], ["step 0", "step 1", "step 2"])
+        self.assertEqual(events[-1], {"event": "done", "state": DONE, "status": {"message": "step 2"}})
+        self.assertEqual(self.manager.get_result(task_id), {"steps": 3})
+        # Finished tasks answer with their final status right away
+        late = asyncio.run(self._collect(self.manager.status_events(task_id)))
+        self.assertEqual([event["event"] for event in late], ["done"])
+
+    def test_many_waiters(self):
+        task_id = self.submit("MSET", 1)
+
+        async def wait_all():
+            waiters = [self.manager.wait(task_id, timeout=5) for _ in range(500)]
+            threading.Timer(0.05, self.release.set).start()
+            return await asyncio.gather(*waiters)
+
+        self.assertEqual(asyncio.run(wait_all()), [True] * 500)
+
+    @staticmethod
+    async def _collect(events):
+        return [event async for event in events]
+
+    def test_unknown_task(self):
+        self.assertIsNone(asyncio.run(self.manager.wait("nope", timeout=0)))
+        self.assertIsNone(self.manager.get_progress("nope"))
+        self.assertEqual(self.manager.get_result("nope"), "Invalid Task ID")
+
+    def test_parse_concurrency(self):
+        self.assertEqual(parse_concurrency("MSET=2, Boolean=4,"), {"MSET": 2, "Boolean": 4})
+        self.assertEqual(parse_concurrency(""), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
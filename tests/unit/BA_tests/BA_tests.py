@@ -4,11 +4,13 @@ Boolean Algen
 intersect, and bool_except.
 """
 
+import asyncio
 import unittest
 from unittest.mock import patch
 from collections import defaultdict
 
 from plugins.BooleanAlgebra import service
+from plugins.api.species_registry import SpeciesRegistry
 
 _FAKE_SPECIES = [(1, "Mus musculus"), (2, "Homo sapiens")]
 
@@ -44,15 +46,26 @@ _FAKE_GENESETS = {
 }
 
 
+def _async_value(func):
+    async def wrapper(*args):
+        return func(*args)
+    return wrapper
+
+
 class ServiceHelperTests(unittest.TestCase):
     """Unit‑tests for functions in service.py."""
 
     def setUp(self):
-        # Patch fetchSpecies & get_geneset_data so helpers work offline
+        # Patch the species registry & get_geneset_data so helpers work offline
+        registry = SpeciesRegistry(loader=lambda: [{"id": i, "name": n} for i, n in _FAKE_SPECIES],
+                                   refresh_interval=0)
         self.patches = [
             patch.object(service, "fetchSpecies", lambda: _FAKE_SPECIES),
+            patch.object(service, "species_registry", registry),
             patch.object(service, "get_geneset_data",
                          lambda gs_id: _FAKE_GENESETS[str(gs_id)]),
+            patch.object(service, "get_geneset_data_async",
+                         _async_value(lambda gs_id: _FAKE_GENESETS[str(gs_id)])),
         ]
         for p in self.patches:
             p.start()
@@ -81,6 +94,44 @@ class ServiceHelperTests(unittest.TestCase):
         self.assertEqual(len(grouped[102]), 2)
 
 
+    def test_async_fetchers_match_sync(self):
+        ids = ["1256", "239581", "137861"]
+        self.assertEqual(asyncio.run(service.get_all_geneweaver_species_for_boolean_async()),
+                         service.get_all_geneweaver_species_for_boolean())
+        genesets, errors = asyncio.run(service.fetch_genesets(ids, concurrency=2))
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(service.get_species_in_genesets(ids, genesets=genesets)),
+                         sorted(service.get_species_in_genesets(ids)))
+        self.assertEqual(service.get_homologs_for_geneset(ids, genesets=genesets),
+                         service.get_homologs_for_geneset(ids))
+
+
+    def test_fetch_genesets_is_concurrent_ordered_and_isolates_errors(self):
+        in_flight = [0, 0]  # current, peak
+
+        async def fetch(gs_id):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+            await asyncio.sleep(0.01 * (5 - int(gs_id)))  # Later IDs finish first
+            in_flight[0] -= 1
+            if gs_id == "3":
+                raise Exception("Error fetching geneset: not found")
+            return {"id": gs_id}
+
+        with patch.object(service, "get_geneset_data_async", fetch):
+            genesets, errors = asyncio.run(service.fetch_genesets(["1", "2", "3", "4"], concurrency=3))
+        self.assertEqual(genesets, [{"id": "1"}, {"id": "2"}, None, {"id": "4"}])
+        self.assertEqual(errors, {"3": "Error fetching geneset: not found"})
+        self.assertEqual(in_flight[1], 3)
+
+        async def cancelled(gs_id):
+            raise asyncio.CancelledError()
+
+        # Not an Exception subclass, but still reported per gene set
+        with patch.object(service, "get_geneset_data_async", cancelled):
+            self.assertEqual(asyncio.run(service.fetch_genesets(["5"])), ([None], {"5": "CancelledError"}))
+
+
     def test_intersect_and_except(self):
         genes = service.get_homologs_for_geneset(["1256", "239581", "137861"])
         grouped = service.group_homologs(genes, [1, 2])
@@ -0,0 +1,39 @@
+"""
+service.bool_except must return exactly what the original quadratic implementation
+returned, including group numbering and the order of genes within each group.
+"""
+
+import collections
+import random
+import unittest
+
+from plugins.BooleanAlgebra import service
+
+from legacy_reference import legacy_bool_except
+
+
+def random_bool_results(rng, num_genes, num_genesets):
+    """bool_results as group_homologs builds it: gene -> [(gene, ref, species, gs_id), ...]."""
+    geneset_ids = [str(rng.randint(1000, 300000)) for _ in range(num_genesets)]
+    bool_results = {}
+    for gene in rng.sample(range(1, 10 * num_genes), num_genes):
+        genesets = rng.sample(geneset_ids, rng.randint(1, min(3, num_genesets)))
+        bool_results[gene] = [(gene, f"R{gene}", rng.choice([1, 2]), gs_id) for gs_id in genesets]
+    return bool_results
+
+
+class BoolExceptTests(unittest.TestCase):
+
+    def test_matches_legacy_implementation(self):
+        rng = random.Random(11)
+        for _ in range(50):
+            bool_results = random_bool_results(rng, rng.randint(0, 300), rng.randint(1, 8))
+            expected = legacy_bool_except(bool_results)
+            result = service.bool_except(bool_results)
+            self.assertIsInstance(result, collections.defaultdict)
+            self.assertEqual([(group, list(genes.items())) for group, genes in result.items()],
+                             [(group, list(genes.items())) for group, genes in expected.items()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+cluster_gene_counts must report the sizes of the lists cluster_genes builds.
+"""
+
+import random
+import unittest
+
+from plugins.BooleanAlgebra import service
+
+
+class ClusterGeneCountsTests(unittest.TestCase):
+
+    def test_matches_cluster_genes(self):
+        rng = random.Random(3)
+        for _ in range(30):
+            species_ids = rng.sample(range(1, 10), rng.randint(1, 4))
+            gene_data = []
+            for gs_id in range(rng.randint(1, 6)):
+                species_id = rng.choice(species_ids + [99])  # 99 is not a requested species
+                for gene in rng.sample(range(500), rng.randint(0, 120)):
+                    gene_data.append((gene, gene, f"R{gene}", species_id, str(gs_id)))
+
+            clusters = service.cluster_genes(gene_data, species_ids)
+            expected = {sp: {name: len(clusters[sp][name]) for name in ('unique', 'species', 'intersection')}
+                        for sp in species_ids}
+            self.assertEqual(service.cluster_gene_counts(gene_data, species_ids), expected)
+
+    def test_counts(self):
+        gene_data = [(1, 1, "", 1, "a"), (2, 2, "", 1, "a"), (1, 1, "", 2, "b"), (1, 1, "", 2, "c")]
+        self.assertEqual(service.cluster_gene_counts(gene_data, [1, 2]), {
+            1: {'unique': 1, 'species': 2, 'intersection': 1},
+            2: {'unique': 0, 'species': 2, 'intersection': 2},
+        })
+
+    def test_membership_is_sized_to_the_call(self):
+        service.cluster_genes([(gene, gene, "", 1, "a") for gene in range(10_000)], [1])
+        interner, _, _, counts = service._species_membership({1: [5, 7], 2: [7]})
+        self.assertEqual(len(interner), 2)
+        self.assertEqual(counts.tolist(), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
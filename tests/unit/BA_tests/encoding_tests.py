@@ -0,0 +1,99 @@
+"""
+Compact encoding and paged views of Boolean Algebra results, on a recorded tool output.
+"""
+
+import json
+import os
+import unittest
+
+from plugins.BooleanAlgebra import encoding
+
+OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output.json")
+
+
+def as_tuples(gene_list):
+    return {key: [tuple(item) for item in value] for key, value in gene_list.items()}
+
+
+class EncodingTests(unittest.TestCase):
+
+    def setUp(self):
+        with open(OUTPUT_PATH) as f:
+            self.output = json.load(f)["boolean_algebra_output"]
+        self.output["bool_except"] = {0: {k: v for k, v in self.output["bool_results"].items() if len(v) == 1}}
+
+    def test_round_trip(self):
+        encoded = json.loads(json.dumps(encoding.encode_compact(self.output)))
+        self.assertEqual(encoded["format"], encoding.COMPACT_FORMAT)
+        for name in encoding.STYLE_FIELDS:
+            self.assertNotIn(name, encoded)
+        decoded = encoding.decode_compact(encoded)
+        self.assertEqual(decoded["bool_results"], as_tuples(self.output["bool_results"]))
+        self.assertEqual(decoded["intersect_results"],
+                         {group: as_tuples(genes) for group, genes in self.output["intersect_results"].items()})
+        self.assertEqual(decoded["bool_cluster"], self.output["bool_cluster"])
+        self.assertLess(len(json.dumps(encoded)), len(json.dumps(self.output)))
+
+    def test_genes_and_genesets_stored_once(self):
+        encoded = encoding.encode_compact(self.output)
+        self.assertEqual(len(encoded["genesets"]), len(set(encoded["genesets"])))
+        self.assertEqual(len(encoded["genes"]), len(set(map(tuple, encoded["genes"]))))
+        self.assertEqual(sorted(encoded["genesets"]), sorted(self.output["gsids"]))
+
+    def test_summary(self):
+        view = encoding.output_view(self.output, ["summary"])
+        summary = view["summary"]
+        self.assertEqual(summary["counts"]["bool_results"], len(self.output["bool_results"]))
+        self.assertEqual(summary["counts"]["intersect_results"], {"2": 3})
+        self.assertEqual(summary["numGS"], 3)
+        for name in encoding.STYLE_FIELDS + encoding.GENE_FIELDS:
+            self.assertNotIn(name, summary)
+
+    def test_field_selection(self):
+        view = encoding.output_view(self.output, ["styles", "numGS"])
+        self.assertEqual(list(view), ["tt", "colors", "bg", "borders", "numGS"])
+        with self.assertRaises(ValueError):
+            encoding.output_view(self.output, ["no_such_field"])
+
+    def test_paging_visits_every_gene_once(self):
+        for name in ("bool_results", "bool_except"):
+            for compact in (False, True):
+                seen, cursor = [], None
+                view = encoding.output_view(self.output, [name], compact=compact, limit=50)
+                while True:
+                    page = view[name]
+                    if compact:
+                        page = encoding.decode_compact(view)[name]
+                    groups = page.values() if name == "bool_except" else [page]
+                    for genes in groups:
+                        seen.extend(genes)
+                    cursor = view["page"]["next_cursor"]
+                    if cursor is None:
+                        break
+                    view = encoding.output_view(self.output, compact=compact, cursor=cursor, limit=50)
+                genes = self.output[name]
+                expected = [k for g in genes.values() for k in g] if name == "bool_except" else list(genes)
+                self.assertEqual(seen, expected)
+                self.assertEqual(view["page"]["total"], len(expected))
+
+    def test_paging_needs_one_gene_list(self):
+        with self.assertRaises(ValueError):
+            encoding.output_view(self.output, ["bool_results", "intersect_results"], limit=10)
+        with self.assertRaises(ValueError):
+            encoding.output_view(self.output, ["summary"], limit=10)
+        with self.assertRaises(ValueError):
+            encoding.output_view(self.output, cursor="not a cursor")
+
+    def test_result_view_keeps_shape(self):
+        class Response:
+            result = {"boolean_algebra_output": self.output, "info": {"task_type": "boolean_algebra"}}
+
+        view = encoding.result_view(Response(), ["summary"])
+        self.assertEqual(view["result"]["info"], {"task_type": "boolean_algebra"})
+        self.assertIn("summary", view["result"]["boolean_algebra_output"])
+        with self.assertRaises(ValueError):
+            encoding.result_view({"error": "Failed to load instance."}, ["summary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Covers the Boolean Algebra expression engine: parsing, plan sharing, evaluation
+against plain Python sets, and the 'expression' relation of BooleanAlgebra.run.
+"""
+
+import asyncio
+import random
+import unittest
+from unittest.mock import patch
+
+from plugins.BooleanAlgebra import service
+from plugins.BooleanAlgebra.BA import BooleanAlgebra
+from plugins.BooleanAlgebra.expression import ExpressionError, compile_expression
+from plugins.api.species_registry import SpeciesRegistry
+
+
+def _bool_results(memberships):
+    """bool_results for gene -> list of gene set IDs."""
+    return {gene: [(gene, f"R{gene}", 1, gs_id) for gs_id in genesets] for gene, genesets in memberships.items()}
+
+
+class ExpressionTests(unittest.TestCase):
+
+    def test_precedence_and_syntax(self):
+        bool_results = _bool_results({1: ["1", "2"], 2: ["1"], 3: ["3"], 4: ["2", "3"], 5: ["1", "2", "3"]})
+        cases = {
+            "GS1 & GS2": [1, 5],
+            "GS1 | GS2 & GS3": [1, 2, 4, 5],  # & binds tighter than |
+            "(GS1 | GS2) & GS3": [4, 5],
+            "GS1 - GS2 - GS3": [2],  # Left associative
+            "GS3 | GS1 - GS2": [2, 3, 4, 5],  # - binds tighter than |
+            "GS1 - GS2 | GS3": [2, 3, 4, 5],
+            "(GS3 | GS1) - GS2": [2, 3],
+            "1 ∩ 2 ∪ 3": [1, 3, 4, 5],
+            "GS1 and GS2 except GS3": [1],
+            "atleast(2, GS1, GS2, GS3)": [1, 4, 5],
+            "at_least(3, GS1, GS2, GS3)": [5],
+            "atleast(2, GS1, GS2, GS3) - GS1": [4],
+            "GS9": [],
+        }
+        for expression, expected in cases.items():
+            with self.subTest(expression=expression):
+                self.assertEqual(list(compile_expression(expression).evaluate(bool_results)), expected)
+
+    def test_shared_subexpressions_are_planned_once(self):
+        plan = compile_expression("(GS1 & GS2) - GS3 | (GS2 & GS1) & GS4")
+        self.assertEqual(sum(step.op == "&" for step in plan.steps), 2)  # GS1 & GS2 once, then & GS4
+        self.assertEqual(plan.geneset_ids, ["1", "2", "3", "4"])
+        self.assertEqual(len(compile_expression("GS1 | GS1").steps), 1)
+
+    def test_errors(self):
+        for expression in ["", "GS1 &", "(GS1 | GS2", "atleast(GS1, GS2)", "atleast(2)", "GS1 GS2", "GS1 % GS2"]:
+            with self.subTest(expression=expression):
+                with self.assertRaises(ExpressionError):
+                    compile_expression(expression)
+
+    def test_matches_python_sets(self):
+        rng = random.Random(5)
+        names = ["1", "2", "3", "4", "5"]
+        for _ in range(40):
+            memberships = {gene: rng.sample(names, rng.randint(1, 3)) for gene in rng.sample(range(2000), 300)}
+            sets = {name: {g for g, m in memberships.items() if name in m} for name in names}
+            a, b, c, d, e = (sets[n] for n in names)
+            at_least_3 = {g for g in memberships if sum(g in s for s in sets.values()) >= 3}
+            expected = {
+                "(GS1 & GS2) - GS3": (a & b) - c,
+                "GS1 | GS2 - GS4 & GS5": a | (b - (d & e)),
+                "(GS1 | GS2) - GS4 & GS5": (a | b) - (d & e),
+                "atleast(3, GS1, GS2, GS3, GS4, GS5) - GS5": at_least_3 - e,
+                "(GS1 | GS2) & (GS2 | GS1) & atleast(1, GS3, GS4)": (a | b) & (c | d),
+            }
+            bool_results = _bool_results(memberships)
+            for expression, genes in expected.items():
+                result = compile_expression(expression).evaluate(bool_results)
+                self.assertEqual(list(result), [g for g in bool_results if g in genes])
+
+
+_GENESETS = {
+    gs_id: {"object": {"geneset": {"species_id": 1},
+                       "geneset_values": [{"ode_gene_id": gene, "ode_ref_id": f"R{gene}"} for gene in genes]}}
+    for gs_id, genes in {"1": [1, 2, 3, 4], "2": [2, 3, 5], "3": [3, 4, 5]}.items()
+}
+
+
+class ExpressionRelationTests(unittest.TestCase):
+
+    def setUp(self):
+        async def fetch(gs_id):
+            return _GENESETS[gs_id]
+
+        registry = SpeciesRegistry(loader=lambda: [{"id": 1, "name": "Mus musculus"}], refresh_interval=0)
+        for patcher in (patch.object(service, "get_geneset_data_async", fetch),
+                        patch.object(service, "species_registry", registry)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_tool(self, input_data):
+        return asyncio.run(BooleanAlgebra().run(input_data)).result
+
+    def test_expression_relation(self):
+        result = self.run_tool({"relation": "expression", "expression": "(GS1 & GS2) - GS3"})
+        output = result["boolean_algebra_output"]
+        self.assertEqual(list(output["bool_results"]), [2])
+        self.assertEqual(output["numGS"], 3)
+        self.assertEqual(output["type"], "Expression")
+        self.assertNotIn("intersect_results", output)
+
+    def test_expression_errors(self):
+        self.assertIn("Invalid expression", self.run_tool({"relation": "expression", "expression": "GS1 &"})["Error"])
+        result = self.run_tool({"relation": "expression", "expression": "GS1 & GS3", "geneset_ids": ["GS1", "GS2"]})
+        self.assertIn("3", result["Error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+service.intersect must return exactly what the original quadratic implementation
+returned, including the order of sizes and of genes within each size.
+"""
+
+import random
+import unittest
+
+from plugins.BooleanAlgebra import service
+
+from legacy_reference import legacy_intersect
+
+
+def random_bool_results(rng, num_genes, num_genesets):
+    """bool_results as group_homologs builds it: gene -> [(gene, ref, species, gs_id), ...]."""
+    geneset_ids = [str(rng.randint(1000, 300000)) for _ in range(num_genesets)]
+    bool_results = {}
+    for gene in rng.sample(range(1, 10 * num_genes), num_genes):
+        genesets = rng.sample(geneset_ids, rng.randint(1, min(4, num_genesets)))
+        bool_results[gene] = [(gene, f"R{gene}", rng.choice([1, 2]), gs_id) for gs_id in genesets]
+    return bool_results
+
+
+def as_ordered(intersection_sizes):
+    return [(size, list(group.items())) for size, group in intersection_sizes.items()]
+
+
+class IntersectTests(unittest.TestCase):
+
+    def test_matches_legacy_implementation(self):
+        rng = random.Random(7)
+        for _ in range(30):
+            bool_results = random_bool_results(rng, rng.randint(0, 300), rng.randint(1, 6))
+            for at_least in (1, 2, 3, "2"):
+                self.assertEqual(as_ordered(service.intersect(bool_results, at_least)),
+                                 as_ordered(legacy_intersect(bool_results, at_least)))
+
+    def test_groups_by_ordered_signature(self):
+        bool_results = {
+            1: [(1, "", 1, "A"), (1, "", 1, "B")],
+            2: [(2, "", 1, "B"), (2, "", 1, "A")],
+            3: [(3, "", 1, "A"), (3, "", 1, "B")],
+            4: [(4, "", 1, "A")],
+        }
+        result = service.intersect(bool_results, 2)
+        self.assertEqual(list(result), [2])
+        self.assertEqual(list(result[2]), [1, 3, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
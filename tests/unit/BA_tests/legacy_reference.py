@@ -0,0 +1,68 @@
+"""
+The original, quadratic implementations of the Boolean Algebra set operations, kept as the
+reference the tests and scripts/benchmark_boolean_algebra.py compare service against.
+"""
+
+import collections
+
+
+def legacy_intersect(bool_results, at_least=2):
+    """service.intersect as originally written."""
+    bool_intersect = collections.defaultdict(dict)
+    intersect_results = {key: value for key, value in bool_results.items() if len(value) >= int(at_least)}
+
+    compare = collections.defaultdict(list)
+    gs_array = []
+    gs_list = 'empty'
+    for key, value in intersect_results.items():
+        for i in range(0, len(value)):
+            gs_array.append(str(value[i][3]))
+            gs_list = "|".join(gs_array)
+        compare[gs_list].append(key)
+        del gs_array[:]
+
+    i = 0
+    for key, value in compare.items():
+        for j in range(0, len(value)):
+            local_array = []
+            for k, v in intersect_results.items():
+                del local_array[:]
+                if int(k) == int(value[j]):
+                    for m in range(0, len(v)):
+                        local_array.append(str(v[m][3]))
+                        temp = "|".join(local_array)
+                    if str(temp) == str(key):
+                        bool_intersect[i][value[j]] = v
+        i += 1
+
+    intersection_sizes = {}
+    for key, value in bool_intersect.items():
+        for k in value:
+            if value[k]:
+                if len(value[k]) not in intersection_sizes:
+                    intersection_sizes[len(value[k])] = value
+                else:
+                    intersection_sizes[len(value[k])].update(value)
+
+    return intersection_sizes
+
+
+def legacy_bool_except(bool_results):
+    """service.bool_except as originally written."""
+    bool_except = collections.defaultdict(dict)
+    intersects = {key: value for key, value in bool_results.items() if len(value) >= int(2)}
+
+    except_results = {key: value for key, value in bool_results.items() if key not in intersects}
+
+    compare = collections.defaultdict(list)
+    for key, value in except_results.items():
+        compare[value[0][3]].append(key)
+
+    i = 0
+    for key, value in compare.items():
+        for j in range(0, len(value)):
+            for k, v in except_results.items():
+                if int(k) == int(value[j]):
+                    bool_except[i][value[j]] = v
+        i += 1
+    return bool_except
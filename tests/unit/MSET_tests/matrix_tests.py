@@ -0,0 +1,74 @@
+"""
+Unit tests for the many-vs-many MSET matrix in plugins/MSET/matrix.py.
+"""
+
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from plugins.MSET import MSET, matrix
+
+
+class MatrixHelperTests(unittest.TestCase):
+    """Unit-tests for the matrix helpers."""
+
+    def test_intersection_matrix(self):
+        universe = np.arange(10, dtype=np.int32)
+        lists = [np.array([0, 1, 2, 3]), np.array([2, 3, 4]), np.array([9])]
+        expected = [[4, 2, 0], [2, 3, 0], [0, 0, 1]]
+        self.assertEqual(matrix.intersection_matrix(lists, universe).tolist(), expected)
+
+    def test_benjamini_hochberg(self):
+        adjusted = matrix.benjamini_hochberg([0.01, 0.04, 0.03, 0.5])
+        self.assertEqual([round(p, 6) for p in adjusted], [0.04, 0.053333, 0.053333, 0.5])
+
+    def test_nulls_are_shared_between_equal_sizes(self):
+        universe = np.arange(300, dtype=np.int32)
+        intersections = np.full((4, 4), 3)
+        with patch.object(matrix, "run_trials", wraps=matrix.run_trials) as run:
+            pvalues = matrix.pairwise_pvalues(universe, [20, 20, 30, 20], intersections, 200, use_null_cache=False)
+        # Six pairs but only two distinct size pairs: (20, 20) and (20, 30)
+        self.assertEqual(run.call_count, 2)
+        self.assertIsNone(pvalues[1][1])
+        self.assertEqual(pvalues[0][1], pvalues[1][3])
+        self.assertEqual(pvalues[0][2], pvalues[2][0])
+
+
+class MSETMatrixTests(unittest.TestCase):
+    """Runs the MSETMatrix plugin on the bundled rat test files."""
+
+    def test_matrix_output(self):
+        current_dir = os.path.dirname(__file__)
+        files = [os.path.join(current_dir, name) for name in ("ptest_half_1", "ptest_half_2", "ptest_ratus_1")]
+        result = asyncio.run(MSET.MSETMatrix().run({
+            "num_trials": 500,
+            "method": "exact",
+            "file_paths": files,
+            "background_file_path": os.path.join(current_dir, "ptest_half_bg"),
+        })).result
+        output = result["mset_matrix_output"]
+
+        self.assertEqual(output.labels, ["ptest_half_1", "ptest_half_2", "ptest_ratus_1"])
+        self.assertEqual([output.intersection_sizes[i][i] for i in range(3)], output.list_sizes)
+        for i in range(3):
+            self.assertIsNone(output.p_values[i][i])
+            for j in range(3):
+                if i != j:
+                    self.assertGreaterEqual(output.adjusted_p_values[i][j], output.p_values[i][j])
+
+    def test_gene_lists_with_repeated_labels(self):
+        gene_lists = [("list.txt", ["Akt1", "Bax", "Bcl2"]), ("list.txt", ["Bax", "Casp3"])]
+        output = asyncio.run(MSET.MSETMatrix().run({"method": "exact", "gene_lists": gene_lists})).result["mset_matrix_output"]
+        self.assertEqual(output.labels, ["list.txt", "list.txt"])
+        self.assertEqual(output.list_sizes, [3, 2])
+
+    def test_needs_two_lists(self):
+        result = asyncio.run(MSET.MSETMatrix().run({"geneset_ids": []})).result
+        self.assertIn("Error", result)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,97 @@
+"""
+Unit tests for the MSET null-distribution cache in plugins/MSET/null_cache.py.
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from plugins.MSET import null_cache
+
+_UNIVERSE = [f"G{i}" for i in range(400)]
+
+
+class NullCacheTests(unittest.TestCase):
+    """Unit-tests for NullDistributionCache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = null_cache.NullDistributionCache(max_entries=2, cache_dir=self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_returns_prefix_without_simulating(self):
+        first = self.cache.get_trials(_UNIVERSE, 40, 60, 1000, seed=1)
+        with patch.object(null_cache, "run_trials") as run:
+            again = self.cache.get_trials(_UNIVERSE, 60, 40, 1000, seed=1)
+            fewer = self.cache.get_trials(_UNIVERSE, 40, 60, 300, seed=1)
+        run.assert_not_called()
+        self.assertEqual(first, again)
+        self.assertEqual(len(fewer), 300)
+        self.assertEqual(fewer, sorted(fewer))
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 2))
+
+    def test_top_up_only_simulates_missing_trials(self):
+        self.cache.get_trials(_UNIVERSE, 40, 60, 1000, seed=1)
+        with patch.object(null_cache, "run_trials", wraps=null_cache.run_trials) as run:
+            trials = self.cache.get_trials(_UNIVERSE, 40, 60, 2500, seed=1)
+        self.assertEqual(run.call_args.args[3], 1500)
+        self.assertEqual(len(trials), 2500)
+        self.assertEqual(self.cache.top_ups, 1)
+
+    def test_lru_eviction_and_disk_store(self):
+        for size in (10, 20, 30):
+            self.cache.get_trials(_UNIVERSE, size, 50, 200, seed=2)
+        self.assertEqual(len(self.cache._entries), 2)
+        self.assertEqual(len(os.listdir(self.tmp.name)), 3)
+
+        # A fresh cache over the same directory serves the evicted entry from disk
+        reloaded = null_cache.NullDistributionCache(cache_dir=self.tmp.name)
+        with patch.object(null_cache, "run_trials") as run:
+            trials = reloaded.get_trials(_UNIVERSE, 10, 50, 200, seed=2)
+        run.assert_not_called()
+        self.assertEqual(trials, self.cache.get_trials(_UNIVERSE, 10, 50, 200, seed=2))
+
+    def test_entries_are_compact_and_bounded_by_bytes(self):
+        cache = null_cache.NullDistributionCache(max_bytes=2 * 1000 * 2)
+        for size in (10, 20, 30):
+            cache.get_trials(_UNIVERSE, size, 50, 1000, seed=3)
+        self.assertTrue(all(trials.dtype == null_cache.np.uint16 for trials in cache._entries.values()))
+        # Two entries of 1000 two-byte trials fit; the oldest is evicted
+        self.assertEqual([key[1] for key in cache._entries], [20, 30])
+        self.assertEqual(cache._bytes, 4000)
+        cache.get_trials(_UNIVERSE, 30, 50, 3000, seed=3)
+        self.assertEqual([key[1] for key in cache._entries], [30])
+        self.assertEqual(cache._bytes, 6000)
+
+    def test_concurrent_misses_simulate_once(self):
+        cache = null_cache.NullDistributionCache()
+        started, release = threading.Event(), threading.Event()
+        run_trials = null_cache.run_trials
+
+        def slow_run_trials(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return run_trials(*args, **kwargs)
+
+        results = []
+        with patch.object(null_cache, "run_trials", side_effect=slow_run_trials) as run:
+            threads = [threading.Thread(target=lambda: results.append(cache.get_trials(_UNIVERSE, 40, 60, 500, seed=4)))
+                       for _ in range(4)]
+            threads[0].start()
+            started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual((cache.misses, cache.hits, cache.top_ups), (1, 3, 0))
+        self.assertTrue(all(result == results[0] for result in results))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,160 @@
+"""
+Unit tests for the MSET simulation engines in plugins/MSET/simulation.py.
+"""
+
+import asyncio
+import math
+import os
+import random
+import unittest
+
+from plugins.MSET import MSET, simulation
+from utils.gene_helpers import iter_bg_genes, iter_file_lines, iter_genes_from_gw
+
+_UNIVERSE = [f"G{i}" for i in range(400)]
+
+
+class SimulationTests(unittest.TestCase):
+    """Unit-tests for the trial runners."""
+
+    def test_vectorized_matches_basic_distribution(self):
+        random.seed(7)
+        basic = simulation.run_trials_basic(_UNIVERSE, 40, 60, 4000)
+        vectorized = simulation.run_trials(_UNIVERSE, 40, 60, 4000, mode='vectorized', seed=7)
+
+        self.assertEqual(len(vectorized), 4000)
+        self.assertEqual(vectorized, sorted(vectorized))
+        # Expected intersection size is 40 * 60 / 400 = 6 for both engines
+        self.assertAlmostEqual(sum(vectorized) / 4000, 6.0, delta=0.15)
+        self.assertAlmostEqual(sum(basic) / 4000, sum(vectorized) / 4000, delta=0.2)
+
+    def test_vectorized_is_reproducible_with_seed(self):
+        first = simulation.run_trials(_UNIVERSE, 25, 10, 500, seed=3)
+        second = simulation.run_trials(_UNIVERSE, 25, 10, 500, seed=3)
+        self.assertEqual(first, second)
+
+    def test_vectorized_edge_sizes(self):
+        # A list covering the whole universe always contains the other list
+        self.assertEqual(set(simulation.run_trials(_UNIVERSE, 400, 12, 50)), {12})
+        self.assertEqual(set(simulation.run_trials(_UNIVERSE, 0, 12, 50)), {0})
+        with self.assertRaises(ValueError):
+            simulation.run_trials(_UNIVERSE, 401, 12, 50)
+
+    def test_parallel_chunks_are_reproducible(self):
+        # Uneven chunking checks that partial histograms are merged in full
+        first = simulation.run_trials(_UNIVERSE, 40, 60, 1050, mode='parallel', workers=2, seed=11)
+        second = simulation.run_trials_parallel(_UNIVERSE, 40, 60, 1050, workers=2, seed=11, chunk_size=100)
+        self.assertEqual(len(first), 1050)
+        self.assertEqual(first, sorted(first))
+        self.assertAlmostEqual(sum(first) / 1050, 6.0, delta=0.3)
+        self.assertEqual(len(second), 1050)
+
+    def test_adaptive_stops_early_when_decided(self):
+        rounds = []
+        # Observing 30 shared genes where 6 are expected is decided after the first round
+        trials, interval = simulation.run_trials_adaptive(
+            _UNIVERSE, 40, 60, 30, 100000, alpha=0.05, seed=5,
+            on_round=lambda done, est, ci: rounds.append((done, est, ci)))
+        self.assertEqual(len(trials), 500)
+        self.assertEqual(len(rounds), 1)
+        self.assertLess(interval[1], 0.05)
+
+    def test_adaptive_respects_max_trials_and_precision(self):
+        # With alpha at the exact p-value (about 0.575) the interval never clears it
+        trials, _ = simulation.run_trials_adaptive(_UNIVERSE, 40, 60, 6, 1200, alpha=0.575, seed=5)
+        self.assertEqual(len(trials), 1200)
+        trials, interval = simulation.run_trials_adaptive(
+            _UNIVERSE, 40, 60, 6, 100000, alpha=0.575, precision=0.05, seed=5)
+        self.assertLess(len(trials), 100000)
+        self.assertLessEqual((interval[1] - interval[0]) / 2, 0.05)
+
+    def test_exact_pmf_sums_to_one(self):
+        log_pmf = simulation.hypergeometric_log_pmf(400, 40, 60)
+        self.assertAlmostEqual(sum(math.exp(lp) for lp in log_pmf.values()), 1.0, places=9)
+        # Mean of the hypergeometric distribution is 40 * 60 / 400
+        mean = sum(k * math.exp(lp) for k, lp in log_pmf.items())
+        self.assertAlmostEqual(mean, 6.0, places=9)
+
+    def test_exact_pvalue_tails(self):
+        over = simulation.exact_pvalue(400, 40, 60, 10, 'over')
+        under = simulation.exact_pvalue(400, 40, 60, 10, 'under')
+        self.assertAlmostEqual(over + under, 1.0, places=12)
+        self.assertEqual(simulation.exact_pvalue(400, 40, 60, 0, 'over'), 1.0)
+        # Tiny tail probabilities stay representable thanks to log space
+        self.assertGreater(simulation.exact_pvalue(20000, 500, 500, 200, 'over'), 0.0)
+
+    def test_exact_trials_follow_expected_histogram(self):
+        trials = simulation.run_trials(_UNIVERSE, 40, 60, 1000, mode='exact')
+        hist = simulation.exact_histogram(400, 40, 60, 1000)
+        self.assertEqual(len(trials), 1000)
+        self.assertEqual(sum(hist.values()), 1000)
+        self.assertEqual(trials.count(6), hist[6])
+
+
+class MSETMethodTests(unittest.TestCase):
+    """Runs MSET.run end to end on the bundled rat test files."""
+
+    def _run(self, **extra):
+        current_dir = os.path.dirname(__file__)
+        background = os.path.join(current_dir, "ptest_half_bg")
+        input_data = {
+            "num_trials": 2000,
+            "file_path_1": os.path.join(current_dir, "ptest_half_1"),
+            "file_path_2": os.path.join(current_dir, "ptest_half_2"),
+            "background_file_path_1": background,
+            "background_file_path_2": background,
+        }
+        input_data.update(extra)
+        return asyncio.run(MSET.MSET().run(input_data)).result
+
+    def test_exact_method_matches_simulation(self):
+        exact = self._run(method="exact")["mset_output"]
+        simulated = self._run()["mset_output"]
+        self.assertEqual(exact.intersection_size, simulated.intersection_size)
+        self.assertEqual(sum(exact.histogram.values()), 2000)
+        self.assertAlmostEqual(exact.p_value, simulated.p_value, delta=0.05)
+
+    def test_adaptive_method_reports_trials_used(self):
+        task = MSET.MSET()
+        current_dir = os.path.dirname(__file__)
+        background = os.path.join(current_dir, "ptest_half_bg")
+        output = asyncio.run(task.run({
+            "num_trials": 50000,
+            "method": "adaptive",
+            "precision": 0.05,
+            "file_path_1": os.path.join(current_dir, "ptest_half_1"),
+            "file_path_2": os.path.join(current_dir, "ptest_half_2"),
+            "background_file_path_1": background,
+            "background_file_path_2": background,
+        })).result["mset_output"]
+        status = task.status().result["status"]
+        self.assertLess(output.num_trials, 50000)
+        self.assertEqual(status.trials_completed, output.num_trials)
+        self.assertAlmostEqual(status.p_value_estimate, output.p_value)
+        low, high = status.p_value_interval
+        self.assertLessEqual(low, output.p_value)
+        self.assertLessEqual(output.p_value, high)
+
+    def test_parsed_genes_match_file_paths(self):
+        current_dir = os.path.dirname(__file__)
+
+        def parse(name, parser):
+            return list(parser(iter_file_lines(os.path.join(current_dir, name))))
+
+        background = parse("ptest_half_bg", iter_bg_genes)
+        parsed = asyncio.run(MSET.MSET().run({
+            "num_trials": 2000,
+            "method": "exact",
+            "genes_1": parse("ptest_half_1", iter_genes_from_gw),
+            "genes_2": parse("ptest_half_2", iter_genes_from_gw),
+            "background_genes_1": background,
+            "background_genes_2": background,
+        })).result["mset_output"]
+        self.assertEqual(parsed, self._run(method="exact")["mset_output"])
+
+    def test_unknown_method_is_rejected(self):
+        self.assertIn("Error", self._run(method="bogus"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
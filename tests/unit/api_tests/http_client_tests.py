@@ -0,0 +1,152 @@
+"""
+Covers the pooled GeneWeaver HTTP client: connection reuse, default timeouts,
+the awaitable API, and the async geneSetRestAPI functions.
+"""
+
+import asyncio
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from plugins.api import geneSetRestAPI, symbol_mapper
+from plugins.api.http_client import GeneWeaverClient, gather_bounded
+from plugins.api.response_cache import geneset_cache
+from plugins.api.species_registry import SpeciesRegistry
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GeneWeaverClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.client_ports = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = GeneWeaverClient(timeout=(1, 5), max_connections=2)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for i in range(5):
+            self.assertEqual(self.client.get(f"{self.url}/{i}").json(), {"path": f"/{i}"})
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_default_timeout_is_applied(self):
+        with patch.object(self.client.session, "request") as request:
+            self.client.get(self.url)
+            self.assertEqual(request.call_args.kwargs["timeout"], (1, 5))
+            self.client.get(self.url, timeout=9)
+            self.assertEqual(request.call_args.kwargs["timeout"], 9)
+
+    def test_async_requests_share_the_pool(self):
+        async def fetch_all():
+            return await asyncio.gather(*(self.client.aget(f"{self.url}/{i}") for i in range(8)))
+
+        responses = asyncio.run(fetch_all())
+        self.assertEqual([r.json()["path"] for r in responses], [f"/{i}" for i in range(8)])
+        self.assertLessEqual(len(self.server.client_ports), 2)
+
+
+class _FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self.payload
+
+
+class _FakeClient:
+    def __init__(self, routes):
+        self.routes = routes
+
+    def get(self, url, **kwargs):
+        return _FakeResponse(self.routes[url])
+
+    def post(self, url, json=None, **kwargs):
+        return _FakeResponse({"gene_ids_map": [{"original_ref_id": i, "mapped_ref_id": f"S{i}"}
+                                               for i in json["source_ids"]]})
+
+    async def aget(self, url, **kwargs):
+        return self.get(url, **kwargs)
+
+    async def apost(self, url, **kwargs):
+        return self.post(url, **kwargs)
+
+
+class AsyncRestAPITests(unittest.TestCase):
+
+    def setUp(self):
+        routes = {
+            "https://geneweaver.org/api/genesets/7": {"object": {
+                "geneset": {"species_id": 1},
+                "geneset_values": [{"gsv_source_list": ["11", "12"], "ode_gene_id": 5}],
+            }},
+            "https://geneweaver.jax.org/api/species": {"data": [{"id": 0, "name": "All"},
+                                                                {"id": 1, "name": "Mus musculus"}]},
+            "https://geneweaver.jax.org/api/genesets/7": {"object": {"geneset_values": [{"ode_gene_id": 5}]}},
+        }
+        registry = SpeciesRegistry(loader=lambda: [{"id": 1, "name": "Mus musculus "}], refresh_interval=0)
+        client = _FakeClient(routes)
+        for patcher in (patch.object(geneSetRestAPI, "get_client", lambda: client),
+                        patch.object(symbol_mapper, "get_client", lambda: client),
+                        patch.object(geneSetRestAPI, "symbol_mapper", symbol_mapper.SymbolMapper()),
+                        patch.object(geneSetRestAPI, "species_registry", registry)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        geneset_cache.clear()
+        self.addCleanup(geneset_cache.clear)
+
+    def test_async_matches_sync(self):
+        self.assertEqual(asyncio.run(geneSetRestAPI.get_geneset_data_async(7)),
+                         geneSetRestAPI.get_geneset_data(7))
+        self.assertEqual(asyncio.run(geneSetRestAPI.fetchSpecies_async()), [(1, "Mus musculus")])
+        self.assertEqual(asyncio.run(geneSetRestAPI.fetchGeneSets_ode_gene_id_async(7)), [5])
+        self.assertEqual(asyncio.run(geneSetRestAPI.get_gene_symbols_async(["1"], "Mus Musculus")), ["S1"])
+        self.assertEqual(asyncio.run(geneSetRestAPI.fetchGeneSymbols_from_geneset_async(7)),
+                         geneSetRestAPI.fetchGeneSymbols_from_geneset(7))
+
+
+class GatherBoundedTests(unittest.TestCase):
+
+    def test_bounded_ordered_and_exceptions_in_place(self):
+        in_flight = [0, 0]  # current, peak
+
+        async def fetch(n):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+            await asyncio.sleep(0.01 * (6 - n))  # Later items finish first
+            in_flight[0] -= 1
+            if n == 2:
+                raise asyncio.CancelledError()
+            return n * 10
+
+        results = asyncio.run(gather_bounded(fetch, range(6), concurrency=2, return_exceptions=True))
+        self.assertEqual(in_flight[1], 2)
+        self.assertEqual([r for r in results if not isinstance(r, BaseException)], [0, 10, 30, 40, 50])
+        self.assertIsInstance(results[2], asyncio.CancelledError)
+
+
+if __name__ == "__main__":
+    unittest.main()
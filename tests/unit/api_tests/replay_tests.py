@@ -0,0 +1,122 @@
+"""
+Covers the record/replay transport and the configurable API base URLs.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from plugins.api import http_client
+from plugins.api.http_client import GeneWeaverClient, api_url, configure_base_urls, jax_api_url
+from plugins.api.replay import Cassette, install_recorder, install_replay
+
+
+def _cassette():
+    cassette = Cassette()
+    cassette.add_response("GET", "https://geneweaver.org/api/genesets/7", {"object": {"id": 7}})
+    cassette.add_mappings("Mus Musculus", ["1", "2", "3"], [
+        {"original_ref_id": "1", "mapped_ref_id": "Abc"},
+        {"original_ref_id": "2", "mapped_ref_id": "Def"},
+    ])
+    return cassette
+
+
+class ReplayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = GeneWeaverClient()
+        self.addCleanup(self.client.close)
+
+    def test_serves_recorded_responses_on_any_host(self):
+        install_replay(_cassette(), self.client)
+        for url in ("https://geneweaver.org/api/genesets/7", "http://localhost:9/api/genesets/7"):
+            response = self.client.get(url)
+            self.assertEqual((response.status_code, response.json()), (200, {"object": {"id": 7}}))
+        self.assertEqual(self.client.get("https://geneweaver.org/api/genesets/8").status_code, 404)
+
+    def test_mappings_are_answered_per_source_id(self):
+        install_replay(_cassette(), self.client)
+        response = self.client.post("https://geneweaver.org/api/genes/mappings",
+                                    json={"source_ids": ["3", "2"], "species": "Mus Musculus",
+                                          "target_gene_id_type": "Gene Symbol"})
+        self.assertEqual(response.json(), {"gene_ids_map": [{"original_ref_id": "2", "mapped_ref_id": "Def"}]})
+
+    def test_mappings_without_original_ref_id_are_kept_per_batch(self):
+        cassette = _cassette()
+        cassette.add_mappings("Mus Musculus", ["4", "5"], [{"mapped_ref_id": "Ghi"}, {"mapped_ref_id": "Jkl"}])
+        cassette.add_mappings("Mus Musculus", ["6"], [{"mapped_ref_id": "Mno"}])
+        self.assertEqual(cassette.map_ids("Mus Musculus", ["4", "5"]), [{"mapped_ref_id": "Ghi"}, {"mapped_ref_id": "Jkl"}])
+        self.assertEqual(cassette.map_ids("Mus Musculus", ["4"]), [])
+        self.assertEqual(cassette.map_ids("Mus Musculus", ["6"]), [{"original_ref_id": "6", "mapped_ref_id": "Mno"}])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cassette.json")
+            cassette.save(path)
+            self.assertEqual(Cassette.load(path).map_ids("Mus Musculus", ["4", "5"]), cassette.map_ids("Mus Musculus", ["4", "5"]))
+
+    def test_latency_and_error_injection(self):
+        adapter = install_replay(_cassette(), self.client, latency=(0.02, 0.03), error_rate=0.5, seed=1)
+        started = time.monotonic()
+        statuses = [self.client.get("https://geneweaver.org/api/genesets/7").status_code for _ in range(20)]
+        self.assertGreaterEqual(time.monotonic() - started, 20 * 0.02)
+        self.assertEqual(statuses.count(503), adapter.errors)
+        self.assertTrue(0 < adapter.errors < 20)
+
+    def test_cassette_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cassette.json")
+            _cassette().save(path)
+            loaded = Cassette.load(path)
+        self.assertEqual(loaded.map_ids("Mus Musculus", ["1"]), [{"original_ref_id": "1", "mapped_ref_id": "Abc"}])
+        self.assertIn("GET /api/genesets/7", loaded.responses)
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RecordingTests(unittest.TestCase):
+
+    def test_records_then_replays(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/api/species"
+
+        cassette = Cassette()
+        recording_client = GeneWeaverClient()
+        install_recorder(cassette, recording_client)
+        recording_client.get(url)
+        recording_client.close()
+
+        replay_client = GeneWeaverClient()
+        install_replay(cassette, replay_client)
+        self.assertEqual(replay_client.get("https://elsewhere/api/species").json(), {"path": "/api/species"})
+        replay_client.close()
+
+
+class BaseUrlTests(unittest.TestCase):
+
+    def test_configure_base_urls(self):
+        original = (http_client.API_URL, http_client.JAX_API_URL)
+        self.addCleanup(configure_base_urls, *original)
+        configure_base_urls(api="http://localhost:8000/api/")
+        self.assertEqual(api_url("genesets/1"), "http://localhost:8000/api/genesets/1")
+        self.assertEqual(jax_api_url("species"), f"{original[1]}/species")
+
+
+if __name__ == "__main__":
+    unittest.main()
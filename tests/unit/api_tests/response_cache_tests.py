@@ -0,0 +1,116 @@
+"""
+Covers the GeneWeaver response cache: hits, TTL expiry, LRU eviction, failures
+and singleflight deduplication across threads and coroutines.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from plugins.api import geneSetRestAPI
+from plugins.api.response_cache import ResponseCache
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def test_hit_after_miss(self):
+        cache = ResponseCache()
+        calls = []
+        loader = lambda: calls.append(1) or {"id": 1}
+        self.assertEqual(cache.get("a", loader), {"id": 1})
+        self.assertEqual(cache.get("a", loader), {"id": 1})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_ttl_expiry_and_lru_eviction(self):
+        now = [0.0]
+        cache = ResponseCache(max_entries=2, ttl=10, clock=lambda: now[0])
+        cache.get("a", lambda: 1)
+        cache.get("b", lambda: 2)
+        cache.get("a", lambda: 1)
+        cache.get("c", lambda: 3)  # Evicts b, the least recently used
+        self.assertEqual(cache.get("b", lambda: 20), 20)
+        now[0] = 11
+        self.assertEqual(cache.get("a", lambda: 10), 10)
+        self.assertEqual(cache.misses, 5)
+
+    def test_failures_are_not_cached(self):
+        cache = ResponseCache()
+
+        def fail():
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            cache.get("a", fail)
+        self.assertEqual(cache.get("a", lambda: 1), 1)
+
+    def test_singleflight_across_threads(self):
+        cache = ResponseCache()
+        calls = []
+        release = threading.Event()
+
+        def slow_loader():
+            calls.append(1)
+            release.wait(5)
+            return "value"
+
+        with ThreadPoolExecutor(8) as pool:
+            futures = [pool.submit(cache.get, "a", slow_loader) for _ in range(8)]
+            while cache.misses + cache.shared < 8:
+                time.sleep(0.01)
+            release.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(results, ["value"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.shared, 7)
+
+    def test_singleflight_across_coroutines(self):
+        cache = ResponseCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        async def fetch_all():
+            return await asyncio.gather(*(cache.aget("a", loader) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(fetch_all()), ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+
+
+class GenesetCacheTests(unittest.TestCase):
+
+    def test_get_geneset_data_is_cached(self):
+        cache = ResponseCache()
+        calls = []
+
+        class FakeResponse:
+            status_code = 200
+            text = ""
+
+            def json(self):
+                return {"object": {"geneset_values": [{"ode_gene_id": 3}]}}
+
+        class FakeClient:
+            def get(self, url, **kwargs):
+                calls.append(url)
+                return FakeResponse()
+
+        with patch.object(geneSetRestAPI, "geneset_cache", cache), \
+                patch.object(geneSetRestAPI, "get_client", FakeClient):
+            geneSetRestAPI.get_geneset_data(5)
+            geneSetRestAPI.get_geneset_data("5")
+            ids = geneSetRestAPI.fetchGeneSets_ode_gene_id(5)
+            ids.append(99)  # Callers get their own copy
+            self.assertEqual(geneSetRestAPI.fetchGeneSets_ode_gene_id(5), [3])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.stats()["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
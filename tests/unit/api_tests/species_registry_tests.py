@@ -0,0 +1,58 @@
+"""
+Covers the species registry: precomputed indexes, single load, refresh and
+the background refresher.
+"""
+
+import asyncio
+import time
+import unittest
+
+from plugins.api.species_registry import SpeciesRegistry
+
+_SPECIES = [
+    {"id": 0, "name": "All"},
+    {"id": 1, "name": "Mus musculus"},
+    {"id": 2, "name": "Homo sapiens "},
+    {"id": 99, "name": "Unlisted beast"},
+]
+
+
+class SpeciesRegistryTests(unittest.TestCase):
+
+    def test_indexes(self):
+        registry = SpeciesRegistry(loader=lambda: _SPECIES, refresh_interval=0)
+        self.assertEqual(registry.short_names(), {1: "Mm", 2: "Hs", 99: "Ub"})
+        self.assertEqual(registry.full_names()[2], "Homo sapiens ")
+        self.assertEqual(registry.canonical_name(2), "Homo Sapiens")
+        self.assertEqual(registry.canonical_name(0), "All")
+        with self.assertRaises(Exception):
+            registry.canonical_name(99)
+
+    def test_loads_once(self):
+        calls = []
+        registry = SpeciesRegistry(loader=lambda: calls.append(1) or _SPECIES, refresh_interval=0)
+        registry.short_names()
+        registry.canonical_name(1)
+        asyncio.run(registry.ensure_loaded_async())
+        self.assertEqual(len(calls), 1)
+
+    def test_background_refresh_keeps_last_good_snapshot(self):
+        responses = [_SPECIES, [{"id": 1, "name": "Rattus norvegicus"}]]
+
+        def loader():
+            if not responses:
+                raise RuntimeError("upstream down")
+            return responses.pop(0)
+
+        registry = SpeciesRegistry(loader=loader, refresh_interval=0.02)
+        self.addCleanup(registry.close)
+        self.assertEqual(registry.canonical_name(1), "Mus Musculus")
+        deadline = time.monotonic() + 5
+        while registry.loads < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)  # Further refreshes fail
+        self.assertEqual(registry.canonical_name(1), "Rattus Norvegicus")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Covers the batched, memoized source ID -> symbol mapper.
+"""
+
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from plugins.api import symbol_mapper
+from plugins.api.symbol_mapper import SymbolMapper
+
+
+class _FakeResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class _FakeMappingClient:
+    """
+    Maps "<n>" to "G<n>"; IDs starting with 9 have no mapping and "1" maps to two symbols.
+    Without original_ref_id the entries do not say which ID they answer.
+    """
+
+    def __init__(self, original_ref_id: bool = True):
+        self.original_ref_id = original_ref_id
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, **kwargs):
+        with self.lock:
+            self.requests.append((json["species"], list(json["source_ids"])))
+        entries = []
+        for source_id in json["source_ids"]:
+            if source_id.startswith("9"):
+                continue
+            entries.append({"original_ref_id": source_id, "mapped_ref_id": f"G{source_id}"})
+            if source_id == "1":
+                entries.append({"original_ref_id": source_id, "mapped_ref_id": "G1b"})
+        if not self.original_ref_id:
+            for entry in entries:
+                del entry["original_ref_id"]
+        return _FakeResponse({"gene_ids_map": entries})
+
+    async def apost(self, url, **kwargs):
+        await asyncio.sleep(0)
+        return self.post(url, **kwargs)
+
+
+class SymbolMapperTests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = _FakeMappingClient()
+        patcher = patch.object(symbol_mapper, "get_client", lambda: self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batches_and_order(self):
+        mapper = SymbolMapper(batch_size=3)
+        ids = ["5", "1", "9", "2", "3", "4", "5", "6"]
+        expected = ["G5", "G1", "G1b", "G2", "G3", "G4", "G5", "G6"]
+        self.assertEqual(mapper.map(ids, "Mus Musculus"), expected)
+        # Seven distinct IDs in batches of three
+        self.assertEqual(sorted(len(batch) for _, batch in self.client.requests), [1, 3, 3])
+        self.assertEqual(asyncio.run(SymbolMapper(batch_size=3).map_async(ids, "Mus Musculus")), expected)
+
+    def test_only_unseen_ids_are_requested(self):
+        mapper = SymbolMapper(batch_size=100)
+        mapper.map(["1", "2", "9"], "Mus Musculus")
+        self.assertEqual(asyncio.run(mapper.map_async(["2", "3", "9"], "Mus Musculus")), ["G2", "G3"])
+        self.assertEqual(self.client.requests[-1], ("Mus Musculus", ["3"]))
+        # The memo is per species
+        mapper.map(["2"], "Homo Sapiens")
+        self.assertEqual(self.client.requests[-1], ("Homo Sapiens", ["2"]))
+        self.assertEqual(len(self.client.requests), 3)
+
+    def test_memo_is_bounded(self):
+        mapper = SymbolMapper(max_entries=2)
+        self.assertEqual(mapper.map(["1", "2", "3"], "Mus Musculus"), ["G1", "G1b", "G2", "G3"])
+        self.assertEqual(len(mapper), 2)
+
+    def test_entries_without_original_ref_id(self):
+        self.client.original_ref_id = False
+        mapper = SymbolMapper(batch_size=3)
+        ids = ["5", "1", "9", "2"]
+        self.assertEqual(mapper.map(ids, "Mus Musculus"), ["G5", "G1", "G1b", "G2"])
+        # Still one POST per batch; only the single-ID batch could be memoized
+        self.assertEqual([batch for _, batch in self.client.requests], [["5", "1", "9"], ["2"]])
+        self.assertEqual(len(mapper), 1)
+        self.assertEqual(asyncio.run(SymbolMapper(batch_size=3).map_async(ids, "Mus Musculus")),
+                         ["G5", "G1", "G1b", "G2"])
+        self.assertEqual(len(self.client.requests), 4)
+
+if __name__ == "__main__":
+    unittest.main()
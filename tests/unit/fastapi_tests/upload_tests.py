@@ -0,0 +1,52 @@
+"""
+Unit tests for the upload handling of the generated endpoints in fastapi/fastapiService.py.
+"""
+
+import asyncio
+import importlib.util
+import io
+import os
+import unittest
+from unittest.mock import patch
+
+from fastapi import UploadFile
+
+from utils.gene_helpers import GW_HEADER_LINES
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "src", "fastapi")
+
+
+def load_service():
+    # The service reads tools_new.yaml from the working directory on import
+    cwd = os.getcwd()
+    os.chdir(SERVICE_DIR)
+    try:
+        spec = importlib.util.spec_from_file_location("fastapiService", os.path.join(SERVICE_DIR, "fastapiService.py"))
+        service = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(service)
+    finally:
+        os.chdir(cwd)
+    return service
+
+
+class UploadEndpointTests(unittest.TestCase):
+    """Unit-tests for make_endpoint."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = load_service()
+
+    def test_uploads_with_the_same_filename_are_kept_apart(self):
+        params = [{"name": "file_paths", "type": "List<UploadFile>", "parser": "gw", "target": "gene_lists"}]
+        endpoint = self.service.make_endpoint("MSETMatrix", params)
+        header = b"# header\n" * GW_HEADER_LINES
+        uploads = [UploadFile(file=io.BytesIO(header + b"Akt1\nBax\n"), filename="genes.txt"),
+                   UploadFile(file=io.BytesIO(header + b"Casp3\n"), filename="genes.txt")]
+        with patch.object(self.service.task_manager, "create_task", return_value="task") as create_task:
+            asyncio.run(endpoint(file_paths=uploads))
+        gene_lists = create_task.call_args.args[1]["gene_lists"]
+        self.assertEqual(gene_lists, [("genes.txt", ["Akt1", "Bax"]), ("genes.txt", ["Casp3"])])
+
+
+if __name__ == "__main__":
+    unittest.main()
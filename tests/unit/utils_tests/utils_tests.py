@@ -1,6 +1,10 @@
 # Test section for utils, accessing genes from GeneWeaver ReST API
 from plugins.api.geneSetRestAPI import fetchGeneSymbols_from_geneset
-from utils.gene_helpers import extract_genes_from_gw, extract_bg_genes
+from utils.gene_helpers import extract_genes_from_gw, extract_bg_genes, iter_genes_from_gw, iter_bg_genes, iter_file_lines, iter_file_object_lines, iter_chunk_lines
+from utils import gene_interning
+from utils.background_cache import BackgroundCache, as_background
+import io
+import pickle
 import os
 
 def test_extract_genes_from_gw():
@@ -70,6 +74,89 @@ def test_extract_bg_genes():
         print("Extract bg genes failed.")
     
 
+def test_streaming_parsers():
+    """ Testing the streaming parsers in utils.gene_helpers against the whole-content ones """
+    current_dir = os.path.dirname(__file__)
+    file_path_1 = os.path.join(current_dir, "ptest_ratus_1")
+    bg_path = os.path.join(current_dir, "ptest_ratus_bg")
+    with open(file_path_1, "r") as f:
+        content1 = f.read()
+    with open(bg_path, "r") as f:
+        bg_content = f.read()
+
+    assert list(iter_genes_from_gw(iter_file_lines(file_path_1))) == extract_genes_from_gw(content1)
+    assert list(iter_bg_genes(iter_file_lines(bg_path))) == extract_bg_genes(bg_content)
+    # Tiny chunks split lines and \r\n pairs across chunk boundaries
+    crlf_bytes = content1.replace("\n", "\r\n").encode()
+    for chunk_size in (1, 2, 7):
+        streamed = iter_genes_from_gw(iter_file_object_lines(io.BytesIO(crlf_bytes), chunk_size))
+        assert list(streamed) == extract_genes_from_gw(content1)
+
+
+def test_file_lines_split_like_splitlines(tmp_path):
+    """ iter_file_lines splits bare CR line endings the way str.splitlines does """
+    content = "Akt1\rBax\r\nBcl2\nCasp3"
+    path = tmp_path / "bare_cr"
+    path.write_bytes(content.encode())
+    assert [line.rstrip("\r\n") for line in iter_file_lines(str(path))] == content.splitlines()
+
+
+def test_chunk_lines_split_like_splitlines():
+    """ iter_chunk_lines gives the lines of str.splitlines for every chunking, including long lines and split CRLFs """
+    content = "Akt1\rBax\r\n" + "Bcl2" * 500 + "\nCasp3\x0bDdx3\r"
+    for chunk_size in (1, 2, 3, 7, 64, len(content)):
+        chunks = [content[i:i + chunk_size].encode() for i in range(0, len(content), chunk_size)]
+        assert list(iter_chunk_lines(chunks)) == content.splitlines(keepends=True)
+
+
+def test_gene_interning():
+    """ Testing utils.gene_interning set primitives """
+    interner = gene_interning.GeneInterner()
+    list_a = interner.intern_set(["Akt1", "Bax", "Bcl2", "Akt1"])
+    list_b = interner.intern_set(["Bcl2", "Casp3", "Akt1"])
+
+    assert len(interner) == 4
+    assert interner.intern("Bax") == list_a[1]
+    assert interner.keys(gene_interning.intersect(list_a, list_b)) == ["Akt1", "Bcl2"]
+    assert interner.keys(gene_interning.union(list_a, list_b)) == ["Akt1", "Bax", "Bcl2", "Casp3"]
+    assert interner.keys(gene_interning.difference(list_a, list_b)) == ["Bax"]
+    assert gene_interning.contains(list_a, list_b).tolist() == [True, True, False]
+    assert gene_interning.membership_counts([list_a, list_b], len(interner)).tolist() == [2, 1, 2, 1]
+
+
+def test_background_cache():
+    """ Testing utils.background_cache hits, universe memo and eviction """
+    current_dir = os.path.dirname(__file__)
+    bg_path = os.path.join(current_dir, "ptest_ratus_bg")
+    with open(bg_path, "r") as f:
+        expected = sorted(set(extract_bg_genes(f.read())))
+
+    cache = BackgroundCache(max_genes=len(expected))
+    from_path = cache.load_file(bg_path)
+    with open(bg_path, "rb") as f:
+        from_upload = cache.load_file_object(io.BytesIO(f.read()))
+    assert from_path.digest == from_upload.digest
+    assert from_upload.symbols is from_path.symbols  # Served from the cache, not re-parsed
+    assert from_path.symbols.tolist() == expected
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert cache.universe(from_path, from_upload) is cache.universe(from_upload, from_path)
+
+    # A second background pushes the first one (and its universe) out of the budget
+    cache.load_file_object(io.BytesIO(b"Akt1\nBax\n"))
+    assert len(cache) == 1
+    assert not cache._universes
+
+
+def test_background_interning_is_per_run():
+    """ A Background holds symbols; each run interns it with its own interner """
+    background = as_background(["Trp53", "Akt1", "Bax", "Akt1"])
+    assert background.symbols.tolist() == ["Akt1", "Bax", "Trp53"]
+    restored = pickle.loads(pickle.dumps(background))
+    interner = gene_interning.GeneInterner()
+    interner.intern_set(["Unrelated1", "Unrelated2"])
+    assert interner.keys(restored.intern(interner)) == ["Akt1", "Bax", "Trp53"]
+    assert len(interner) == 5
+
 def test_fetchGeneSymbols():
     symbols=fetchGeneSymbols_from_geneset(233325) # https://www.geneweaver.org/viewgenesetdetails/219249
     print("Gene Symbols: ",((symbols)))